@@ -0,0 +1,220 @@
+"""
+Benchmarks for the part builders, the boolean/revolve build modes and the export path.
+
+Every scenario runs in a fresh worker process so that peak RSS and cold caches are measured per
+scenario. Results are written as JSON and can be compared against a stored baseline:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 1.25
+
+The comparison exits with status 1 when a scenario is slower than threshold times its baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+NOSE_SHAPES = ("conical", "ogive", "von_karman")
+FIN_COUNTS = (3, 4, 6, 8, 12)
+STACK_STAGES = (1, 5, 10, 25, 50)
+EXPORT_TOLERANCES = (1e-2, 1e-3, 1e-4)
+
+
+def _scenarios() -> dict:
+    """
+    Name -> (function, kwargs). Functions return the number of triangles they produced, or None.
+    """
+    scenarios = {}
+
+    for mode in ("revolve", "boolean"):
+        scenarios[f"primitive/cylinder/{mode}"] = (_primitive, {"kind": "cylinder", "mode": mode})
+        scenarios[f"primitive/transition/{mode}"] = (_primitive, {"kind": "transition", "mode": mode})
+        for shape in NOSE_SHAPES:
+            scenarios[f"primitive/cone/{shape}/{mode}"] = (_primitive, {"kind": "cone", "mode": mode, "shape": shape})
+    scenarios["primitive/trapezoidal_fin"] = (_primitive, {"kind": "trapezoidal_fin"})
+
+    for count in FIN_COUNTS:
+        for mode in ("compound", "fuse", "union"):
+            scenarios[f"fin_set/{count}/{mode}"] = (_fin_set, {"count": count, "mode": mode})
+
+    for stages in STACK_STAGES:
+        scenarios[f"stack/{stages}"] = (_stack, {"stages": stages})
+
+    for tolerance in EXPORT_TOLERANCES:
+        scenarios[f"export/stl/{tolerance:g}"] = (_export, {"tolerance": tolerance})
+        scenarios[f"export/stl/mesh/{tolerance:g}"] = (_export, {"tolerance": tolerance, "build_mode": "mesh"})
+
+    return scenarios
+
+
+def _primitive(kind: str, mode: str = None, shape: str = None):
+    import cadquery as cq
+    from pyCadUtils import primitives
+
+    wp = cq.Workplane("XY")
+    if kind == "cylinder":
+        primitives.create_cylinder(wp, 1.0, 0.18, 0.02, mode=mode)
+    elif kind == "transition":
+        primitives.create_transition(wp, 0.1, 0.15, 0.18, 0.02, mode=mode)
+    elif kind == "cone":
+        primitives.create_cone(wp, 0.4, 0.15, 0.02, shape, mode=mode)
+    else:
+        primitives.create_trapezoidal_fin(wp, 0.3, 0.2, 0.1, 0.1, 0.02)
+
+
+def _fin_set(count: int, mode: str):
+    from pyCadUtils.parts import Fins3DBuilder
+
+    Fins3DBuilder().create_FinSet(None, count, 0.3, 0.2, 0.1, 0.1, 0.1, 0.02, 0.36, 0.0, mode)
+
+
+def _build_stack(stages: int, build_mode: str = "revolve"):
+    from pyCadUtils.projectManager import ProjectManager
+
+    manager = ProjectManager(name="benchmark", build_mode=build_mode)
+    for i in range(stages):
+        manager.addBodyTube(length=0.5 + 0.01 * i, diameter=0.36, thickness=0.02)
+        manager.addFinSet(count=4, root_chord=0.3, tip_chord=0.2, span=0.10, sweep=0.1, position=0.1, thickness=0.02)
+    manager.addNoseCone(length=0.4, diameter=0.36, thickness=0.02, shape="ogive")
+    return manager
+
+
+def _stack(stages: int):
+    _build_stack(stages)
+
+
+def _export(tolerance: float, build_mode: str = "revolve"):
+    manager = _build_stack(2, build_mode)
+    with tempfile.TemporaryDirectory() as folder:
+        if build_mode == "mesh":
+            meshes = manager.meshes(tolerance)
+            manager.exportProject(folder, "stl", linear_deflection=tolerance)
+            return sum(len(m.triangles) for m in meshes)
+
+        from pyCadUtils.export import export_shapes
+        return export_shapes(manager.project.vals(), os.path.join(folder, "benchmark.stl"), linear_deflection=tolerance)
+
+
+def _clear_caches() -> None:
+    from pyCadUtils.cache import shape_cache
+    from pyCadUtils.export import mesh_cache
+    from pyCadUtils.mesh import component_meshes
+
+    shape_cache.clear()
+    mesh_cache.clear()
+    component_meshes.cache_clear()
+
+
+def _run_scenario(name: str, repeat: int) -> dict:
+    """
+    Runs one scenario in the current (fresh) process: repeat cold runs with the caches cleared
+    before each one, then repeat warm runs reusing them.
+    """
+    function, kwargs = _scenarios()[name]
+    _clear_caches()
+    function(**kwargs)  # imports and one-off initialisation
+
+    cold = []
+    triangles = None
+    for _ in range(repeat):
+        _clear_caches()
+        start = time.perf_counter()
+        triangles = function(**kwargs)
+        cold.append(time.perf_counter() - start)
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(**kwargs)
+        warm.append(time.perf_counter() - start)
+
+    return {
+        "cold_s": statistics.median(cold),
+        "cold_min_s": min(cold),
+        "warm_s": statistics.median(warm),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "triangles": triangles,
+        "repeat": repeat,
+        **kwargs,
+    }
+
+
+def run(filter: str = None, repeat: int = 5) -> dict:
+
+    names = [n for n in _scenarios() if filter is None or filter in n]
+    results = {}
+
+    for name in names:
+        # one process per scenario so that peak RSS is not inherited from earlier scenarios
+        with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+            results[name] = executor.submit(_run_scenario, name, repeat).result()
+        print(f"{name:40s} cold {results[name]['cold_s'] * 1e3:9.2f} ms   warm {results[name]['warm_s'] * 1e3:9.2f} ms")
+
+    import cadquery as cq
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cadquery": cq.__version__,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Returns (name, current, baseline, ratio) for every scenario whose cold time regressed past threshold.
+    """
+    regressions = []
+    for name, current in results["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        ratio = current["cold_s"] / reference["cold_s"]
+        if ratio > threshold:
+            regressions.append((name, current["cold_s"], reference["cold_s"], ratio))
+    return regressions
+
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run scenarios whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario (default: 5)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline to this JSON file")
+    parser.add_argument("--baseline", help="compare the results against this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.repeat)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.threshold)
+        for name, current, reference, ratio in regressions:
+            print(f"REGRESSION {name}: {current * 1e3:.2f} ms vs {reference * 1e3:.2f} ms baseline ({ratio:.2f}x)")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,16 @@
+import argparse
 from pyCadUtils.projectManager import ProjectManager
-from cadquery.vis import show
 
 def main() -> None:
 
-    test_project = ProjectManager(name = "test8")
+    parser = argparse.ArgumentParser(description="Builds the test rocket and exports it.")
+    parser.add_argument("--show", action="store_true", help="open the VTK viewer on the result")
+    parser.add_argument("--export-dir", help="folder to export the project to (no export if omitted)")
+    parser.add_argument("--format", default="stl", help="export format (default: stl)")
+    parser.add_argument("--optimize", type=float, metavar="MARGIN", help="resize the lower fins and the nose for the lightest rocket with this static margin")
+    args = parser.parse_args()
+
+    test_project = ProjectManager(name = "test8", unit = "meter")
 
     test_project.addBodyTube(length=1,diameter=0.36,thickness=0.02)
     test_project.addFinSet(count=4, root_chord=0.3, tip_chord=0.2, span=0.10, sweep=0.1, position=0.1, thickness=0.02)
@@ -15,8 +22,24 @@ def main() -> None:
 
     test_project.addNoseCone(length=0.4,diameter=0.30,thickness=0.02)
 
-    show(test_project.project, alpha=0.5)
-    test_project.exportProject(r"C:\Users\jorge\Documents\STAR\STARDUST\RocketCadPython\svgResults", "stl")
+    if args.optimize is not None:
+        from pyCadUtils.optimize import Optimizer
+
+        optimizer = Optimizer(test_project, {"fin_set1.span": (0.05, 0.6), "fin_set1.root_chord": (0.1, 0.9),
+                                             "fin_set1.count": (3, 6), "nose_cone1.length": (0.2, 0.8)},
+                              objective="mass", min_margin=args.optimize)
+        result = optimizer.run(generations=10, population=200)
+        if not result.best:
+            raise SystemExit(f"No design reaches a static margin of {args.optimize}")
+        print(result.best[0].params, f"margin {result.best[0].metrics['margin']:.3f}")
+        test_project = result.build()[0]
+        test_project.name = "test8"
+
+    if args.show:
+        test_project.preview(alpha=0.5)
+
+    if args.export_dir:
+        test_project.exportProject(args.export_dir, args.format)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+import importlib
+
+
+class LazyModule:
+
+    """
+    Stands in for a module and imports it on first attribute access.
+
+    CadQuery and OCP take seconds to import. Modules of this package refer to them through a
+    LazyModule (with `from __future__ import annotations` so that type hints are not evaluated),
+    which lets spec validation, analytic calculations and CLI help run without paying that cost.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """Imports the module now and returns it."""
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        # only called for attributes not found on the proxy itself
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+cq = LazyModule("cadquery")
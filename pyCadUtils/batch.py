@@ -0,0 +1,195 @@
+from __future__ import annotations
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+from ._lazy import cq
+from .brep import shape_from_brep, workplane_to_brep
+from .cache import shape_cache
+from .export import DEFAULT_ANGULAR_DEFLECTION
+from .projectManager import ProjectManager
+from .sharedmesh import SharedMeshes
+from .spec import apply_spec
+
+
+class BatchResult(NamedTuple):
+    index: int
+    name: Optional[str]
+    brep: Optional[bytes]
+    error: Optional[str]
+    elapsed: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def shape(self) -> cq.Shape:
+        """
+        Deserializes the built rocket. Only valid for successful results.
+        """
+        if self.brep is None:
+            raise ValueError(f"spec {self.index} failed to build:\n{self.error}")
+        return shape_from_brep(self.brep)
+
+
+class MeshBatchResult(NamedTuple):
+    index: int
+    name: Optional[str]
+    meshes: Optional[SharedMeshes]  # shared memory block, to be written or released by the receiver
+    error: Optional[str]
+    elapsed: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def build_project(spec: dict, build_mode: str = "revolve") -> ProjectManager:
+    """
+    Builds a rocket from a spec (see spec.validate_spec) with a fresh ProjectManager.
+    """
+    return apply_spec(ProjectManager(name=spec.get("name"), build_mode=build_mode), spec)
+
+
+def _init_worker() -> None:
+    # Each worker keeps its own shape cache for its whole lifetime, so repeated
+    # components across the specs it receives are only built once per worker.
+    shape_cache.clear()
+
+
+def _build_worker(index: int, spec: dict) -> BatchResult:
+
+    start = time.perf_counter()
+    name = spec.get("name") if isinstance(spec, dict) else None
+
+    try:
+        manager = build_project(spec)
+        brep = workplane_to_brep(manager.project)
+    except Exception:
+        return BatchResult(index, name, None, traceback.format_exc(), time.perf_counter() - start)
+
+    return BatchResult(index, manager.name, brep, None, time.perf_counter() - start)
+
+
+def _mesh_worker(index: int, spec: dict, linear_deflection: float, angular_deflection: float, build_mode: str) -> MeshBatchResult:
+
+    start = time.perf_counter()
+    name = spec.get("name") if isinstance(spec, dict) else None
+
+    try:
+        manager = build_project(spec, build_mode)
+        meshes = manager.sharedMeshes(linear_deflection, angular_deflection)
+    except Exception:
+        return MeshBatchResult(index, name, None, traceback.format_exc(), time.perf_counter() - start)
+
+    return MeshBatchResult(index, manager.name, meshes, None, time.perf_counter() - start)
+
+
+def run_pool(worker: Callable, specs: Iterable, args: tuple = (), max_workers: Optional[int] = None,
+             max_pending: Optional[int] = None, discard: Optional[Callable] = None, load_cq: bool = True) -> Iterator:
+    """
+    Runs worker(index, spec, *args) for every spec across a process pool, with a bounded number of specs
+    in flight. build_batch and mesh_batch are built on it.
+
+    Arguments:
+        worker(:Callable:): picklable function, called in the workers.
+        specs(:Iterable:): work items, rocket specs or anything else. May be a lazy iterator.
+        args(:tuple:): extra arguments passed to every call.
+        max_workers(:int:): number of worker processes, defaults to the number of CPUs.
+        max_pending(:int:): maximum number of specs submitted but not yet yielded, defaults to twice the number of workers.
+        discard(:Callable:): called on the results never yielded because the consumer stopped.
+        load_cq(:bool:): import CadQuery before forking, for workers that build OCC geometry.
+
+    Returns:
+        An iterator of the results of worker in completion order.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+
+    # Import CadQuery in the parent so that forked workers inherit it instead of each importing it
+    if load_cq:
+        cq.load()
+
+    specs = iter(enumerate(specs))
+    pending = set()
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+
+        try:
+            for index, spec in specs:
+                pending.add(executor.submit(worker, index, spec, *args))
+                if len(pending) >= max_pending:
+                    break
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+
+                    next_spec = next(specs, None)
+                    if next_spec is not None:
+                        pending.add(executor.submit(worker, *next_spec, *args))
+        finally:
+            if discard is not None:
+                for future in pending:
+                    try:
+                        discard(future.result())
+                    except Exception:
+                        pass
+
+
+def build_batch(specs: Iterable[dict], max_workers: Optional[int] = None, max_pending: Optional[int] = None) -> Iterator[BatchResult]:
+    """
+    Builds rocket specs across a process pool and yields a BatchResult for each one as soon as it finishes.
+
+    Arguments:
+        specs(:Iterable[dict]:): rocket specs (see build_project). May be a lazy iterator.
+        max_workers(:int:): number of worker processes, defaults to the number of CPUs.
+        max_pending(:int:): maximum number of specs submitted but not yet yielded, defaults to twice the number of workers.
+
+    Returns:
+        An iterator of BatchResult in completion order. A spec that raises yields a result with `error` set
+        instead of stopping the batch.
+    """
+    return run_pool(_build_worker, specs, (), max_workers, max_pending)
+
+
+def _release(result: MeshBatchResult) -> None:
+    if result.meshes is not None:
+        result.meshes.release()
+
+
+def mesh_batch(specs: Iterable[dict], linear_deflection: Optional[float] = None, angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION,
+               build_mode: str = "revolve", max_workers: Optional[int] = None, max_pending: Optional[int] = None) -> Iterator[MeshBatchResult]:
+    """
+    Builds and tessellates rocket specs across a process pool. The meshes come back in shared memory
+    (see sharedmesh) rather than pickled, and are written from there without copying:
+
+        for result in mesh_batch(specs):
+            if result.ok:
+                result.meshes.write(f"{result.name}.stl")
+
+    Arguments:
+        specs(:Iterable[dict]:): rocket specs (see build_project). May be a lazy iterator.
+        linear_deflection(:float:): maximum distance between mesh and surface, in model units. Defaults to
+                                    export.default_linear_deflection of the unit of each spec.
+        angular_deflection(:float:): maximum angle between adjacent triangles, in radians.
+        build_mode(:str:): build mode of the projects, "mesh" skips OCC entirely.
+        max_workers(:int:): number of worker processes, defaults to the number of CPUs.
+        max_pending(:int:): maximum number of specs submitted but not yet yielded, defaults to twice the
+                            number of workers. Bounds the shared memory held by results not yet consumed.
+
+    Returns:
+        An iterator of MeshBatchResult in completion order. The receiver owns the shared memory of every
+        result it gets and must write or release it; results not consumed are released.
+    """
+    # The resource tracker must be started by the parent so that the workers register their blocks with
+    # it: a tracker started by a worker would remove the blocks when that worker exits.
+    resource_tracker.ensure_running()
+
+    return run_pool(_mesh_worker, specs, (linear_deflection, angular_deflection, build_mode), max_workers, max_pending,
+                    _release, load_cq=build_mode != "mesh")
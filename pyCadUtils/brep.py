@@ -0,0 +1,28 @@
+from __future__ import annotations
+import io
+from ._lazy import cq
+
+
+def shape_to_brep(shape: cq.Shape) -> bytes:
+    """
+    Serializes a shape to OCC BREP bytes.
+    """
+    buffer = io.BytesIO()
+    shape.exportBrep(buffer)
+    return buffer.getvalue()
+
+
+def shape_from_brep(data) -> cq.Shape:
+    """
+    Rebuilds a shape from OCC BREP bytes produced by shape_to_brep, or from a binary stream of them (an open
+    file, an mmap), which OCC reads a chunk at a time.
+    """
+    return cq.Shape.importBrep(data if hasattr(data, "read") else io.BytesIO(data))
+
+
+def workplane_to_brep(project: cq.Workplane) -> bytes:
+    """
+    Serializes every shape on a workplane stack as a single compound.
+    """
+    shapes = [s for s in project.vals() if isinstance(s, cq.Shape)]
+    return shape_to_brep(cq.Compound.makeCompound(shapes))
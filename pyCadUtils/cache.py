@@ -0,0 +1,172 @@
+from __future__ import annotations
+import inspect
+import sqlite3
+from collections import OrderedDict
+from functools import wraps
+from typing import NamedTuple
+from ._lazy import cq
+from .brep import shape_to_brep
+from .store import store_from_environment
+from .trace import span
+
+DEFAULT_TOLERANCE = 1e-9
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MiB of BREP data
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def shape_size(shape: cq.Shape) -> int:
+    """
+    Approximate memory footprint of a shape, measured as the size of its BREP serialization.
+    """
+    return len(shape_to_brep(shape))
+
+
+class ShapeCache:
+
+    "An LRU cache of primitive solids built in canonical position, bounded by memory size."
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, tolerance: float = DEFAULT_TOLERANCE) -> None:
+
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance
+        self.enabled = True
+        # Optional persistent ShapeStore consulted on a miss before building, see store.py
+        self.store = store_from_environment()
+
+        self._entries = OrderedDict()  # key -> (shapes, size)
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def normalize(self, value):
+        """
+        Quantize floats to the cache tolerance so that parameters differing by rounding noise share a key.
+        """
+        if isinstance(value, bool) or value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)):
+            return int(round(float(value) / self.tolerance))
+        if isinstance(value, (tuple, list)):
+            return tuple(self.normalize(v) for v in value)
+        return value
+
+    def make_key(self, name: str, params: tuple) -> tuple:
+        return (name, self.tolerance, self.normalize(params))
+
+    def get(self, key):
+        """
+        Returns the cached shapes for key (marking them as recently used) or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[0]
+
+    def put(self, key, shapes) -> None:
+
+        size = sum(shape_size(s) for s in shapes)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+
+        self._entries[key] = (shapes, size)
+        self._size += size
+
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self._evictions += 1
+
+    def clear(self) -> None:
+
+        self._entries.clear()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._size)
+
+
+# Process-wide cache used by the primitives
+shape_cache = ShapeCache()
+
+
+def cached_primitive(name: str):
+    """
+    Decorator memoizing a primitive `func(wp, *params)` in `shape_cache`.
+
+    On a miss the primitive is read from the persistent store if one is attached, or else built on a
+    canonical XY workplane (and written to the store), then kept in memory. The store is only an
+    accelerator: if it fails (locked index, full disk) the primitive is built and the error recorded on
+    the span. Every call returns
+    the stored solids moved onto the plane of `wp`; moving shares the underlying OCC geometry,
+    so a hit costs a location change instead of a rebuild.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(wp: cq.Workplane, *args, **kwargs) -> cq.Workplane:
+
+            if not shape_cache.enabled:
+                return func(wp, *args, **kwargs)
+
+            bound = signature.bind(wp, *args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(bound.arguments.values())[1:]
+
+            with span(f"primitive.{name}") as sp:
+                key = shape_cache.make_key(name, params)
+                shapes = shape_cache.get(key)
+                sp.set(cache="miss" if shapes is None else "hit")
+
+                if shapes is None:
+                    store = shape_cache.store
+                    if store is not None:
+                        try:
+                            shapes = store.get(key)
+                            sp.set(store="miss" if shapes is None else "hit")
+                        except (sqlite3.Error, OSError) as error:
+                            sp.set(store="error", error=repr(error))
+
+                    if shapes is None:
+                        with span(f"primitive.{name}.build", params=params) as build:
+                            built = func(cq.Workplane("XY"), *params)
+                            shapes = [s for s in built.vals() if isinstance(s, cq.Shape)]
+                            build.shape(built)
+                        if store is not None:
+                            try:
+                                store.put(key, shapes)
+                            except (sqlite3.Error, OSError) as error:
+                                sp.set(store="error", error=repr(error))
+
+                    shape_cache.put(key, shapes)
+
+                location = cq.Location(wp.plane)
+                return wp.newObject([s.moved(location) for s in shapes])
+
+        return wrapper
+
+    return decorator
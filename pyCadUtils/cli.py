@@ -0,0 +1,183 @@
+"""
+Command line batch builder: rocket specs in as JSON lines, one JSON result line per design out.
+
+    python -m pyCadUtils specs.jsonl --workers 8 --export-dir out --format stl --format glb --format step > results.jsonl
+    cat specs.jsonl | python -m pyCadUtils --build-mode mesh --export-dir out
+    python -m pyCadUtils --ork archive/ --scale 1000 --export-dir out
+
+Every input line is a spec (see spec.validate_spec); blank lines are skipped. The designs are built
+across a process pool (see batch.py) and a result line is written as soon as each one finishes, in
+completion order:
+
+    {"line": 3, "name": "r3", "ok": true, "error": null, "elapsed": 0.41,
+     "timings": {"build": 0.30, "mass": 0.0001, "export.stl+glb": 0.12, "export.step": 0.05},
+     "exports": {"stl": "out/r3.stl", "glb": "out/r3.glb", "step": "out/r3.step"},
+     "mass_properties": {"volume": ..., "mass": ..., "center": [...], "inertia": [[...], ...]}}
+
+The input is read lazily and at most --max-pending designs are in flight, so memory stays bounded
+however long the stream is. Lines are parsed in the workers: a malformed line only fails its own
+result. With --ork the input is an OpenRocket .ork file or a directory of them (see openrocket.py),
+read in the workers as well; "line" then numbers the designs. The exit status is 1 if any design failed.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from typing import Iterable, Iterator, NamedTuple, Optional
+from .batch import run_pool
+from .export import DEFAULT_ANGULAR_DEFLECTION, WRITERS
+from .openrocket import iter_ork_files, read_ork
+from .projectManager import BUILD_MODES, ProjectManager
+from .spec import apply_spec
+
+
+class BuildOptions(NamedTuple):
+    export_dir: Optional[str]
+    formats: tuple
+    build_mode: str
+    density: float
+    linear_deflection: Optional[float]  # None for the default of the unit of each design
+    angular_deflection: float
+    ork: bool = False     # lines are .ork paths instead of JSON specs
+    scale: float = 1.0    # applied to the lengths of .ork designs
+
+
+def read_lines(stream) -> Iterator[tuple]:
+    """
+    Yields (line number, text) for every non-blank line of a text stream, reading it lazily.
+    """
+    for number, text in enumerate(stream, 1):
+        if text.strip():
+            yield number, text
+
+
+def _mass_json(props) -> dict:
+    return {
+        "volume": float(props.volume),
+        "mass": float(props.mass),
+        "center": [float(c) for c in props.center],
+        "inertia": [[float(v) for v in row] for row in props.inertia],
+    }
+
+
+def build_line(index: int, line: tuple, options: BuildOptions) -> dict:
+    """
+    Builds, measures and exports the design of one input line. Returns its result record; errors are
+    reported in it rather than raised.
+    """
+    number, text = line
+    start = time.perf_counter()
+    result = {"line": number, "name": None, "ok": False, "error": None, "elapsed": None,
+              "timings": {}, "exports": {}, "mass_properties": None}
+    timings = result["timings"]
+
+    try:
+        if options.ork:
+            result["name"] = os.path.splitext(os.path.basename(text))[0]
+        spec = read_ork(text, options.scale) if options.ork else json.loads(text)
+        if isinstance(spec, dict):
+            # unnamed designs would all export to the same file
+            result["name"] = spec.get("name") or f"design{number}"
+
+        step = time.perf_counter()
+        manager = apply_spec(ProjectManager(name=result["name"], build_mode=options.build_mode, density=options.density), spec)
+        timings["build"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        result["mass_properties"] = _mass_json(manager.massProperties())
+        timings["mass"] = time.perf_counter() - step
+
+        formats = options.formats if options.export_dir else ()
+        mesh_formats = [format for format in formats if format in WRITERS]
+        if mesh_formats:
+            # tessellated once for all the mesh formats
+            step = time.perf_counter()
+            result["exports"].update(manager.exportFormats(options.export_dir, mesh_formats, options.linear_deflection, options.angular_deflection))
+            timings["export." + "+".join(mesh_formats)] = time.perf_counter() - step
+
+        for format in formats:
+            if format in WRITERS:
+                continue
+            step = time.perf_counter()
+            result["exports"][format] = manager.exportProject(options.export_dir, format, options.linear_deflection, options.angular_deflection)
+            timings["export." + format] = time.perf_counter() - step
+
+        result["ok"] = True
+    except Exception:
+        result["error"] = traceback.format_exc().strip().splitlines()[-1]
+
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def run(lines: Iterable[tuple], output, options: BuildOptions, max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None) -> tuple:
+    """
+    Builds every (line number, text) spec line across a process pool and writes a JSON result line to
+    output as each one finishes. Returns the number of designs that succeeded and failed.
+    """
+    succeeded = failed = 0
+
+    for result in run_pool(build_line, lines, (options,), max_workers, max_pending, load_cq=options.build_mode != "mesh"):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        if result["ok"]:
+            succeeded += 1
+        else:
+            failed += 1
+
+    return succeeded, failed
+
+
+def main(argv: Optional[list] = None) -> int:
+
+    parser = argparse.ArgumentParser(prog="python -m pyCadUtils", description="Builds rocket specs read as JSON lines and writes one JSON result line per design.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of rocket specs, - for stdin (default)")
+    parser.add_argument("--ork", action="store_true", help="the input is an OpenRocket .ork file or a directory of them")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor applied to the lengths of .ork designs (default: 1, meters)")
+    parser.add_argument("-o", "--output", default="-", help="file to write the result lines to, - for stdout (default)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--max-pending", type=int, default=None, help="designs in flight at once (default: twice the workers)")
+    parser.add_argument("--export-dir", help="folder to export the designs to (no export if omitted)")
+    parser.add_argument("--format", action="append", dest="formats", help="export format, may be repeated (default: stl)")
+    parser.add_argument("--build-mode", default="revolve", choices=BUILD_MODES, help="how the parts are built (default: revolve)")
+    parser.add_argument("--density", type=float, default=1.0, help="density of the parts, for the mass properties (default: 1)")
+    parser.add_argument("--linear-deflection", type=float, default=None, help="mesh export linear deflection, in the unit of the design (default: 1 mm)")
+    parser.add_argument("--angular-deflection", type=float, default=DEFAULT_ANGULAR_DEFLECTION, help="mesh export angular deflection")
+    args = parser.parse_args(argv)
+
+    if args.export_dir:
+        os.makedirs(args.export_dir, exist_ok=True)
+
+    options = BuildOptions(
+        export_dir=args.export_dir,
+        formats=tuple(f.lower() for f in args.formats or ["stl"]),
+        build_mode=args.build_mode,
+        density=args.density,
+        linear_deflection=args.linear_deflection,
+        angular_deflection=args.angular_deflection,
+        ork=args.ork,
+        scale=args.scale,
+    )
+
+    if args.ork:
+        source = None
+        lines = enumerate(iter_ork_files(args.input), 1)
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input, "r")
+        lines = read_lines(source)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        succeeded, failed = run(lines, output, options, args.workers, args.max_pending)
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{succeeded} built, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
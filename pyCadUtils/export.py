@@ -0,0 +1,542 @@
+from __future__ import annotations
+import json
+import os
+import struct
+import zipfile
+from collections import OrderedDict
+from typing import Iterable, Iterator, NamedTuple, Optional
+import numpy as np
+from ._lazy import cq
+from .trace import span
+
+# Length units of a model, as 3MF names them, and their size in meters. 3MF records the unit and GLB is
+# scaled to meters; the other formats have no unit.
+UNITS = {"micron": 1e-6, "millimeter": 1e-3, "centimeter": 1e-2, "inch": 0.0254, "foot": 0.3048, "meter": 1.0}
+DEFAULT_UNIT = "millimeter"
+
+# Absolute linear deflection in meters (1 mm) and angular deflection in radians. cq.exporters.export
+# defaults to a tolerance of 0.1, relative to the size of the shape for STL; these are finer and do not
+# depend on the size of the part. Functions that know the unit of the model convert the linear deflection
+# to it (see default_linear_deflection); the others take it as is, in model units.
+DEFAULT_LINEAR_DEFLECTION = 1e-3
+DEFAULT_ANGULAR_DEFLECTION = 0.1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MiB of vertex/triangle data
+
+# Triangles packed and written per write() call
+CHUNK_TRIANGLES = 65536
+
+# Record of a triangle in a binary STL file, after the 80 byte header and the triangle count
+STL_TRIANGLE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+
+
+def _check_unit(unit: str) -> None:
+    if unit not in UNITS:
+        raise ValueError(f"Unknown unit: {unit}, expected one of {sorted(UNITS)}")
+
+
+def default_linear_deflection(unit: str = DEFAULT_UNIT) -> float:
+    """
+    DEFAULT_LINEAR_DEFLECTION in the length unit of a model (see UNITS), so that a part gets the same
+    chord error whatever unit it is modelled in.
+    """
+    _check_unit(unit)
+    return DEFAULT_LINEAR_DEFLECTION / UNITS[unit]
+
+
+class Mesh(NamedTuple):
+    vertices: np.ndarray   # (n, 3) float64
+    triangles: np.ndarray  # (m, 3) int64, counter-clockwise seen from outside
+
+    @property
+    def nbytes(self) -> int:
+        return self.vertices.nbytes + self.triangles.nbytes
+
+    def transformed(self, matrix: np.ndarray) -> "Mesh":
+        """
+        Applies a 3x4 affine matrix to the vertices.
+        """
+        return Mesh(self.vertices @ matrix[:, :3].T + matrix[:, 3], self.triangles)
+
+
+def location_matrix(location: cq.Location) -> np.ndarray:
+    """
+    3x4 affine matrix of a location.
+    """
+    trsf = location.wrapped.Transformation()
+    return np.array([[trsf.Value(i, j) for j in range(1, 5)] for i in range(1, 4)])
+
+
+def triangulate(shape: cq.Shape, linear_deflection: float, angular_deflection: float, parallel: bool = True, clean: bool = True) -> Mesh:
+    """
+    Tessellates a shape with an absolute linear deflection. With parallel, OCC meshes the faces on several threads.
+
+    OCC keeps any finer triangulation already stored on the shape, so by default it is cleaned first to
+    honour the requested deflection. Pass clean=False to read back a triangulation just made for it.
+    """
+    from OCP.BRep import BRep_Tool
+    from OCP.BRepMesh import BRepMesh_IncrementalMesh
+    from OCP.BRepTools import BRepTools
+    from OCP.TopAbs import TopAbs_Orientation
+    from OCP.TopLoc import TopLoc_Location
+
+    if clean:
+        BRepTools.Clean_s(shape.wrapped)
+    BRepMesh_IncrementalMesh(shape.wrapped, linear_deflection, False, angular_deflection, parallel)
+
+    vertices = []
+    triangles = []
+    offset = 0
+
+    for face in shape.Faces():
+        loc = TopLoc_Location()
+        poly = BRep_Tool.Triangulation_s(face.wrapped, loc)
+        if poly is None:
+            continue
+
+        trsf = loc.Transformation()
+        nodes = (poly.Node(i).Transformed(trsf) for i in range(1, poly.NbNodes() + 1))
+        vertices.append(np.array([(p.X(), p.Y(), p.Z()) for p in nodes], dtype=np.float64))
+
+        tris = np.array([t.Get() for t in poly.Triangles()], dtype=np.int64) - 1 + offset
+        if face.wrapped.Orientation() == TopAbs_Orientation.TopAbs_REVERSED:
+            tris = tris[:, [0, 2, 1]]
+        triangles.append(tris)
+
+        offset += poly.NbNodes()
+
+    if not vertices:
+        return Mesh(np.empty((0, 3)), np.empty((0, 3), dtype=np.int64))
+
+    return Mesh(np.concatenate(vertices), np.concatenate(triangles))
+
+
+def exact_bounds(shapes: Iterable[cq.Shape]) -> tuple:
+    """
+    (xmin, ymin, zmin, xmax, ymax, zmax) of shapes, from their exact geometry. Shape.BoundingBox also
+    encloses any triangulation stored on a shape, and triangulate leaves its own on the shapes, shared
+    through the shape cache, where it sags off curved faces.
+    """
+    from OCP.Bnd import Bnd_Box
+    from OCP.BRepBndLib import BRepBndLib
+
+    box = Bnd_Box()
+    for shape in shapes:
+        BRepBndLib.AddOptimal_s(shape.wrapped, box, False, False)
+    lower, upper = box.CornerMin(), box.CornerMax()
+    return (lower.X(), lower.Y(), lower.Z(), upper.X(), upper.Y(), upper.Z())
+
+
+class MeshCache:
+
+    """
+    An LRU cache of part meshes, bounded by the size of their arrays.
+
+    Meshes are stored for the shape at the origin (its location stripped), so every placed copy of a
+    part (the fins of a set, a part that moved on the stack, the same part in a later export) shares
+    one tessellation and only has its vertices transformed.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (shape, linear, angular) -> Mesh
+        self._size = 0
+        self._premeshed = set()        # keys whose shape was just tessellated by premesh()
+        self.hits = 0
+        self.misses = 0
+
+    def mesh(self, shape: cq.Shape, linear_deflection: float, angular_deflection: float) -> Mesh:
+        """
+        Returns the mesh of a placed shape, tessellating it only if its geometry has not been seen.
+        """
+        local = shape.located(cq.Location())
+        key = (local, linear_deflection, angular_deflection)
+
+        mesh = self._entries.get(key)
+        if mesh is None:
+            self.misses += 1
+            premeshed = key in self._premeshed
+            self._premeshed.discard(key)
+            with span("export.tessellate", premeshed=premeshed) as sp:
+                mesh = triangulate(local, linear_deflection, angular_deflection, clean=not premeshed)
+                sp.set(triangles=len(mesh.triangles))
+            if mesh.nbytes <= self.max_bytes:
+                self._entries[key] = mesh
+                self._size += mesh.nbytes
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= evicted.nbytes
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+        return mesh.transformed(location_matrix(shape.location()))
+
+    def premesh(self, shapes: Iterable[cq.Shape], linear_deflection: float, angular_deflection: float) -> None:
+        """
+        Tessellates all the uncached shapes in a single parallel OCC pass, so that the following
+        mesh() calls only read the triangulations back.
+        """
+        from OCP.BRepMesh import BRepMesh_IncrementalMesh
+        from OCP.BRepTools import BRepTools
+        from OCP.TopoDS import TopoDS_Builder, TopoDS_Compound
+
+        pending = {shape.located(cq.Location()) for shape in shapes}
+        pending = [s for s in pending if (s, linear_deflection, angular_deflection) not in self._entries]
+        if not pending:
+            return
+
+        compound = TopoDS_Compound()
+        builder = TopoDS_Builder()
+        builder.MakeCompound(compound)
+        for shape in pending:
+            builder.Add(compound, shape.wrapped)
+
+        with span("export.premesh", parts=len(pending)):
+            BRepTools.Clean_s(compound)
+            BRepMesh_IncrementalMesh(compound, linear_deflection, False, angular_deflection, True)
+        self._premeshed.update((s, linear_deflection, angular_deflection) for s in pending)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._premeshed.clear()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+# Process-wide cache used by the exporters
+mesh_cache = MeshCache()
+
+
+def split_solids(shapes: Iterable[cq.Shape]) -> list:
+    """
+    Breaks compounds into their solids so that each one is tessellated (and cached) on its own.
+    """
+    parts = []
+    for shape in shapes:
+        solids = shape.Solids() if isinstance(shape, cq.Compound) else []
+        parts += solids if solids else [shape]
+    return parts
+
+
+def iter_meshes(shapes: Iterable[cq.Shape], linear_deflection: float = DEFAULT_LINEAR_DEFLECTION,
+                angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION, parallel: bool = True) -> Iterator[Mesh]:
+    """
+    Yields the mesh of every solid, in order. With parallel, every solid not yet cached is tessellated
+    up front in one multi-threaded OCC pass.
+    """
+    parts = split_solids(shapes)
+
+    if parallel:
+        mesh_cache.premesh(parts, linear_deflection, angular_deflection)
+
+    for shape in parts:
+        yield mesh_cache.mesh(shape, linear_deflection, angular_deflection)
+
+
+def _stl_records(mesh: Mesh, start: int, stop: int) -> np.ndarray:
+    corners = mesh.vertices[mesh.triangles[start:stop]]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+    records = np.zeros(stop - start, dtype=STL_TRIANGLE)
+    records["normal"] = normals
+    records["vertices"] = corners
+    return records
+
+
+def write_stl(meshes: Iterable[Mesh], f) -> int:
+    """
+    Writes meshes as one binary STL to an open binary file, a chunk of triangles at a time.
+
+    The triangle count in the header is patched at the end when the file is seekable; otherwise the
+    meshes are collected first to count them. Returns the number of triangles written.
+    """
+    if not f.seekable():
+        meshes = list(meshes)
+        count = sum(len(m.triangles) for m in meshes)
+    else:
+        count = 0
+
+    start = f.tell() if f.seekable() else 0
+    f.write(b"pyCadUtils binary STL".ljust(80, b" "))
+    f.write(struct.pack("<I", count))
+
+    written = 0
+    for mesh in meshes:
+        for chunk in range(0, len(mesh.triangles), CHUNK_TRIANGLES):
+            records = _stl_records(mesh, chunk, min(chunk + CHUNK_TRIANGLES, len(mesh.triangles)))
+            f.write(records.tobytes())
+            written += len(records)
+
+    if f.seekable():
+        end = f.tell()
+        f.seek(start + 80)
+        f.write(struct.pack("<I", written))
+        f.seek(end)
+
+    return written
+
+
+_3MF_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+"""
+
+_3MF_RELS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+"""
+
+
+def write_3mf(meshes: Iterable[Mesh], f, unit: str = DEFAULT_UNIT) -> int:
+    """
+    Writes meshes as the objects of a 3MF package to an open binary file, in model units (see UNITS). The
+    model XML is streamed into the archive one chunk of vertices/triangles at a time. Returns the number of
+    triangles written.
+    """
+    _check_unit(unit)
+    written = 0
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _3MF_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _3MF_RELS)
+
+        with archive.open("3D/3dmodel.model", "w") as model:
+            model.write(
+                f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<model unit="{unit}" xml:lang="en-US" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">\n'
+                f'<resources>\n'.encode()
+            )
+
+            object_id = 0
+            for mesh in meshes:
+                object_id += 1
+                model.write(f'<object id="{object_id}" type="model"><mesh><vertices>\n'.encode())
+                for chunk in range(0, len(mesh.vertices), CHUNK_TRIANGLES):
+                    rows = mesh.vertices[chunk:chunk + CHUNK_TRIANGLES].tolist()
+                    model.write("".join('<vertex x="%.9g" y="%.9g" z="%.9g"/>\n' % tuple(v) for v in rows).encode())
+                model.write(b"</vertices><triangles>\n")
+                for chunk in range(0, len(mesh.triangles), CHUNK_TRIANGLES):
+                    rows = mesh.triangles[chunk:chunk + CHUNK_TRIANGLES].tolist()
+                    model.write("".join('<triangle v1="%d" v2="%d" v3="%d"/>\n' % tuple(t) for t in rows).encode())
+                model.write(b"</triangles></mesh></object>\n")
+                written += len(mesh.triangles)
+
+            model.write(b"</resources>\n<build>\n")
+            model.write("".join(f'<item objectid="{i}"/>\n' for i in range(1, object_id + 1)).encode())
+            model.write(b"</build>\n</model>\n")
+
+    return written
+
+
+def write_obj(meshes: Iterable[Mesh], f) -> int:
+    """
+    Writes meshes as the objects of a Wavefront OBJ file to an open binary file, a chunk at a time.
+    Returns the number of triangles written.
+    """
+    f.write(b"# pyCadUtils OBJ\n")
+
+    written = 0
+    offset = 1  # OBJ indices start at 1 and run across objects
+    for number, mesh in enumerate(meshes, 1):
+        f.write(f"o part{number}\n".encode())
+        for chunk in range(0, len(mesh.vertices), CHUNK_TRIANGLES):
+            rows = mesh.vertices[chunk:chunk + CHUNK_TRIANGLES].tolist()
+            f.write("".join("v %.9g %.9g %.9g\n" % tuple(v) for v in rows).encode())
+        for chunk in range(0, len(mesh.triangles), CHUNK_TRIANGLES):
+            rows = (mesh.triangles[chunk:chunk + CHUNK_TRIANGLES] + offset).tolist()
+            f.write("".join("f %d %d %d\n" % tuple(t) for t in rows).encode())
+        offset += len(mesh.vertices)
+        written += len(mesh.triangles)
+
+    return written
+
+
+_PLY_FACE = np.dtype([("count", "u1"), ("vertices", "<i4", (3,))])
+
+
+def write_ply(meshes: Iterable[Mesh], f) -> int:
+    """
+    Writes meshes as one binary PLY to an open binary file. Returns the number of triangles written.
+    """
+    meshes = list(meshes)  # the header needs the counts
+    vertex_count = sum(len(m.vertices) for m in meshes)
+    triangle_count = sum(len(m.triangles) for m in meshes)
+
+    f.write(
+        "ply\nformat binary_little_endian 1.0\ncomment pyCadUtils\n"
+        f"element vertex {vertex_count}\nproperty float x\nproperty float y\nproperty float z\n"
+        f"element face {triangle_count}\nproperty list uchar int vertex_indices\nend_header\n".encode()
+    )
+
+    for mesh in meshes:
+        for chunk in range(0, len(mesh.vertices), CHUNK_TRIANGLES):
+            f.write(mesh.vertices[chunk:chunk + CHUNK_TRIANGLES].astype("<f4").tobytes())
+
+    offset = 0
+    for mesh in meshes:
+        for chunk in range(0, len(mesh.triangles), CHUNK_TRIANGLES):
+            triangles = mesh.triangles[chunk:chunk + CHUNK_TRIANGLES]
+            records = np.empty(len(triangles), dtype=_PLY_FACE)
+            records["count"] = 3
+            records["vertices"] = triangles + offset
+            f.write(records.tobytes())
+        offset += len(mesh.vertices)
+
+    return triangle_count
+
+
+class Instance(NamedTuple):
+    meshes: tuple   # meshes of one geometry, at the origin
+    matrices: list  # 3x4 placements of the geometry, one per copy
+
+
+_IDENTITY = np.eye(4)[:3]
+
+
+def instanced(items: Iterable) -> Iterator[Mesh]:
+    """
+    Yields every placed copy of the meshes of Instances, and plain Meshes as they are.
+    """
+    for item in items:
+        if isinstance(item, Mesh):
+            yield item
+        else:
+            for matrix in item.matrices:
+                for mesh in item.meshes:
+                    yield mesh.transformed(matrix)
+
+
+_GLB_MAGIC = 0x46546C67
+_GLB_JSON = 0x4E4F534A
+_GLB_BIN = 0x004E4942
+
+# glTF is Y up: the root node turns the Z up model upright (column-major)
+_GLTF_Y_UP = [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, -1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+def write_glb(items: Iterable, f, unit: str = DEFAULT_UNIT) -> int:
+    """
+    Writes meshes as a binary glTF (GLB) to an open binary file. Items are Meshes or Instances: the
+    vertices and triangles of an Instance are stored once and referenced by one node per placement.
+    glTF is in meters: the root node scales the model from its unit (see UNITS).
+    Returns the number of triangles in the scene.
+    """
+    _check_unit(unit)
+    instances = [Instance((item,), [_IDENTITY]) if isinstance(item, Mesh) else item for item in items]
+
+    nodes = [{"matrix": [UNITS[unit] * v for v in _GLTF_Y_UP[:15]] + [1.0]}]
+    gltf_meshes, accessors, views, buffers = [], [], [], []
+    children = []
+    offset = 0
+    written = 0
+
+    for instance in instances:
+        primitives = []
+        for mesh in instance.meshes:
+            if not len(mesh.triangles):
+                continue
+            vertices = mesh.vertices.astype("<f4")
+            views.append({"buffer": 0, "byteOffset": offset, "byteLength": vertices.nbytes, "target": 34962})
+            accessors.append({"bufferView": len(views) - 1, "componentType": 5126, "count": len(vertices), "type": "VEC3",
+                              "min": vertices.min(axis=0).tolist(), "max": vertices.max(axis=0).tolist()})
+            offset += vertices.nbytes
+            views.append({"buffer": 0, "byteOffset": offset, "byteLength": 12 * len(mesh.triangles), "target": 34963})
+            accessors.append({"bufferView": len(views) - 1, "componentType": 5125, "count": 3 * len(mesh.triangles), "type": "SCALAR"})
+            offset += 12 * len(mesh.triangles)
+            primitives.append({"attributes": {"POSITION": len(accessors) - 2}, "indices": len(accessors) - 1, "mode": 4})
+            buffers.append(mesh)
+
+        if not primitives:
+            continue
+        gltf_meshes.append({"primitives": primitives})
+        for matrix in instance.matrices:
+            children.append(len(nodes))
+            nodes.append({"mesh": len(gltf_meshes) - 1, "matrix": np.vstack([matrix, [0.0, 0.0, 0.0, 1.0]]).T.ravel().tolist()})
+            written += sum(len(m.triangles) for m in instance.meshes)
+
+    if children:
+        nodes[0]["children"] = children
+    gltf = {"asset": {"version": "2.0", "generator": "pyCadUtils"}, "scene": 0, "scenes": [{"nodes": [0]}], "nodes": nodes}
+    if gltf_meshes:
+        gltf.update(meshes=gltf_meshes, accessors=accessors, bufferViews=views, buffers=[{"byteLength": offset}])
+
+    document = json.dumps(gltf, separators=(",", ":")).encode()
+    document += b" " * (-len(document) % 4)
+
+    f.write(struct.pack("<III", _GLB_MAGIC, 2, 12 + 8 + len(document) + (8 + offset if offset else 0)))
+    f.write(struct.pack("<II", len(document), _GLB_JSON))
+    f.write(document)
+
+    if offset:
+        f.write(struct.pack("<II", offset, _GLB_BIN))
+        for mesh in buffers:
+            # every block is a multiple of 4 bytes, so no padding is needed between them
+            f.write(mesh.vertices.astype("<f4").tobytes())
+            for chunk in range(0, len(mesh.triangles), CHUNK_TRIANGLES):
+                f.write(mesh.triangles[chunk:chunk + CHUNK_TRIANGLES].astype("<u4").tobytes())
+
+    return written
+
+
+WRITERS = {
+    "stl": write_stl,
+    "3mf": write_3mf,
+    "obj": write_obj,
+    "ply": write_ply,
+    "glb": write_glb,
+}
+
+# Writers that record the unit of the model
+_UNIT_WRITERS = ("3mf", "glb")
+
+
+def write_meshes(format: str, meshes: Iterable, f, unit: str = DEFAULT_UNIT) -> int:
+    """
+    Writes meshes to an open binary file with the writer of format (see WRITERS), passing the unit of
+    the model to the formats that record it. Returns the number of triangles written.
+    """
+    if format in _UNIT_WRITERS:
+        return WRITERS[format](meshes, f, unit)
+    return WRITERS[format](meshes, f)
+
+
+def export_shapes(shapes: Iterable[cq.Shape], path: str, format: Optional[str] = None,
+                  linear_deflection: Optional[float] = None, angular_deflection: Optional[float] = None,
+                  parallel: bool = True, unit: str = DEFAULT_UNIT) -> int:
+    """
+    Tessellates every solid on its own and streams the result to a mesh file (see WRITERS).
+
+    Arguments:
+        shapes(:Iterable[cq.Shape]:): shapes to export, compounds are split into their solids.
+        path(:str:): output file.
+        format(:str:): "stl", "3mf", "obj", "ply" or "glb", taken from the extension of path if not given.
+        linear_deflection(:float:): maximum distance between mesh and surface, in model units. Defaults to
+                                    default_linear_deflection(unit).
+        angular_deflection(:float:): maximum angle between adjacent triangles, in radians.
+        parallel(:bool:): tessellate the solids in one multi-threaded OCC pass.
+        unit(:str:): length unit of the model, see UNITS.
+
+    Returns:
+        The number of triangles written.
+    """
+    format = (format or os.path.splitext(path)[1].lstrip(".")).lower()
+    if format not in WRITERS:
+        raise ValueError(f"Unsupported mesh format: {format}")
+
+    meshes = iter_meshes(
+        shapes,
+        default_linear_deflection(unit) if linear_deflection is None else linear_deflection,
+        DEFAULT_ANGULAR_DEFLECTION if angular_deflection is None else angular_deflection,
+        parallel,
+    )
+
+    with span("export.write", format=format, path=path) as sp, open(path, "wb") as f:
+        triangles = write_meshes(format, meshes, f, unit)
+        sp.set(triangles=triangles)
+        return triangles
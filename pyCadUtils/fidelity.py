@@ -0,0 +1,462 @@
+"""
+Geometric fidelity checks between meshes, to prove that a faster build path produces the same parts.
+
+Two meshes are compared by the distances between their surfaces and by their volumes and areas:
+
+    report = compare_meshes(read_stl("candidate.stl"), read_stl("ojiva.stl"))
+    report.hausdorff, report.mean_distance, report.volume_delta, report.area_delta
+
+Distances are measured from points of each surface (its vertices plus random points spread by area) to
+the other surface. The triangles of the other surface are covered with points and the points near a
+point are found with a KD-tree (scipy's cKDTree, or a slower NumPy search without scipy); the search
+widens until no unseen triangle can be closer, so the point-triangle distances taken are exact. Only the
+choice of the points measured from is sampled.
+
+compare_build_paths runs a parameter grid (see parameter_grid, DEFAULT_GRID) through two build modes of
+ProjectManager, by default the "mesh" path against the "boolean" reference, and reports every case:
+
+    python -m pyCadUtils.fidelity --grid
+    python -m pyCadUtils.fidelity candidate.stl reference.stl --max-distance 0.05
+
+Two tessellations of the same surface are each within linear_deflection of it, so by default distances up
+to twice the linear deflection (GRID_LINEAR_DEFLECTION for the grid) pass. The exit status is 1 if any
+comparison fails.
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import re
+import sys
+import time
+from typing import Iterable, Iterator, NamedTuple, Optional
+import numpy as np
+from .export import DEFAULT_ANGULAR_DEFLECTION, DEFAULT_LINEAR_DEFLECTION, STL_TRIANGLE, Mesh
+from .mesh import signed_volume
+from .trace import span
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # optional: _BruteForceTree is used instead
+    cKDTree = None
+
+DEFAULT_SAMPLES = 20000    # random surface points per mesh and direction
+NEIGHBOURS = 8             # covering points first looked up for every point
+LEVELS = 4                 # covers of a surface, each LEVEL_RATIO times finer than the previous one
+LEVEL_RATIO = 4.0
+DEFAULT_MAX_RELATIVE_DELTA = 0.02
+
+# Deflections of the grid: fine enough to tell a wrong part, coarse enough for the grid to run in seconds.
+# OCC does not always refine its triangles on spline surfaces to the linear deflection, so the angular one
+# must not allow more: a chord spanning 0.1 rad sags 0.025 on the 20 mm radius of the largest grid part.
+GRID_LINEAR_DEFLECTION = 0.05
+GRID_ANGULAR_DEFLECTION = 0.1
+GRID_SAMPLES = 5000        # random surface points per mesh and direction in the grid, on top of the vertices
+
+# Components compared by default: every primitive across sizes, thin and thick walls, every nose shape
+DEFAULT_GRID = (
+    ({"type": "body_tube", "length": 100.0}, {"diameter": (10.0, 40.0), "thickness": (0.5, 2.0)}),
+    ({"type": "transition", "length": 30.0, "thickness": 1.5}, {"bottom_diameter": (20.0, 40.0), "top_diameter": (10.0, 30.0)}),
+    ({"type": "nose_cone", "length": 60.0, "diameter": 30.0, "thickness": 1.5},
+     {"shape": ("conical", "ogive", "elliptical", "parabolic", "power_law", "haack")}),
+    ({"type": "fin_set", "count": 4, "root_chord": 40.0, "span": 30.0, "position": 5.0, "thickness": 2.0, "body_diameter": 40.0},
+     {"tip_chord": (10.0, 20.0), "sweep": (0.0, 15.0)}),
+)
+
+
+class FidelityReport(NamedTuple):
+    hausdorff: float           # largest distance between the surfaces, both ways
+    mean_distance: float       # mean distance between the surfaces, both ways
+    volume: float
+    reference_volume: float
+    area: float
+    reference_area: float
+    triangles: int
+    reference_triangles: int
+    elapsed: float
+
+    @property
+    def volume_delta(self) -> float:
+        """Relative difference of the volumes."""
+        return abs(self.volume - self.reference_volume) / max(abs(self.reference_volume), 1e-12)
+
+    @property
+    def area_delta(self) -> float:
+        """Relative difference of the areas."""
+        return abs(self.area - self.reference_area) / max(self.reference_area, 1e-12)
+
+    def within(self, max_distance: float, max_relative_delta: float = DEFAULT_MAX_RELATIVE_DELTA) -> bool:
+        """Whether the surfaces are at most max_distance apart and the volumes and areas agree."""
+        return (self.hausdorff <= max_distance and self.volume_delta <= max_relative_delta
+                and self.area_delta <= max_relative_delta)
+
+
+class GridResult(NamedTuple):
+    component: dict
+    report: Optional[FidelityReport]
+    ok: bool
+    error: Optional[str]
+
+
+def read_stl(path: str, weld: bool = True) -> Mesh:
+    """
+    Reads a binary or ASCII STL file.
+
+    Arguments:
+        path(:str:): STL file.
+        weld(:bool:): merge the identical vertices of neighbouring triangles.
+
+    Returns:
+        A Mesh. Normals are ignored, the orientation is the order of the triangle vertices.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    count = int.from_bytes(data[80:84], "little") if len(data) >= 84 else -1
+    if len(data) == 84 + count * STL_TRIANGLE.itemsize:
+        corners = np.frombuffer(data, dtype=STL_TRIANGLE, count=count, offset=84)["vertices"].reshape(-1, 3)
+    elif data.lstrip().startswith(b"solid"):
+        values = re.findall(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", data)
+        corners = np.array(values, dtype=np.float64).reshape(-1, 3)
+    else:
+        raise ValueError(f"{path}: not a binary or ASCII STL file")
+
+    corners = corners.astype(np.float64)
+    if weld:
+        vertices, triangles = np.unique(corners, axis=0, return_inverse=True)
+        return Mesh(vertices, triangles.reshape(-1, 3).astype(np.int64))
+    return Mesh(corners, np.arange(len(corners), dtype=np.int64).reshape(-1, 3))
+
+
+def merge_meshes(meshes: Iterable[Mesh]) -> Mesh:
+    """
+    A single mesh holding all the triangles of meshes.
+    """
+    meshes = list(meshes)
+    if not meshes:
+        return Mesh(np.empty((0, 3)), np.empty((0, 3), dtype=np.int64))
+    if len(meshes) == 1:
+        return meshes[0]
+    offsets = np.cumsum([0] + [len(m.vertices) for m in meshes[:-1]])
+    return Mesh(np.concatenate([m.vertices for m in meshes]),
+                np.concatenate([m.triangles + o for m, o in zip(meshes, offsets)]))
+
+
+def _as_mesh(mesh) -> Mesh:
+    # a Mesh, meshes to merge or an STL path
+    if isinstance(mesh, Mesh):
+        return mesh
+    if isinstance(mesh, str):
+        return read_stl(mesh)
+    return merge_meshes(mesh)
+
+
+def triangle_areas(mesh: Mesh) -> np.ndarray:
+    a, b, c = (mesh.vertices[mesh.triangles[:, i]] for i in range(3))
+    return np.linalg.norm(np.cross(b - a, c - a), axis=1) / 2
+
+
+def surface_area(mesh: Mesh) -> float:
+    return float(triangle_areas(mesh).sum())
+
+
+def sample_surface(mesh: Mesh, count: int, seed: int = 0) -> tuple:
+    """
+    Random points on a mesh, uniformly spread by area. Returns (points, index of their triangles).
+    """
+    areas = triangle_areas(mesh)
+    rng = np.random.default_rng(seed)
+    faces = rng.choice(len(areas), size=count, p=areas / areas.sum())
+    u, v = rng.random((2, count))
+    flip = u + v > 1  # fold the points of the parallelogram back into the triangle
+    u[flip], v[flip] = 1 - u[flip], 1 - v[flip]
+    a, b, c = (mesh.vertices[mesh.triangles[faces, i]] for i in range(3))
+    return a + u[:, None] * (b - a) + v[:, None] * (c - a), faces
+
+
+def point_triangle_distances(points: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Distance from every point to the triangle (a, b, c) of the same row, degenerate triangles included.
+    """
+    # inside the prism of the triangle: the distance to its plane
+    normal = np.cross(b - a, c - a)
+    length = np.linalg.norm(normal, axis=1)
+    unit = normal / np.where(length > 0, length, 1.0)[:, None]
+    height = np.einsum("ij,ij->i", points - a, unit)
+    projected = points - height[:, None] * unit
+    inside = length > 0
+    for p, q in ((a, b), (b, c), (c, a)):
+        inside &= np.einsum("ij,ij->i", np.cross(q - p, projected - p), normal) >= 0
+    distances = np.where(inside, np.abs(height), np.inf)
+
+    # outside: the distance to the nearest edge
+    for p, q in ((a, b), (b, c), (c, a)):
+        edge = q - p
+        t = np.einsum("ij,ij->i", points - p, edge) / np.maximum(np.einsum("ij,ij->i", edge, edge), 1e-300)
+        nearest = p + np.clip(t, 0.0, 1.0)[:, None] * edge
+        distances = np.minimum(distances, np.linalg.norm(points - nearest, axis=1))
+    return distances
+
+
+class _BruteForceTree:
+
+    # cKDTree.query without scipy: exhaustive search, chunked to bound the memory
+
+    def __init__(self, data: np.ndarray) -> None:
+        self.data = data
+        self._norms = np.einsum("ij,ij->i", data, data)
+
+    def query(self, points: np.ndarray, k: int, workers: int = 1) -> tuple:
+        k = min(k, len(self.data))
+        chunk = max(1, 2 ** 24 // max(len(self.data), 1))
+        distances = np.empty((len(points), k))
+        indices = np.empty((len(points), k), dtype=np.int64)
+        for start in range(0, len(points), chunk):
+            block = points[start:start + chunk]
+            squared = np.einsum("ij,ij->i", block, block)[:, None] - 2 * block @ self.data.T + self._norms
+            nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            indices[start:start + chunk] = nearest
+            distances[start:start + chunk] = np.sqrt(np.maximum(np.take_along_axis(squared, nearest, axis=1), 0.0))
+        return distances, indices
+
+
+def _tree(points: np.ndarray):
+    return cKDTree(points) if cKDTree is not None else _BruteForceTree(points)
+
+
+def _cover(a: np.ndarray, b: np.ndarray, c: np.ndarray, size: float) -> tuple:
+    # Points on every triangle such that each point of a triangle is within size of one of its own points,
+    # and the triangle of every point. A triangle is swept from its shortest edge to the opposite corner,
+    # p = base + t (c - base) with base = a + s (b - a), and cut into columns along s and rows along t. A
+    # step in s moves p by at most the shortest edge and a step in t by at most the longest one, so every
+    # point is within half a column plus half a row, at most size, of the center of its cell. Long thin
+    # triangles get a row of points and triangles smaller than size a single one.
+    edges = np.stack([np.linalg.norm(b - c, axis=1), np.linalg.norm(c - a, axis=1), np.linalg.norm(a - b, axis=1)], axis=1)
+    shortest = edges.argmin(axis=1)[:, None]
+    # rotate the corners so that the shortest edge is (a, b)
+    a, b, c = (np.where(shortest == 0, q, np.where(shortest == 1, r, p)) for p, q, r in ((a, b, c), (b, c, a), (c, a, b)))
+    columns = np.maximum(np.ceil(edges.min(axis=1) / size), 1).astype(np.int64)
+    rows = np.maximum(np.ceil(edges.max(axis=1) / size), 1).astype(np.int64)
+
+    counts = columns * rows
+    faces = np.repeat(np.arange(len(a)), counts)
+    index = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    row, column = np.divmod(index, columns[faces])
+    s = ((column + 0.5) / columns[faces])[:, None]
+    t = ((row + 0.5) / rows[faces])[:, None]
+    base = a[faces] + s * (b[faces] - a[faces])
+    return base + t * (c[faces] - base), faces
+
+
+class _Cover:
+
+    # Points covering some triangles of a surface at a spacing (see _cover), in a KD-tree
+
+    def __init__(self, corners: tuple, faces: np.ndarray, spacing: float) -> None:
+        self.spacing = spacing
+        self.samples, local = _cover(*(corner[faces] for corner in corners), spacing)
+        self.faces = faces[local]
+        self.tree = _tree(self.samples)
+
+    def search(self, corners: tuple, points: np.ndarray, rows: np.ndarray, k: int, best: np.ndarray) -> np.ndarray:
+        """
+        Lowers best[rows] to the distance of the triangles of the k points nearest each of points[rows].
+        Returns how near any other triangle of the cover can be to them.
+        """
+        k = min(k, len(self.samples))
+        sample_distances, nearest = self.tree.query(points[rows], k, workers=-1)
+        sample_distances, nearest = sample_distances.reshape(len(rows), -1), nearest.reshape(len(rows), -1)
+
+        # neighbouring points mostly share their triangle: measure every triangle once per point
+        faces = np.sort(self.faces[nearest], axis=1)
+        first = np.ones(faces.shape, dtype=bool)
+        first[:, 1:] = faces[:, 1:] != faces[:, :-1]
+        pairs = np.nonzero(first)[0]
+        a, b, c = (corner[faces[first]] for corner in corners)
+        candidates = np.full(faces.shape, np.inf)
+        candidates[first] = point_triangle_distances(points[rows[pairs]], a, b, c)
+        best[rows] = np.minimum(best[rows], candidates.min(axis=1))
+
+        # a triangle without a point among the k nearest is at least k-th distance - spacing away
+        if k == len(self.samples):
+            return np.full(len(rows), np.inf)
+        return sample_distances[:, -1] - self.spacing
+
+
+class _Surface:
+
+    # A mesh with KD-trees over points covering its triangles (see _cover), to find the triangles near a
+    # point. The points are about as far apart as the typical shortest edge of the triangles. Triangles
+    # smaller than that are covered more finely in covers of their own (see LEVELS): the search around a
+    # point only has to reach a cover's spacing beyond its nearest triangle, so clusters of tiny triangles
+    # (nose cone tips) are searched over a short distance instead of the coarse spacing.
+
+    def __init__(self, mesh: Mesh) -> None:
+        self.corners = a, b, c = tuple(mesh.vertices[mesh.triangles[:, i]] for i in range(3))
+        edges = np.stack([np.linalg.norm(b - c, axis=1), np.linalg.norm(c - a, axis=1), np.linalg.norm(a - b, axis=1)], axis=1)
+        self.size = max(float(np.median(edges.min(axis=1))), 1e-9)
+
+        # the finest level whose spacing is still the longest edge of the triangle: a single point covers it
+        ratio = self.size / np.maximum(edges.max(axis=1), 1e-300)
+        levels = np.clip(np.floor(np.log(np.maximum(ratio, 1.0)) / np.log(LEVEL_RATIO)), 0, LEVELS - 1).astype(np.int64)
+        self.covers = [_Cover(self.corners, np.nonzero(levels == level)[0], self.size / LEVEL_RATIO ** level)
+                       for level in range(LEVELS) if (levels == level).any()]
+
+    def distances(self, points: np.ndarray) -> np.ndarray:
+        """Exact distance from every point to the surface."""
+        best = np.full(len(points), np.inf)
+        pending = [np.arange(len(points)) for _ in self.covers]
+        k = NEIGHBOURS
+
+        while any(len(rows) for rows in pending):
+            reach = [cover.search(self.corners, points, rows, k, best) if len(rows) else None
+                     for cover, rows in zip(self.covers, pending)]
+            # done with a cover once none of its unseen triangles can be nearer than the best found in any
+            pending = [rows[within < best[rows]] if len(rows) else rows for rows, within in zip(pending, reach)]
+            k *= 4
+
+        return best
+
+
+def compare_meshes(candidate, reference, samples: int = DEFAULT_SAMPLES, seed: int = 0) -> FidelityReport:
+    """
+    Compares two surfaces.
+
+    Arguments:
+        candidate(:Mesh | Iterable[Mesh] | str:): mesh under test, meshes (merged) or an STL path.
+        reference(:Mesh | Iterable[Mesh] | str:): baseline, likewise.
+        samples(:int:): random points measured from on each surface, on top of its vertices.
+        seed(:int:): of the random points, for repeatable reports.
+
+    Returns:
+        A FidelityReport.
+    """
+    start = time.perf_counter()
+    candidate, reference = _as_mesh(candidate), _as_mesh(reference)
+
+    with span("fidelity.compare", triangles=len(candidate.triangles), reference_triangles=len(reference.triangles)):
+        hausdorff = 0.0
+        means = []
+        for source, target in ((candidate, reference), (reference, candidate)):
+            surface = _Surface(target)
+            points, _ = sample_surface(source, samples, seed)
+            random_distances = surface.distances(points)
+            hausdorff = max(hausdorff, float(random_distances.max()), float(surface.distances(source.vertices).max()))
+            means.append(float(random_distances.mean()))
+
+    return FidelityReport(
+        hausdorff=hausdorff,
+        mean_distance=sum(means) / 2,
+        volume=signed_volume(candidate),
+        reference_volume=signed_volume(reference),
+        area=surface_area(candidate),
+        reference_area=surface_area(reference),
+        triangles=len(candidate.triangles),
+        reference_triangles=len(reference.triangles),
+        elapsed=time.perf_counter() - start,
+    )
+
+
+def parameter_grid(base: dict, axes: dict) -> Iterator[dict]:
+    """
+    Yields a copy of the component base for every combination of the values of axes (name -> values).
+    """
+    names = list(axes)
+    for values in itertools.product(*(axes[name] for name in names)):
+        yield {**base, **dict(zip(names, values))}
+
+
+def default_components() -> Iterator[dict]:
+    """The components of DEFAULT_GRID."""
+    for base, axes in DEFAULT_GRID:
+        yield from parameter_grid(base, axes)
+
+
+def build_path_meshes(component: dict, build_mode: str, linear_deflection: float = DEFAULT_LINEAR_DEFLECTION,
+                      angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> list:
+    """
+    Meshes of a single spec component built by ProjectManager in a build mode, as it would export them.
+    """
+    from .projectManager import ProjectManager
+    from .spec import apply_spec
+
+    manager = apply_spec(ProjectManager(build_mode=build_mode), {"components": [component]})
+    return list(manager.tessellate(linear_deflection, angular_deflection))
+
+
+def compare_build_paths(components: Optional[Iterable[dict]] = None, candidate: str = "mesh", reference: str = "boolean",
+                        linear_deflection: float = GRID_LINEAR_DEFLECTION, angular_deflection: float = GRID_ANGULAR_DEFLECTION,
+                        max_distance: Optional[float] = None, max_relative_delta: float = DEFAULT_MAX_RELATIVE_DELTA,
+                        samples: int = GRID_SAMPLES, seed: int = 0) -> Iterator[GridResult]:
+    """
+    Builds every component in two build modes and compares the results.
+
+    Arguments:
+        components(:Iterable[dict]:): spec components (see spec.validate_spec), DEFAULT_GRID if None.
+        candidate(:str:): build mode under test.
+        reference(:str:): build mode of the baseline.
+        linear_deflection(:float:), angular_deflection(:float:): of the tessellations.
+        max_distance(:float:): Hausdorff distance allowed, twice the linear deflection if None.
+        max_relative_delta(:float:): relative volume and area differences allowed.
+        samples(:int:), seed(:int:): see compare_meshes.
+
+    Returns:
+        An iterator of GridResult, one per component. A component that fails to build is reported
+        with its error and ok False.
+    """
+    if max_distance is None:
+        max_distance = 2 * linear_deflection
+
+    for component in default_components() if components is None else components:
+        try:
+            report = compare_meshes(build_path_meshes(component, candidate, linear_deflection, angular_deflection),
+                                    build_path_meshes(component, reference, linear_deflection, angular_deflection),
+                                    samples, seed)
+        except Exception as e:
+            yield GridResult(component, None, False, f"{type(e).__name__}: {e}")
+            continue
+        yield GridResult(component, report, report.within(max_distance, max_relative_delta), None)
+
+
+def _report_json(report: Optional[FidelityReport]) -> Optional[dict]:
+    if report is None:
+        return None
+    return {**report._asdict(), "volume_delta": report.volume_delta, "area_delta": report.area_delta}
+
+
+def main(argv: Optional[list] = None) -> int:
+
+    parser = argparse.ArgumentParser(prog="python -m pyCadUtils.fidelity", description="Compares meshes, or build modes over a parameter grid.")
+    parser.add_argument("stl", nargs="*", help="candidate and reference STL files")
+    parser.add_argument("--grid", action="store_true", help="compare build modes over DEFAULT_GRID instead of STL files")
+    parser.add_argument("--candidate", default="mesh", help="build mode under test (default: mesh)")
+    parser.add_argument("--reference", default="boolean", help="build mode of the baseline (default: boolean)")
+    parser.add_argument("--linear-deflection", type=float, default=GRID_LINEAR_DEFLECTION, help="linear deflection of the grid tessellations")
+    parser.add_argument("--angular-deflection", type=float, default=GRID_ANGULAR_DEFLECTION, help="angular deflection of the grid tessellations")
+    parser.add_argument("--max-distance", type=float, default=None, help="Hausdorff distance allowed (default: twice the linear deflection)")
+    parser.add_argument("--max-relative-delta", type=float, default=DEFAULT_MAX_RELATIVE_DELTA, help="relative volume and area difference allowed")
+    parser.add_argument("--samples", type=int, default=None, help="random points per surface (default: %d, %d for the grid)" % (DEFAULT_SAMPLES, GRID_SAMPLES))
+    args = parser.parse_args(argv)
+
+    if args.grid == bool(args.stl) or (args.stl and len(args.stl) != 2):
+        parser.error("give a candidate and a reference STL file, or --grid")
+
+    max_distance = 2 * args.linear_deflection if args.max_distance is None else args.max_distance
+    if args.grid:
+        results = compare_build_paths(None, args.candidate, args.reference, args.linear_deflection, args.angular_deflection,
+                                      max_distance, args.max_relative_delta, args.samples or GRID_SAMPLES)
+    else:
+        report = compare_meshes(args.stl[0], args.stl[1], args.samples or DEFAULT_SAMPLES)
+        results = [GridResult({"candidate": args.stl[0], "reference": args.stl[1]}, report,
+                              report.within(max_distance, args.max_relative_delta), None)]
+
+    failed = 0
+    for result in results:
+        print(json.dumps({"component": result.component, "ok": result.ok, "error": result.error, "report": _report_json(result.report)}))
+        failed += not result.ok
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
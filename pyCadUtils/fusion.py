@@ -0,0 +1,191 @@
+"""
+Fusion of the parts of a rocket into a single solid, for 3D printing.
+
+All the solids go to one multi-argument BRepAlgoAPI_Fuse instead of a chain of pairwise unions:
+OCC intersects every pair once, can do it on several threads (parallel), and a fuzzy value lets it
+treat faces that are coincident up to rounding (a body tube on top of another, a transition on a
+tube) as shared. The inputs are left untouched (non destructive), so cached primitives stay valid.
+
+Parts that only touch along a line, such as the flat root of a fin on a round body tube, stay separate
+solids after the fuse. Fillers overlapping both (root tabs, see primitives.create_fin_root_tab) are fused
+in with them to join them.
+
+The result comes with a FusionReport: whether the fuse succeeded, whether the shape is valid and
+watertight, and its volume against the volume of the inputs. With a timeout the fuse runs in a forked
+process that is killed if it takes too long or crashes; the fallback result is then the compound of
+the unfused parts, and the report says why.
+"""
+from __future__ import annotations
+import multiprocessing
+import time
+import traceback
+from typing import Iterable, NamedTuple, Optional
+from ._lazy import cq
+from .brep import shape_from_brep, shape_to_brep
+from .export import split_solids
+from .trace import span
+
+DEFAULT_FUZZY_VALUE = 1e-5  # model units
+
+# Relative difference between the fused volume and the volume of the inputs above which the report
+# flags the result: parts of a rocket only touch, fusing them should not change the volume.
+VOLUME_TOLERANCE = 1e-6
+
+
+class FusionReport(NamedTuple):
+    fused: bool            # False when the fuse failed or timed out and the parts were returned unfused
+    valid: bool            # BRepCheck validity of the result
+    watertight: bool       # every shell of the result is closed
+    solids: int            # number of solids in the result, 1 for a single printable solid
+    volume: float
+    input_volume: float    # volume of the inputs, plus the volume the fillers add
+    elapsed: float
+    error: Optional[str]   # why the fuse fell back, or None
+
+    @property
+    def ok(self) -> bool:
+        """A single valid watertight solid, with the volume of the inputs."""
+        return (self.fused and self.valid and self.watertight and self.solids == 1
+                and abs(self.volume - self.input_volume) <= VOLUME_TOLERANCE * max(self.input_volume, 1.0))
+
+
+class FusionResult(NamedTuple):
+    shape: cq.Shape
+    report: FusionReport
+
+
+def fuse_solids(solids: list, fuzzy_value: float = DEFAULT_FUZZY_VALUE, parallel: bool = True, glue: bool = False) -> cq.Shape:
+    """
+    Fuses solids with a single multi-argument boolean and unifies the faces split by it.
+
+    Arguments:
+        solids(:list[cq.Shape]:): solids to fuse.
+        fuzzy_value(:float:): distance below which OCC considers entities coincident, in model units.
+        parallel(:bool:): run the boolean on several threads.
+        glue(:bool:): use the glue option, faster when the solids only touch and never overlap.
+
+    Returns:
+        The fused shape. Raises RuntimeError if OCC fails.
+    """
+    from OCP.BOPAlgo import BOPAlgo_GlueEnum
+    from OCP.BRepAlgoAPI import BRepAlgoAPI_Fuse
+    from OCP.TopTools import TopTools_ListOfShape
+
+    if len(solids) == 1:
+        return solids[0]
+
+    arguments = TopTools_ListOfShape()
+    arguments.Append(solids[0].wrapped)
+    tools = TopTools_ListOfShape()
+    for solid in solids[1:]:
+        tools.Append(solid.wrapped)
+
+    operation = BRepAlgoAPI_Fuse()
+    operation.SetArguments(arguments)
+    operation.SetTools(tools)
+    operation.SetRunParallel(parallel)
+    operation.SetFuzzyValue(fuzzy_value)
+    operation.SetNonDestructive(True)
+    operation.SetUseOBB(True)
+    if glue:
+        operation.SetGlue(BOPAlgo_GlueEnum.BOPAlgo_GlueShift)
+
+    with span("fusion.fuse", solids=len(solids), parallel=parallel, fuzzy_value=fuzzy_value) as sp:
+        operation.Build()
+        if not operation.IsDone():
+            raise RuntimeError("BRepAlgoAPI_Fuse failed")
+        operation.SimplifyResult()
+        fused = cq.Shape.cast(operation.Shape())
+        sp.shape(fused)
+
+    return fused
+
+
+def _fuse_child(connection, solids: list, fuzzy_value: float, parallel: bool, glue: bool) -> None:
+    # runs in the forked process: sends back the BREP of the result, or the traceback
+    try:
+        connection.send((True, shape_to_brep(fuse_solids(solids, fuzzy_value, parallel, glue))))
+    except Exception:
+        connection.send((False, traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def _fuse_with_timeout(solids: list, fuzzy_value: float, parallel: bool, glue: bool, timeout: float) -> cq.Shape:
+
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_fuse_child, args=(sender, solids, fuzzy_value, parallel, glue), daemon=True)
+    process.start()
+    sender.close()
+
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError(f"fusion did not finish in {timeout} s")
+        try:
+            done, payload = receiver.recv()
+        except EOFError:
+            raise RuntimeError(f"fusion process died (exit code {process.exitcode})") from None
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if not done:
+        raise RuntimeError(payload)
+    return shape_from_brep(payload)
+
+
+def fuse_shapes(shapes: Iterable[cq.Shape], fuzzy_value: float = DEFAULT_FUZZY_VALUE, parallel: bool = True,
+                glue: bool = False, timeout: Optional[float] = None, fillers: Iterable[cq.Shape] = (),
+                filler_volume: float = 0.0) -> FusionResult:
+    """
+    Fuses shapes into a single solid and checks the result.
+
+    Arguments:
+        shapes(:Iterable[cq.Shape]:): shapes to fuse, compounds are split into their solids.
+        fuzzy_value(:float:): distance below which OCC considers entities coincident, in model units.
+        parallel(:bool:): run the boolean on several threads.
+        glue(:bool:): use the glue option, faster when the solids only touch and never overlap.
+        timeout(:float:): seconds after which the fuse is abandoned. When set, the fuse runs in a forked
+                          process, which also guards against OCC crashing.
+        fillers(:Iterable[cq.Shape]:): solids fused in to join shapes that only touch along a line. They
+                                       overlap the shapes, so glue must be off.
+        filler_volume(:float:): volume the fillers add outside the shapes, expected on top of theirs.
+
+    Returns:
+        A FusionResult. If the fuse fails or times out, its shape is the compound of the solids, without
+        the fillers, and report.fused is False.
+    """
+    solids = split_solids(shapes)
+    if not solids:
+        raise ValueError("Nothing to fuse")
+
+    arguments = solids + split_solids(fillers)
+
+    start = time.perf_counter()
+    error = None
+    try:
+        if timeout is None:
+            shape = fuse_solids(arguments, fuzzy_value, parallel, glue)
+        else:
+            shape = _fuse_with_timeout(arguments, fuzzy_value, parallel, glue, timeout)
+    except (RuntimeError, TimeoutError) as e:
+        shape = cq.Compound.makeCompound(solids)
+        error = str(e).strip().splitlines()[-1]
+    elapsed = time.perf_counter() - start
+
+    with span("fusion.check"):
+        report = FusionReport(
+            fused=error is None,
+            valid=shape.isValid(),
+            watertight=all(shell.Closed() for shell in shape.Shells()),
+            solids=len(shape.Solids()),
+            volume=shape.Volume(),
+            input_volume=sum(s.Volume() for s in solids) + filler_volume,
+            elapsed=elapsed,
+            error=error,
+        )
+
+    return FusionResult(shape, report)
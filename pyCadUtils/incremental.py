@@ -0,0 +1,203 @@
+"""
+Per-component export with a manifest, rewriting only the components that changed.
+
+Every component of a project (see projectManager.Component) is written to its own file, in its
+local frame with its base at z = 0, and a manifest records where each one goes on the stack:
+
+    <folder>/manifest.json
+    <folder>/<kind>-<hash>.<format>
+
+A file is named by a hash of everything its content depends on (component parameters, format,
+deflections, build modes, unit, library version and the source of the modules that build and mesh
+the parts, see EXPORT_MODULES), not of its placement. The manifest records the sha256 of the bytes of
+every file, so that other tools can check a file against it. On re-export a component whose file
+exists with the content the previous manifest recorded is skipped without being tessellated; moving a
+part only changes the manifest, and identical components (two equal body tubes) share one file. Files
+no longer referenced by the manifest are removed. Files and the manifest are written to a temporary
+name and renamed into place, so a reader never sees a partial file.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+from typing import Iterable, NamedTuple, Optional
+from . import __version__
+from ._lazy import cq
+from .export import DEFAULT_ANGULAR_DEFLECTION, DEFAULT_UNIT, WRITERS, default_linear_deflection, iter_meshes, write_meshes
+from .mesh import component_meshes
+from .store import GEOMETRY_MODULES, source_version
+from .trace import span
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+# Modules of this package whose code decides the content of the exported files
+EXPORT_MODULES = GEOMETRY_MODULES + ("parts", "mesh", "export")
+
+
+class ExportReport(NamedTuple):
+    manifest: str   # path of the manifest
+    written: list   # names of the components whose file was (re)written
+    reused: list    # names of the components whose file was up to date
+    removed: list   # files no longer referenced, deleted
+
+
+def component_hash(component, format: str, linear_deflection: float, angular_deflection: float, build_mode: str,
+                   unit: str = DEFAULT_UNIT) -> str:
+    """
+    Hash of everything the file of a component depends on: the same hash means the same file.
+    """
+    payload = json.dumps(
+        [list(component.key), component.params.get("mode"), format, linear_deflection, angular_deflection, build_mode, unit,
+         __version__, source_version(EXPORT_MODULES)],
+        separators=(",", ":"), default=repr,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    """
+    sha256 of the bytes of a file, as recorded in the manifest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _local_shapes(component) -> list:
+    # the placed shape moved down so that the base of the component is at z = 0
+    base = cq.Location(cq.Vector(0, 0, -component.z_position))
+    return [component.shape.moved(base * loc) for loc in component.locations]
+
+
+def _write_atomic(path: str, write) -> None:
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _write_component(component, path: str, format: str, linear_deflection: float, angular_deflection: float, unit: str) -> None:
+
+    if format in WRITERS:
+        if component.shape is None:
+            meshes = component_meshes(component.key, linear_deflection, angular_deflection)
+        else:
+            meshes = iter_meshes(_local_shapes(component), linear_deflection, angular_deflection)
+        _write_atomic(path, lambda f: write_meshes(format, meshes, f, unit))
+        return
+
+    if component.shape is None:
+        raise ValueError(f"Format {format} needs OCC geometry, not available in mesh build mode")
+
+    # cq.exporters only writes to a path: export next to the target, then rename into place
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix="." + format)
+    os.close(fd)
+    try:
+        cq.exporters.export(cq.Workplane("XY").add(_local_shapes(component)), temporary, exportType=format.upper(),
+                            tolerance=linear_deflection, angularTolerance=angular_deflection)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def read_manifest(folder: str) -> Optional[dict]:
+    """
+    The manifest of a folder written by export_components, or None if there is none.
+    """
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def export_components(components: Iterable, folder: str, format: str, name: str = None, build_mode: str = "revolve",
+                      linear_deflection: float = None, angular_deflection: float = None, unit: str = DEFAULT_UNIT) -> ExportReport:
+    """
+    Writes one file per component and a manifest to folder, skipping the components whose file is up to date.
+
+    Arguments:
+        components(:Iterable[Component]:): the components of a project, see ProjectManager.components.
+        folder(:str:): output folder, created if needed.
+        format(:str:): a mesh format of export.WRITERS, or any format of cq.exporters for OCC geometry ("step", "brep", ...).
+        name(:str:): project name recorded in the manifest.
+        build_mode(:str:): how the components were built, part of the file hashes.
+        linear_deflection(:float:): maximum distance between mesh and surface, in model units. Defaults to
+                                    export.default_linear_deflection(unit).
+        angular_deflection(:float:): maximum angle between adjacent triangles, in radians.
+        unit(:str:): length unit of the model, see export.UNITS.
+
+    Returns:
+        An ExportReport.
+    """
+    format = format.lower()
+    linear_deflection = default_linear_deflection(unit) if linear_deflection is None else linear_deflection
+    angular_deflection = DEFAULT_ANGULAR_DEFLECTION if angular_deflection is None else angular_deflection
+    os.makedirs(folder, exist_ok=True)
+
+    previous = read_manifest(folder)
+    # content of the files as the previous export wrote them; files of an older manifest have none
+    recorded = {e["file"]: e.get("sha256") for e in previous.get("components", [])} if previous is not None else {}
+    checked = {}  # file -> sha256 of its content in this export
+    written, reused, entries = [], [], []
+
+    for component in components:
+        digest = component_hash(component, format, linear_deflection, angular_deflection, build_mode, unit)
+        filename = f"{component.kind}-{digest[:16]}.{format}"
+        path = os.path.join(folder, filename)
+
+        if filename in checked:
+            reused.append(component.name)
+        elif os.path.exists(path) and recorded.get(filename) is not None and file_sha256(path) == recorded[filename]:
+            checked[filename] = recorded[filename]
+            reused.append(component.name)
+        else:
+            with span("export.component", component=component.name, format=format, path=path):
+                _write_component(component, path, format, linear_deflection, angular_deflection, unit)
+            checked[filename] = file_sha256(path)
+            written.append(component.name)
+
+        entries.append({
+            "name": component.name,
+            "kind": component.kind,
+            "hash": digest,
+            "sha256": checked[filename],
+            "file": filename,
+            "translation": [0.0, 0.0, float(component.z_position)],
+        })
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "project": name,
+        "format": format,
+        "linear_deflection": linear_deflection,
+        "angular_deflection": angular_deflection,
+        "unit": unit,
+        "components": entries,
+    }
+    path = os.path.join(folder, MANIFEST_NAME)
+    _write_atomic(path, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+    # files of the previous export that no component uses any more
+    removed = []
+    if previous is not None:
+        used = {e["file"] for e in entries}
+        for entry in previous.get("components", []):
+            stale = entry["file"]
+            if stale not in used and stale not in removed:
+                try:
+                    os.unlink(os.path.join(folder, stale))
+                except FileNotFoundError:
+                    continue
+                removed.append(stale)
+
+    return ExportReport(path, written, reused, removed)
@@ -0,0 +1,231 @@
+"""
+Levels of detail for interactive viewing.
+
+Every component gets a small pyramid of meshes, coarse to fine, generated directly from its
+parameters with NumPy (see mesh.py) and cached per component key, so each level of a part is only
+tessellated once however many times it is viewed, moved or repeated. The deflections of a level are
+relative to the size of the component (LOD_LEVELS), so a level has the same look on a small
+transition as on a large tube.
+
+The level of each component is picked from the on-screen size of the rocket (the coarsest level
+whose chord error stays under pixel_error pixels) and/or a triangle budget for the whole view (the
+finest components are coarsened until it fits):
+
+    meshes = preview_meshes(manager.components, screen_size=800)
+    show(mesh_actor(meshes))
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Iterable, Optional
+import numpy as np
+from .export import Mesh
+from .mesh import component_meshes
+from .trace import span
+
+# (linear deflection relative to the radius of the component, angular deflection), coarse to fine
+LOD_LEVELS = (
+    (0.05, 0.8),
+    (0.01, 0.4),
+    (0.002, 0.2),
+    (0.0005, 0.1),
+)
+
+DEFAULT_PIXEL_ERROR = 0.5
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MiB of vertex/triangle data
+
+
+def component_size(key: tuple) -> float:
+    """
+    Largest radius of a component, from its (kind, inputs) key.
+    """
+    kind, inputs = key
+    if kind == "body_tube":
+        return inputs[1] / 2.0
+    if kind == "transition":
+        return max(inputs[1], inputs[2]) / 2.0
+    if kind == "nose_cone":
+        return inputs[1] / 2.0
+    return inputs[7] / 2.0 + inputs[3]  # fin set: body radius + span
+
+
+def component_extent(key: tuple) -> tuple:
+    """
+    (bottom, top) heights of a component above the base it is placed at.
+    """
+    kind, inputs = key
+    if kind == "fin_set":
+        return inputs[5], inputs[5] + inputs[1]  # position, position + root chord
+    return 0.0, inputs[0]
+
+
+def level_deflections(key: tuple, level: int) -> tuple:
+    """
+    (linear, angular) deflections of a level of a component.
+    """
+    relative, angular = LOD_LEVELS[level]
+    return relative * component_size(key), angular
+
+
+class LodCache:
+
+    """
+    An LRU cache of the levels of detail of components, bounded by the size of their arrays.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (key, level) -> meshes
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def meshes(self, key: tuple, level: int) -> tuple:
+        """
+        Meshes of a level of a component with its base at z = 0. Do not modify the returned arrays.
+        """
+        entry = (key, level)
+        meshes = self._entries.get(entry)
+
+        if meshes is None:
+            self.misses += 1
+            with span("lod.tessellate", kind=key[0], level=level) as sp:
+                # bypass the memoization of component_meshes: the levels are kept here, within max_bytes
+                meshes = component_meshes.__wrapped__(key, *level_deflections(key, level))
+                sp.set(triangles=sum(len(m.triangles) for m in meshes))
+            size = sum(m.nbytes for m in meshes)
+            if size <= self.max_bytes:
+                self._entries[entry] = meshes
+                self._size += size
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= sum(m.nbytes for m in evicted)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(entry)
+
+        return meshes
+
+    def triangles(self, key: tuple, level: int) -> int:
+        return sum(len(m.triangles) for m in self.meshes(key, level))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+# Process-wide cache used by the previews
+lod_cache = LodCache()
+
+
+def select_levels(placements: Iterable, screen_size: Optional[float] = None, triangle_budget: Optional[int] = None,
+                  pixel_error: float = DEFAULT_PIXEL_ERROR, cache: LodCache = lod_cache) -> list:
+    """
+    Level of detail of every component.
+
+    Arguments:
+        placements(:Iterable:): components with a key and a z_position (see ProjectManager.components).
+        screen_size(:float:): height of the whole rocket on screen, in pixels. Without it every component
+                              starts at the finest level.
+        triangle_budget(:int:): maximum number of triangles of the whole view. The finest components are
+                                coarsened one level at a time until it fits, or all are at the coarsest.
+        pixel_error(:float:): chord error allowed on screen, in pixels.
+        cache(:LodCache:): where the levels are kept.
+
+    Returns:
+        The list of levels, in the order of placements.
+    """
+    placements = list(placements)
+    finest = len(LOD_LEVELS) - 1
+    if not placements:
+        return []
+
+    if screen_size is None:
+        levels = [finest] * len(placements)
+    else:
+        extents = [component_extent(p.key) for p in placements]
+        bottom = min(p.z_position + e[0] for p, e in zip(placements, extents))
+        top = max(p.z_position + e[1] for p, e in zip(placements, extents))
+        tolerance = pixel_error * (top - bottom) / screen_size
+
+        levels = []
+        for p in placements:
+            size = component_size(p.key)
+            coarsest_fitting = next((i for i, (relative, _) in enumerate(LOD_LEVELS) if relative * size <= tolerance), finest)
+            levels.append(coarsest_fitting)
+
+    if triangle_budget is not None:
+        triangles = [cache.triangles(p.key, level) for p, level in zip(placements, levels)]
+        while sum(triangles) > triangle_budget and max(levels) > 0:
+            top_level = max(levels)
+            for i, p in enumerate(placements):
+                if levels[i] == top_level:
+                    levels[i] -= 1
+                    triangles[i] = cache.triangles(p.key, levels[i])
+
+    return levels
+
+
+def preview_meshes(placements: Iterable, screen_size: Optional[float] = None, triangle_budget: Optional[int] = None,
+                   pixel_error: float = DEFAULT_PIXEL_ERROR, cache: LodCache = lod_cache) -> list:
+    """
+    Meshes of the components at their level of detail (see select_levels), placed on the stack.
+    """
+    placements = list(placements)
+    levels = select_levels(placements, screen_size, triangle_budget, pixel_error, cache)
+
+    meshes = []
+    for p, level in zip(placements, levels):
+        matrix = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, p.z_position]])
+        meshes += [m.transformed(matrix) for m in cache.meshes(p.key, level)]
+    return meshes
+
+
+def mesh_actor(meshes: Iterable[Mesh], color: Optional[tuple] = None, alpha: float = 1.0, edges: bool = False,
+               specular: bool = True):
+    """
+    A VTK actor showing meshes, for cadquery.vis.show. Imports VTK.
+
+    show only styles the shapes it tessellates itself, so the actor is styled here the same way: color is
+    an RGB triple in [0, 1] (cadquery.vis.DEFAULT_COLOR if None), alpha its opacity, edges draws the
+    triangle edges and specular adds the highlights of show.
+    """
+    from cadquery.vis import DEFAULT_COLOR, SPECULAR, SPECULAR_COLOR, SPECULAR_POWER
+    from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+    from vtkmodules.vtkCommonCore import vtkPoints
+    from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
+    from vtkmodules.vtkRenderingCore import vtkActor, vtkPolyDataMapper
+
+    meshes = list(meshes)
+    vertices = np.concatenate([m.vertices for m in meshes]) if meshes else np.empty((0, 3))
+    offsets = np.cumsum([0] + [len(m.vertices) for m in meshes[:-1]])
+    triangles = np.concatenate([m.triangles + o for m, o in zip(meshes, offsets)]) if meshes else np.empty((0, 3), dtype=np.int64)
+
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(np.ascontiguousarray(vertices), deep=True))
+
+    cells = vtkCellArray()
+    cells.SetData(numpy_to_vtkIdTypeArray(np.arange(0, 3 * len(triangles) + 1, 3), deep=True),
+                  numpy_to_vtkIdTypeArray(np.ascontiguousarray(triangles.ravel()), deep=True))
+
+    data = vtkPolyData()
+    data.SetPoints(points)
+    data.SetPolys(cells)
+
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputData(data)
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+
+    properties = actor.GetProperty()
+    properties.SetColor(*(DEFAULT_COLOR if color is None else color))
+    properties.SetOpacity(alpha)
+    if edges:
+        properties.EdgeVisibilityOn()
+    if specular:
+        properties.SetSpecular(SPECULAR)
+        properties.SetSpecularPower(SPECULAR_POWER)
+        properties.SetSpecularColor(SPECULAR_COLOR)
+    return actor
@@ -0,0 +1,340 @@
+"""
+Analytic mass properties of the parts built by ProjectManager, computed from their parameters without OCC.
+
+The axisymmetric parts are revolved wall sections (see profiles.py): their volume, centroid and inertia
+follow from integrals of polynomials over the section polygon, which Green's theorem turns into
+integrals along its edges that a 3-point Gauss rule evaluates exactly. Fins are prisms over their
+trapezoid. Curved nose cones are integrated over a fine polyline of their profile, so they agree with
+OCC up to the sampling tolerance; every other part is exact.
+
+Inertia tensors are taken about the center of mass, in the model axes, with the usual sign convention
+(products of inertia are -sum(m x y)).
+"""
+from functools import lru_cache
+from math import asin, cos, pi, radians, sin, sqrt
+from typing import NamedTuple
+
+import numpy as np
+
+from .noseshapes import CONICAL, get_shape
+from .profiles import nose_profile
+from .spec import layout
+
+# Surface tolerance of the curved nose cone polylines, as a fraction of the base radius. Finer than the
+# one used to build them, as the OCC spline through the points bulges outside the polyline.
+DEFAULT_RELATIVE_TOLERANCE = 1e-5
+
+# 3-point Gauss-Legendre rule on [0, 1], exact for polynomials up to degree 5
+_GAUSS = (
+    (0.5 - 0.5 * sqrt(3.0 / 5.0), 5.0 / 18.0),
+    (0.5, 8.0 / 18.0),
+    (0.5 + 0.5 * sqrt(3.0 / 5.0), 5.0 / 18.0),
+)
+
+
+class MassProperties(NamedTuple):
+    volume: float
+    mass: float
+    center: np.ndarray   # (3,) center of mass
+    inertia: np.ndarray  # (3, 3) inertia tensor about the center of mass
+
+
+_EMPTY = MassProperties(0.0, 0.0, np.zeros(3), np.zeros((3, 3)))
+
+
+def _vertices(points) -> tuple:
+    # (r, z) or (x, z) vertices -> two (n, ...) arrays; coordinates may be scalars or equally shaped arrays
+    try:
+        coords = np.asarray(points, dtype=float)
+    except ValueError:
+        # scalars mixed with arrays
+        first, second = zip(*points)
+        coords = np.array(np.broadcast_arrays(*first, *second), dtype=float)
+        return coords[:len(first)], coords[len(first):]
+    return coords[:, 0], coords[:, 1]
+
+
+def revolved_integrals(points) -> tuple:
+    """
+    Integrals over the solid obtained by revolving a closed polygon around the z-axis.
+
+    Arguments:
+        points(:list:): polygon vertices (r, z), in either orientation. Coordinates can be NumPy arrays
+            of a common shape, in which case every result is an array of that shape (one polygon per element).
+
+    Returns:
+        (volume, integral of z dV, integral of r^2 dV, integral of z^2 dV)
+    """
+    r0, z0 = _vertices(points)
+    r1, z1 = np.roll(r0, -1, axis=0), np.roll(z0, -1, axis=0)
+    dr, dz = r1 - r0, z1 - z0
+
+    # 2 pi times the area integrals of r, r z, r^3 and r z^2, as contour integrals of their r-antiderivative along dz
+    volume = moment = radial = axial = 0.0
+    for s, w in _GAUSS:
+        r = r0 + s * dr
+        z = z0 + s * dz
+        r2 = r * r
+        wdz = w * dz
+        volume = volume + (wdz * r2 / 2).sum(axis=0)
+        moment = moment + (wdz * r2 * z / 2).sum(axis=0)
+        radial = radial + (wdz * r2 * r2 / 4).sum(axis=0)
+        axial = axial + (wdz * r2 * z * z / 2).sum(axis=0)
+
+    sign = 2 * pi * np.where(volume < 0, -1.0, 1.0)
+    return sign * volume, sign * moment, sign * radial, sign * axial
+
+
+def _from_revolved_integrals(volume, moment, radial, axial, density: float) -> MassProperties:
+    if volume <= 0:
+        return _EMPTY
+
+    mass = density * volume
+    z = moment / volume
+    transverse = density * (radial / 2 + axial) - mass * z * z
+    inertia = np.diag([transverse, transverse, density * radial])
+    return MassProperties(float(volume), float(mass), np.array([0.0, 0.0, z]), inertia)
+
+
+def revolved_properties(points, density: float = 1.0) -> MassProperties:
+    """
+    Mass properties of the solid of revolution of a closed (r, z) polygon around the z-axis.
+    """
+    return _from_revolved_integrals(*map(float, revolved_integrals(points)), density)
+
+
+def cylinder_properties(height: float, radius: float, thickness: float, density: float = 1.0) -> MassProperties:
+    """
+    Mass properties of primitives.create_cylinder, base at z = 0.
+    """
+    inner = max(radius - thickness, 0.0) if thickness is not None and thickness > 0 else 0.0
+    return revolved_properties([(inner, 0.0), (radius, 0.0), (radius, height), (inner, height)], density)
+
+
+def transition_properties(height: float, radius1: float, radius2: float, thickness: float, density: float = 1.0) -> MassProperties:
+    """
+    Mass properties of primitives.create_transition (radius1 at the top, radius2 at the base), base at z = 0.
+    """
+    if thickness is None or thickness <= 0:
+        inner1 = inner2 = 0.0
+    else:
+        inner1, inner2 = max(radius1 - thickness, 0.0), max(radius2 - thickness, 0.0)
+    return revolved_properties([(inner2, 0.0), (radius2, 0.0), (radius1, height), (inner1, height)], density)
+
+
+def conical_scale(height, radius, thickness):
+    """
+    Ratio between the cavity and the outer surface of a hollow conical nose cone. The cavity, bounded by
+    the outer surface offset inwards by the thickness, is the outer cone scaled by this ratio about the
+    center of its base. Accepts NumPy arrays.
+    """
+    if thickness is None:
+        return 0.0 * np.asarray(height)
+    thickness = np.asarray(thickness, dtype=float)
+    scale = 1.0 - thickness * np.sqrt(1.0 / np.square(radius) + 1.0 / np.square(height))
+    return np.where(thickness > 0, np.clip(scale, 0.0, 1.0), 0.0)
+
+
+def cone_properties(height: float, radius: float, thickness: float, density: float = 1.0,
+                    shape: str = "conical", shape_parameter: float = None, tolerance: float = None) -> MassProperties:
+    """
+    Mass properties of primitives.create_cone, base at z = 0.
+    """
+    if get_shape(shape) is CONICAL:
+        # the wall is the full cone minus the cone scaled by k, whose integrals scale with k^3, k^4, k^5, k^5
+        k = float(conical_scale(height, radius, thickness))
+        volume, moment, radial, axial = revolved_integrals([(0.0, 0.0), (radius, 0.0), (0.0, height)])
+        return _from_revolved_integrals(float(volume * (1 - k ** 3)), float(moment * (1 - k ** 4)),
+                                        float(radial * (1 - k ** 5)), float(axial * (1 - k ** 5)), density)
+
+    if tolerance is None:
+        tolerance = DEFAULT_RELATIVE_TOLERANCE * radius
+
+    points = []
+    for _, piece in nose_profile(height, radius, thickness, shape, shape_parameter, tolerance):
+        points.extend(piece if not points else piece[1:])
+    return revolved_properties(points[:-1], density)
+
+
+def planar_integrals(points) -> tuple:
+    """
+    Area integrals over a closed polygon in the (x, z) plane.
+
+    Arguments:
+        points(:list:): polygon vertices (x, z), in either orientation. As for revolved_integrals,
+            coordinates can be NumPy arrays of a common shape.
+
+    Returns:
+        (area, integral of x dA, integral of z dA, integral of x^2 dA, integral of z^2 dA, integral of x z dA)
+    """
+    x0, z0 = _vertices(points)
+    x1, z1 = np.roll(x0, -1, axis=0), np.roll(z0, -1, axis=0)
+
+    # contour integrals of the x-antiderivative of 1, x, z, x^2, z^2 and x z along dz
+    totals = [0.0] * 6
+    for s, w in _GAUSS:
+        x = x0 + s * (x1 - x0)
+        z = z0 + s * (z1 - z0)
+        wdz = w * (z1 - z0)
+        for i, f in enumerate((x, x * x / 2, x * z, x ** 3 / 3, x * z * z, x * x * z / 2)):
+            totals[i] = totals[i] + (wdz * f).sum(axis=0)
+
+    sign = np.where(totals[0] < 0, -1.0, 1.0)
+    return tuple(sign * t for t in totals)
+
+
+def trapezoidal_fin_outline(root_chord, tip_chord, span, sweep) -> list:
+    """
+    (x, z) vertices of the fin drawn by primitives.create_trapezoidal_fin: root from z = 0 to root_chord
+    on the x = 0 edge, tip at x = span with its top edge sweep below the top of the root.
+    """
+    return [(0.0, 0.0), (0.0, root_chord), (span, root_chord - sweep), (span, root_chord - sweep - tip_chord)]
+
+
+def trapezoidal_fin_properties(root_chord: float, tip_chord: float, span: float, sweep: float, thickness: float,
+                               density: float = 1.0) -> MassProperties:
+    """
+    Mass properties of primitives.create_trapezoidal_fin in the frame it is built in: root along the
+    z-axis from 0 to root_chord, span along x and thickness from y = -thickness to 0.
+    """
+    area, sx, sz, sxx, szz, sxz = map(float, planar_integrals(trapezoidal_fin_outline(root_chord, tip_chord, span, sweep)))
+    if area <= 0 or thickness <= 0:
+        return _EMPTY
+
+    volume = area * thickness
+    mass = density * volume
+    x, z = sx / area, sz / area
+
+    # second moments of the trapezoid about its centroid, spread over the thickness
+    xx = density * thickness * (sxx - area * x * x)
+    zz = density * thickness * (szz - area * z * z)
+    xz = density * thickness * (sxz - area * x * z)
+    yy = mass * thickness ** 2 / 12
+
+    inertia = np.array([
+        [yy + zz, 0.0, -xz],
+        [0.0, xx + zz, 0.0],
+        [-xz, 0.0, xx + yy],
+    ])
+    return MassProperties(volume, mass, np.array([x, -thickness / 2, z]), inertia)
+
+
+def fin_root_gap_volume(root_chord: float, thickness: float, body_radius: float) -> float:
+    """
+    Volume between the flat root of a fin, on the x = body_radius plane from y = -thickness to 0 (see
+    trapezoidal_fin_properties), and the round body tube it touches along y = 0: what a root tab adds
+    to the fused rocket (see primitives.create_fin_root_tab).
+    """
+    t = min(thickness, body_radius)
+    # rectangle t * R minus the area under the circle, integral of sqrt(R^2 - y^2) from 0 to t
+    area = t * body_radius - (t * sqrt(body_radius ** 2 - t ** 2) + body_radius ** 2 * asin(t / body_radius)) / 2
+    return area * root_chord
+
+
+def placed(props: MassProperties, offset=(0.0, 0.0, 0.0), angle: float = 0.0) -> MassProperties:
+    """
+    Mass properties of a part rotated by angle degrees around the z-axis, then translated by offset.
+    """
+    if angle:
+        c, s = cos(radians(angle)), sin(radians(angle))
+        rotation = np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+        center = rotation @ props.center + offset
+        inertia = rotation @ props.inertia @ rotation.T
+    else:
+        center = props.center + offset
+        inertia = props.inertia
+    return props._replace(center=center, inertia=inertia)
+
+
+def fin_set_properties(count: int, root_chord: float, tip_chord: float, span: float, sweep: float, position: float,
+                       thickness: float, body_diameter: float, z_position: float = 0.0, density: float = 1.0) -> MassProperties:
+    """
+    Mass properties of a fin set placed as by Fins3DBuilder.create_FinSet, on a body tube whose base is at z_position.
+    """
+    fin = trapezoidal_fin_properties(root_chord, tip_chord, span, sweep, thickness, density)
+    offset = (body_diameter / 2.0, 0.0, position + z_position)
+    return combine([placed(placed(fin, offset), angle=i * 360.0 / count) for i in range(int(count))])
+
+
+def combine(parts) -> MassProperties:
+    """
+    Mass properties of several parts together, the inertia moved to the common center of mass.
+    """
+    parts = [p for p in parts if p.mass > 0]
+    if not parts:
+        return _EMPTY
+
+    masses = np.array([p.mass for p in parts])
+    centers = np.array([p.center for p in parts])
+    mass = masses.sum()
+    center = masses @ centers / mass
+
+    # parallel axis theorem: m (|d|^2 I - d d^T) for every part offset by d from the common center
+    d = centers - center
+    md = masses[:, None] * d
+    inertia = np.sum([p.inertia for p in parts], axis=0) + np.eye(3) * (md * d).sum() - d.T @ md
+
+    return MassProperties(sum(p.volume for p in parts), float(mass), center, inertia)
+
+
+def _density(density, kind: str) -> float:
+    return density.get(kind, 1.0) if isinstance(density, dict) else density
+
+
+@lru_cache(maxsize=4096)
+def component_properties(key: tuple, density: float = 1.0) -> MassProperties:
+    """
+    Mass properties of one spec component with its base at z = 0, from its spec.layout key. Memoized per
+    key and density: every caller gets the same center and inertia arrays, so copy them before changing them.
+    """
+    kind, inputs = key
+
+    if kind == "body_tube":
+        length, diameter, thickness = inputs
+        return cylinder_properties(length, diameter / 2.0, thickness, density)
+    if kind == "transition":
+        # built as Transition3DBuilder does: bottom_diameter goes to radius1, the top of the primitive
+        length, bottom_diameter, top_diameter, thickness = inputs
+        return transition_properties(length, bottom_diameter / 2.0, top_diameter / 2.0, thickness, density)
+    if kind == "nose_cone":
+        length, diameter, thickness, shape, shape_parameter = inputs
+        return cone_properties(length, diameter / 2.0, thickness, density, shape or "conical", shape_parameter)
+
+    count, root_chord, tip_chord, span, sweep, position, thickness, body_diameter = inputs
+    return fin_set_properties(int(count), root_chord, tip_chord, span, sweep, position, thickness, body_diameter, 0.0, density)
+
+
+def rocket_properties(spec: dict, density=1.0) -> MassProperties:
+    """
+    Mass properties of the rocket a spec describes, without building any geometry.
+
+    Arguments:
+        spec(:dict:): rocket spec, see spec.validate_spec.
+        density(:float | dict:): density of every part, or a mapping from component type to density.
+
+    Returns:
+        properties(:MassProperties:): of the whole rocket, in the same frame as ProjectManager builds it.
+    """
+    return combine([
+        placed(component_properties(p.key, _density(density, p.key[0])), (0.0, 0.0, p.z_position))
+        for p in layout(spec["components"])
+    ])
+
+
+def compare_with_occ(props: MassProperties, shapes: list) -> tuple:
+    """
+    Cross-checks analytic mass properties (at density 1) against the OCC solids they describe.
+    Returns (OCC volume, relative volume difference, distance between the centers, relative inertia
+    difference), the last being the largest difference between the inertia tensors over the largest
+    OCC moment.
+    """
+    from ._lazy import cq
+
+    compound = cq.Compound.makeCompound([s for s in shapes if isinstance(s, cq.Shape)])
+    volume = compound.Volume()
+    center = compound.Center()
+    distance = float(np.linalg.norm(props.center - (center.x, center.y, center.z)))
+    # OCC gives the inertia about the center of mass, with the same sign convention
+    inertia = np.array(cq.Shape.matrixOfInertia(compound))
+    inertia_difference = float(np.abs(props.inertia - inertia).max() / np.abs(inertia).max())
+    return volume, float(abs(props.volume - volume) / volume), distance, inertia_difference
@@ -0,0 +1,216 @@
+"""
+Triangle meshes of the primitives generated directly with NumPy, without building OCC solids.
+
+Tubes, transitions and nose cones are revolved from their wall section (see profiles.py): every
+profile point becomes a ring of vertices, or a single vertex on the axis, and every profile edge a
+band of triangles between two rings, so the inner and outer walls and the annular end caps come out
+of the same loop. Fins are prisms over their trapezoid. The meshes are closed and consistently
+oriented (outward normals), ready for export.write_stl / write_3mf.
+
+Resolution follows the export deflections: curved nose cone profiles are sampled to linear_deflection,
+and the number of segments around the axis keeps both the chord error and the angle between
+neighbouring faces within the deflections.
+"""
+from functools import lru_cache
+from math import acos, ceil, cos, pi, radians, sin
+
+import numpy as np
+
+from .export import DEFAULT_ANGULAR_DEFLECTION, DEFAULT_LINEAR_DEFLECTION, DEFAULT_UNIT, Mesh, default_linear_deflection
+from .massprops import trapezoidal_fin_outline
+from .profiles import EPS, nose_profile, transition_profile, tube_profile
+from .spec import layout
+
+MIN_SEGMENTS = 8
+
+
+def segments_for(radius: float, linear_deflection: float = DEFAULT_LINEAR_DEFLECTION,
+                 angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> int:
+    """
+    Number of segments around the axis for a circle of the given radius.
+    """
+    segments = ceil(2 * pi / angular_deflection)
+    if radius > linear_deflection:
+        segments = max(segments, ceil(pi / acos(1 - linear_deflection / radius)))
+    return max(segments, MIN_SEGMENTS)
+
+
+def signed_volume(mesh: Mesh) -> float:
+    """
+    Volume enclosed by a closed mesh, negative if its triangles face inwards.
+    """
+    a, b, c = (mesh.vertices[mesh.triangles[:, i]] for i in range(3))
+    return float(np.einsum("ij,ij->i", a, np.cross(b, c)).sum() / 6)
+
+
+def _outward(vertices: np.ndarray, triangles: np.ndarray) -> Mesh:
+    mesh = Mesh(vertices, triangles)
+    if signed_volume(mesh) < 0:
+        mesh = Mesh(vertices, triangles[:, ::-1].copy())
+    return mesh
+
+
+def profile_points(profile: list) -> np.ndarray:
+    """
+    The closed loop of a profile (see profiles.py) as an (n, 2) array of (r, z) points, splines given by
+    their points, without repeated points.
+    """
+    points = []
+    for _, piece in profile:
+        for p in piece:
+            if not points or abs(p[0] - points[-1][0]) > EPS or abs(p[1] - points[-1][1]) > EPS:
+                points.append(p)
+    if len(points) > 1 and abs(points[0][0] - points[-1][0]) <= EPS and abs(points[0][1] - points[-1][1]) <= EPS:
+        points.pop()
+    return np.array(points, dtype=float)
+
+
+def revolve_profile(profile: list, segments: int) -> Mesh:
+    """
+    Mesh of the solid of revolution of a profile around the z-axis, with the given number of segments.
+    """
+    points = profile_points(profile)
+    on_axis = points[:, 0] <= EPS
+
+    theta = np.arange(segments) * (2 * pi / segments)
+    ring = np.column_stack([np.cos(theta), np.sin(theta)])
+
+    # first vertex of every profile point: one vertex on the axis, a ring of segments vertices elsewhere
+    sizes = np.where(on_axis, 1, segments)
+    first = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    vertices = np.empty((sizes.sum(), 3))
+    for i, (r, z) in enumerate(points):
+        block = vertices[first[i]:first[i] + sizes[i]]
+        block[:, :2] = 0.0 if on_axis[i] else r * ring
+        block[:, 2] = z
+
+    j = np.arange(segments)
+    k = (j + 1) % segments
+    triangles = []
+    for a in range(len(points)):
+        b = (a + 1) % len(points)
+        if on_axis[a] and on_axis[b]:
+            continue  # edge along the axis, sweeps no surface
+        if on_axis[a]:
+            triangles.append(np.column_stack([np.full(segments, first[a]), first[b] + k, first[b] + j]))
+        elif on_axis[b]:
+            triangles.append(np.column_stack([first[a] + j, first[a] + k, np.full(segments, first[b])]))
+        else:
+            triangles.append(np.column_stack([first[a] + j, first[b] + k, first[b] + j]))
+            triangles.append(np.column_stack([first[a] + j, first[a] + k, first[b] + k]))
+
+    return _outward(vertices, np.concatenate(triangles).astype(np.int64))
+
+
+def tube_mesh(height: float, radius: float, thickness: float, linear_deflection: float = DEFAULT_LINEAR_DEFLECTION,
+              angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> Mesh:
+    """
+    Mesh of primitives.create_cylinder, base at z = 0.
+    """
+    return revolve_profile(tube_profile(height, radius, thickness), segments_for(radius, linear_deflection, angular_deflection))
+
+
+def transition_mesh(height: float, radius1: float, radius2: float, thickness: float, linear_deflection: float = DEFAULT_LINEAR_DEFLECTION,
+                    angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> Mesh:
+    """
+    Mesh of primitives.create_transition (radius1 at the top, radius2 at the base), base at z = 0.
+    """
+    segments = segments_for(max(radius1, radius2), linear_deflection, angular_deflection)
+    return revolve_profile(transition_profile(height, radius1, radius2, thickness), segments)
+
+
+def cone_mesh(height: float, radius: float, thickness: float, shape: str = "conical", shape_parameter: float = None,
+              linear_deflection: float = DEFAULT_LINEAR_DEFLECTION, angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> Mesh:
+    """
+    Mesh of primitives.create_cone, base at z = 0. The profile of curved shapes is sampled to linear_deflection.
+    """
+    profile = nose_profile(height, radius, thickness, shape, shape_parameter, linear_deflection)
+    return revolve_profile(profile, segments_for(radius, linear_deflection, angular_deflection))
+
+
+def trapezoidal_fin_mesh(root_chord: float, tip_chord: float, span: float, sweep: float, thickness: float) -> Mesh:
+    """
+    Mesh of primitives.create_trapezoidal_fin, in the frame it is built in (see massprops.trapezoidal_fin_outline).
+    """
+    outline = trapezoidal_fin_outline(root_chord, tip_chord, span, sweep)
+    vertices = np.array([(x, y, z) for y in (0.0, -thickness) for x, z in outline])
+
+    # the trapezoid is convex: fans for both sides, two triangles per edge around it
+    triangles = [(0, 1, 2), (0, 2, 3), (4, 6, 5), (4, 7, 6)]
+    for a in range(4):
+        b = (a + 1) % 4
+        triangles += [(a, a + 4, b + 4), (a, b + 4, b)]
+
+    return _outward(vertices, np.array(triangles, dtype=np.int64))
+
+
+def _placement(angle: float, offset) -> np.ndarray:
+    # 3x4 matrix of a rotation by angle degrees around the z-axis after a translation by offset
+    c, s = cos(radians(angle)), sin(radians(angle))
+    rotation = np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+    return np.column_stack([rotation, rotation @ np.asarray(offset, dtype=float)])
+
+
+def fin_placements(count: int, position: float, body_diameter: float, z_position: float = 0.0) -> list:
+    """
+    3x4 matrices placing the fins of a set as Fins3DBuilder.create_FinLocations, on a body tube whose base is at z_position.
+    """
+    offset = (body_diameter / 2.0, 0.0, position + z_position)
+    return [_placement(i * 360.0 / count, offset) for i in range(int(count))]
+
+
+def fin_set_meshes(count: int, root_chord: float, tip_chord: float, span: float, sweep: float, position: float,
+                   thickness: float, body_diameter: float, z_position: float = 0.0) -> list:
+    """
+    Meshes of the fins of a set placed as by Fins3DBuilder.create_FinSet, on a body tube whose base is at z_position.
+    """
+    fin = trapezoidal_fin_mesh(root_chord, tip_chord, span, sweep, thickness)
+    return [fin.transformed(matrix) for matrix in fin_placements(count, position, body_diameter, z_position)]
+
+
+@lru_cache(maxsize=1024)
+def component_meshes(key: tuple, linear_deflection: float = DEFAULT_LINEAR_DEFLECTION,
+                     angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> tuple:
+    """
+    Meshes of one component with its base at z = 0, from its spec.layout key. The tuple is kept in an LRU
+    cache and its vertex and triangle arrays are handed to every caller; placed_meshes transforms them into
+    new arrays, anything editing them in place must copy them first.
+    """
+    kind, inputs = key
+    deflections = (linear_deflection, angular_deflection)
+
+    if kind == "body_tube":
+        length, diameter, thickness = inputs
+        return (tube_mesh(length, diameter / 2.0, thickness, *deflections),)
+    if kind == "transition":
+        # as Transition3DBuilder: bottom_diameter goes to radius1, the top of the primitive
+        length, bottom_diameter, top_diameter, thickness = inputs
+        return (transition_mesh(length, bottom_diameter / 2.0, top_diameter / 2.0, thickness, *deflections),)
+    if kind == "nose_cone":
+        length, diameter, thickness, shape, shape_parameter = inputs
+        return (cone_mesh(length, diameter / 2.0, thickness, shape or "conical", shape_parameter, *deflections),)
+
+    count, root_chord, tip_chord, span, sweep, position, thickness, body_diameter = inputs
+    return tuple(fin_set_meshes(int(count), root_chord, tip_chord, span, sweep, position, thickness, body_diameter))
+
+
+def placed_meshes(key: tuple, z_position: float, linear_deflection: float = DEFAULT_LINEAR_DEFLECTION,
+                  angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> list:
+    """
+    Meshes of one component with its base at z_position.
+    """
+    matrix = _placement(0.0, (0.0, 0.0, z_position))
+    return [m.transformed(matrix) for m in component_meshes(key, linear_deflection, angular_deflection)]
+
+
+def rocket_meshes(spec: dict, linear_deflection: float = None,
+                  angular_deflection: float = DEFAULT_ANGULAR_DEFLECTION) -> list:
+    """
+    Meshes of every part of the rocket a spec describes, placed as ProjectManager builds them. The linear
+    deflection defaults to export.default_linear_deflection of the unit of the spec.
+    """
+    if linear_deflection is None:
+        linear_deflection = default_linear_deflection(spec.get("unit", DEFAULT_UNIT))
+
+    return [m for p in layout(spec["components"]) for m in placed_meshes(p.key, p.z_position, linear_deflection, angular_deflection)]
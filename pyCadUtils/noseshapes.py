@@ -0,0 +1,146 @@
+import numpy as np
+from typing import Callable, NamedTuple, Optional, Tuple
+
+# Relative surface error used when no tolerance is given, as a fraction of the base radius
+DEFAULT_RELATIVE_TOLERANCE = 1e-3
+
+# Positions, as fractions of a segment, at which sample_profile measures the error of the chord. A quarter
+# catches the largest error of a square-root tip, where the profile is farthest from the chord.
+ERROR_SAMPLES = (0.25, 0.5, 0.75)
+
+
+class NoseConeShape(NamedTuple):
+    """
+    A nose cone shape, following OpenRocket's NoseCone.Shape (see NOSECONE_STRUCTURE_EXPLANATION.md).
+
+    radius_function(x, R, L, k) gives the radius at distance x from the tip for a cone of base radius R
+    and length L. It must accept a NumPy array for x.
+    """
+    name: str
+    parameter_range: Optional[Tuple[float, float]]
+    radius_function: Callable
+    default_parameter: float = 0.0
+
+
+NOSE_CONE_SHAPES = {}
+
+
+def register_shape(shape: NoseConeShape) -> NoseConeShape:
+    """
+    Adds a shape to the registry, replacing any shape with the same name.
+    """
+    NOSE_CONE_SHAPES[shape.name.upper()] = shape
+    return shape
+
+
+def get_shape(name: str) -> NoseConeShape:
+    try:
+        return NOSE_CONE_SHAPES[name.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown nose cone shape: {name}") from None
+
+
+def resolve_parameter(shape: NoseConeShape, parameter: Optional[float]) -> float:
+    """
+    Returns the shape parameter to use, checking it against the range of the shape.
+    """
+    if shape.parameter_range is None or parameter is None:
+        return shape.default_parameter
+
+    low, high = shape.parameter_range
+    if not low <= parameter <= high:
+        raise ValueError(f"Shape parameter {parameter} out of range {shape.parameter_range} for {shape.name}")
+    return float(parameter)
+
+
+def _ogive(x, R, L, k):
+    rho = (R**2 + L**2) / 2.0 / R
+    return np.sqrt(np.maximum(rho**2 - (L - x)**2, 0.0)) + R - rho
+
+
+def _elliptical(x, R, L, k):
+    t = x / L
+    return R * np.sqrt(np.maximum(2 * t - t**2, 0.0))
+
+
+def _power_law(x, R, L, k):
+    return R * (x / L)**k
+
+
+def _parabolic(x, R, L, k):
+    t = x / L
+    return R * (2 * t - k * t**2) / (2 - k)
+
+
+def _haack(x, R, L, k):
+    theta = np.arccos(np.clip(1 - 2 * x / L, -1.0, 1.0))
+    return R / np.sqrt(np.pi) * np.sqrt(np.maximum(theta - np.sin(2 * theta) / 2 + k * np.sin(theta)**3, 0.0))
+
+
+CONICAL = register_shape(NoseConeShape("CONICAL", None, lambda x, R, L, k: x * R / L))
+OGIVE = register_shape(NoseConeShape("OGIVE", None, _ogive))
+ELLIPTICAL = register_shape(NoseConeShape("ELLIPTICAL", None, _elliptical))
+POWER_LAW = register_shape(NoseConeShape("POWER_LAW", (0.0, 1.0), _power_law, 0.5))
+PARABOLIC = register_shape(NoseConeShape("PARABOLIC", (0.0, 1.0), _parabolic, 1.0))
+HAACK = register_shape(NoseConeShape("HAACK", (0.0, 1.0 / 3.0), _haack, 0.0))
+VON_KARMAN = register_shape(NoseConeShape("VON_KARMAN", None, _haack, 0.0))
+LV_HAACK = register_shape(NoseConeShape("LV_HAACK", None, _haack, 1.0 / 3.0))
+
+
+def sample_profile(shape, length: float, radius: float, parameter: Optional[float] = None,
+                   tolerance: Optional[float] = None, max_points: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Samples the profile of a nose cone, placing points where the curvature needs them.
+
+    Starting from a coarse uniform grid, every segment on which the profile strays farther than tolerance
+    from the chord is split at its midpoint, until the polyline is within tolerance of the shape or
+    max_points is reached. The error is measured radially at a few interior points of each segment: it
+    bounds the distance to the surface, and unlike the distance of the midpoint to the chord it does not
+    vanish next to a tip of infinite slope (elliptical, power law, Haack), where the profile bulges
+    away from the chord close to the tip rather than at the midpoint.
+
+    Arguments:
+        shape(:str | NoseConeShape:): registered shape name or shape.
+        length(:float:): length of the nose cone.
+        radius(:float:): base radius of the nose cone.
+        parameter(:float:): shape parameter, for the shapes that take one.
+        tolerance(:float:): maximum distance between profile and polyline. Defaults to a fraction of the radius.
+
+    Returns:
+        (x, r) arrays, x being the distance from the tip, from the tip (x=0) to the base (x=length).
+    """
+    if isinstance(shape, str):
+        shape = get_shape(shape)
+    k = resolve_parameter(shape, parameter)
+    tolerance = tolerance if tolerance is not None else DEFAULT_RELATIVE_TOLERANCE * radius
+
+    def f(x):
+        return shape.radius_function(x, radius, length, k)
+
+    x = np.linspace(0.0, length, 5)
+    r = f(x)
+
+    while len(x) < max_points:
+        # radial distance between profile and chord at interior points of each segment
+        dx = x[1:] - x[:-1]
+        dr = r[1:] - r[:-1]
+        error = np.zeros(len(dx))
+        for t in ERROR_SAMPLES:
+            error = np.maximum(error, np.abs(f(x[:-1] + t * dx) - (r[:-1] + t * dr)))
+
+        split = np.flatnonzero(error > tolerance)
+        if split.size == 0:
+            break
+
+        budget = max_points - len(x)
+        if split.size > budget:
+            split = np.sort(split[np.argsort(error[split])[::-1][:budget]])
+
+        xm = x[split] + dx[split] / 2
+        x = np.insert(x, split + 1, xm)
+        r = np.insert(r, split + 1, f(xm))
+
+    # exact endpoints: sharp tip and full base radius
+    r[0] = 0.0
+    r[-1] = radius
+    return x, r
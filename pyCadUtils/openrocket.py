@@ -0,0 +1,336 @@
+"""
+Import of OpenRocket .ork designs as rocket specs (see spec.validate_spec).
+
+An .ork file is a zip archive holding the rocket XML (older versions write it gzipped or plain). The
+XML is read incrementally with iterparse and every element is cleared and detached from its parent once
+read, so a design never sits in memory as a DOM. Nose cones, body tubes, transitions and trapezoidal
+fin sets are mapped onto the ProjectManager parts; OpenRocket lists them nose to tail, a spec bottom to
+top:
+
+    spec = read_ork("design.ork", scale=1000)              # meters to millimeters
+    for spec in iter_ork_specs("archive/"):                # lazily, file by file
+        ...
+    for result in build_batch(iter_ork_specs("archive/")):
+        ...
+
+Radii OpenRocket sizes automatically ("auto") are taken from the value it saved with them or, for older
+files, from the neighbouring components as OpenRocket does. Internal components (inner tubes,
+bulkheads, recovery, masses) do not change the outer shape and are ignored. Parts the builders cannot
+represent (elliptical, freeform and tube fins, pods and boosters) are ignored too, or rejected with
+strict. Transitions are always conical and ogives always tangent.
+"""
+from __future__ import annotations
+import gzip
+import os
+import zipfile
+from typing import Callable, Iterator, Optional
+from xml.etree.ElementTree import iterparse
+from .export import UNITS
+from .spec import validate_spec
+
+# OpenRocket nose cone shapes -> noseshapes names
+NOSE_SHAPES = {
+    "conical": "conical",
+    "ogive": "ogive",
+    "ellipsoid": "elliptical",
+    "power": "power_law",
+    "parabolic": "parabolic",
+    "haack": "haack",
+}
+
+# Components mapped onto ProjectManager parts
+_AXIAL = ("nosecone", "bodytube", "transition")
+_FINS = ("trapezoidfinset",)
+
+# Components changing the outer shape that the builders cannot represent
+UNSUPPORTED = ("ellipticalfinset", "freeformfinset", "tubefinset", "podset", "parallelstage")
+
+ORK_SUFFIXES = (".ork",)
+
+
+class _Record:
+    # a component being read: its tag, direct child properties and fin sets
+    __slots__ = ("tag", "props", "fins")
+
+    def __init__(self, tag: str) -> None:
+        self.tag = tag
+        self.props = {}
+        self.fins = []
+
+    def text(self, name: str, default: str = None) -> Optional[str]:
+        value = self.props.get(name)
+        return default if value is None else value[0]
+
+    def number(self, name: str, default: float = None) -> Optional[float]:
+        value = self.text(name)
+        return default if value is None else float(value)
+
+    def attribute(self, name: str, key: str) -> Optional[str]:
+        value = self.props.get(name)
+        return None if value is None else value[1].get(key)
+
+
+def _open_xml(path: str):
+    # the rocket XML stream of an .ork file: zipped, gzipped or plain
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        names = [n for n in archive.namelist() if n.lower().endswith((".ork", ".xml"))]
+        if not names:
+            archive.close()
+            raise ValueError(f"{path}: no rocket XML in the archive")
+        return archive.open(names[0])
+
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    return gzip.open(path, "rb") if magic == b"\x1f\x8b" else open(path, "rb")
+
+
+def _radius(record: _Record, name: str) -> Optional[float]:
+    # "0.0125", "auto 0.0125" (automatic, with the value OpenRocket computed) or "auto"
+    text = record.text(name)
+    if text is None:
+        return None
+    tokens = text.split()
+    if tokens[-1] == "auto":
+        return None
+    return float(tokens[-1])
+
+
+def _parse(stream, strict: bool) -> tuple:
+    # Returns the rocket name and the records of the axial components, nose to tail, fin sets attached
+    name = None
+    records = []
+    elements = []        # open elements
+    owners = []          # record of each open element, or None
+    skipping = 0         # depth inside an unsupported subtree
+
+    for event, element in iterparse(stream, events=("start", "end")):
+        tag = element.tag
+
+        if event == "start":
+            record = None
+            if skipping or tag in UNSUPPORTED:
+                if not skipping and strict:
+                    raise ValueError(f"Unsupported OpenRocket component: {tag}")
+                skipping += 1
+            elif tag in _AXIAL or tag in _FINS:
+                record = _Record(tag)
+                if tag in _AXIAL:
+                    records.append(record)
+                else:
+                    parent = next((r for r in reversed(owners) if r is not None), None)
+                    if parent is None or parent.tag != "bodytube":
+                        if strict:
+                            raise ValueError(f"Fin set on a {parent.tag if parent else 'rocket'}: only body tubes carry fins")
+                    else:
+                        parent.fins.append(record)
+            elements.append(element)
+            owners.append(record)
+            continue
+
+        elements.pop()
+        owners.pop()
+        if skipping:
+            skipping -= 1
+        elif elements:
+            parent = owners[-1]
+            if parent is not None:
+                parent.props[tag] = ((element.text or "").strip(), dict(element.attrib))
+            elif tag == "name" and elements[-1].tag == "rocket":
+                name = (element.text or "").strip() or None
+        # clearing empties the element, detaching it stops its parent from keeping it
+        element.clear()
+        if elements:
+            elements[-1].remove(element)
+
+    return name, records
+
+
+def _resolve_radii(records: list) -> list:
+    # (fore, aft) radius of every axial component, automatic radii taken from the neighbours
+    radii = []
+    for record in records:
+        if record.tag == "nosecone":
+            radii.append([0.0, _radius(record, "aftradius")])
+        elif record.tag == "bodytube":
+            radius = _radius(record, "radius")
+            radii.append([radius, radius])
+        else:
+            radii.append([_radius(record, "foreradius"), _radius(record, "aftradius")])
+
+    changed = True
+    while changed:
+        changed = False
+        for i, record in enumerate(records):
+            fore, aft = radii[i]
+            previous = radii[i - 1][1] if i > 0 else None
+            following = radii[i + 1][0] if i + 1 < len(radii) else None
+
+            if record.tag == "bodytube":
+                if fore is None:
+                    value = previous if previous is not None else following
+                    if value is not None:
+                        radii[i] = [value, value]
+                        changed = True
+                continue
+            if fore is None and previous is not None:
+                radii[i][0] = previous
+                changed = True
+            if aft is None and following is not None:
+                radii[i][1] = following
+                changed = True
+
+    for record, (fore, aft) in zip(records, radii):
+        if fore is None or aft is None:
+            raise ValueError(f"Cannot resolve the automatic radius of a {record.tag}")
+
+    return radii
+
+
+def _fin_position(fins: _Record, tube_top: float, tube_length: float) -> float:
+    # Height of the root trailing edge above the base of the tube. OpenRocket positions are along its
+    # x axis, pointing aft from the nose tip, with the fin set aligned by its top, middle or bottom.
+    root_chord = fins.number("rootchord")
+    offset = fins.number("axialoffset")
+    method = fins.attribute("axialoffset", "method")
+    if offset is None:
+        offset = fins.number("position", 0.0)
+        method = fins.attribute("position", "type")
+
+    method = (method or "bottom").lower()
+    if method == "top":
+        leading_edge = tube_top + offset
+    elif method == "middle":
+        leading_edge = tube_top + (tube_length - root_chord) / 2 + offset
+    elif method == "absolute":
+        leading_edge = offset
+    else:
+        leading_edge = tube_top + tube_length - root_chord + offset
+
+    return tube_top + tube_length - (leading_edge + root_chord)
+
+
+def _components(records: list, scale: float, strict: bool) -> list:
+    # spec components, bottom to top
+    radii = _resolve_radii(records)
+    components = []
+    x = 0.0  # aft position of the top of the component, from the nose tip
+
+    for record, (fore, aft) in zip(records, radii):
+        length = record.number("length")
+        thickness = record.number("thickness", 0.0)
+        parts = []
+
+        if record.tag == "nosecone":
+            shape = (record.text("shape") or "conical").lower()
+            if shape not in NOSE_SHAPES:
+                raise ValueError(f"Unknown OpenRocket nose cone shape: {shape}")
+            nose = {"type": "nose_cone", "length": length * scale, "diameter": 2 * aft * scale,
+                    "thickness": thickness * scale, "shape": NOSE_SHAPES[shape]}
+            if shape in ("power", "parabolic", "haack"):
+                nose["shape_parameter"] = record.number("shapeparameter")
+            elif strict and shape == "ogive" and record.number("shapeparameter", 1.0) != 1.0:
+                raise ValueError("Only tangent ogives (shape parameter 1) are supported")
+            parts.append(nose)
+
+        elif record.tag == "transition":
+            if strict and (record.text("shape") or "conical").lower() != "conical":
+                raise ValueError(f"Only conical transitions are supported, not {record.text('shape')}")
+            # Transition3DBuilder puts bottom_diameter at the top (fore end) of the part
+            parts.append({"type": "transition", "length": length * scale, "bottom_diameter": 2 * fore * scale,
+                          "top_diameter": 2 * aft * scale, "thickness": thickness * scale})
+
+        else:
+            parts.append({"type": "body_tube", "length": length * scale, "diameter": 2 * fore * scale, "thickness": thickness * scale})
+            for fins in record.fins:
+                parts.append({
+                    "type": "fin_set",
+                    "count": int(fins.number("fincount")),
+                    "root_chord": fins.number("rootchord") * scale,
+                    "tip_chord": fins.number("tipchord") * scale,
+                    "span": fins.number("height") * scale,
+                    "sweep": fins.number("sweeplength") * scale,
+                    "position": _fin_position(fins, x, length) * scale,
+                    "thickness": fins.number("thickness") * scale,
+                })
+
+        x += length
+        components[:0] = parts  # nose to tail in, bottom to top out; fins stay right after their tube
+
+    return components
+
+
+def read_ork(path: str, scale: float = 1.0, strict: bool = False) -> dict:
+    """
+    Reads an OpenRocket design as a rocket spec.
+
+    Arguments:
+        path(:str:): .ork file, zipped, gzipped or plain XML.
+        scale(:float:): factor applied to every length, OpenRocket stores meters (1000 for millimeters).
+        strict(:bool:): raise ValueError on parts that cannot be represented instead of ignoring them.
+
+    Returns:
+        A validated spec named after the file, with the unit of its lengths when the scale maps meters to
+        one of export.UNITS.
+    """
+    with _open_xml(path) as stream:
+        title, records = _parse(stream, strict)
+
+    if not records:
+        raise ValueError(f"{path}: no nose cone, body tube or transition")
+
+    spec = {"name": os.path.splitext(os.path.basename(path))[0], "components": _components(records, scale, strict)}
+    unit = next((unit for unit, size in UNITS.items() if abs(scale * size - 1.0) < 1e-9), None)
+    if unit is not None:
+        spec["unit"] = unit
+    if title:
+        spec["title"] = title
+    validate_spec(spec)
+    return spec
+
+
+def iter_ork_files(path: str, recursive: bool = True) -> Iterator[str]:
+    """
+    Yields the .ork files of a directory (sorted, in subdirectories too with recursive), or path itself if it is a file.
+    """
+    if not os.path.isdir(path):
+        yield path
+        return
+
+    for entry in sorted(os.scandir(path), key=lambda e: e.name):
+        if entry.is_dir():
+            if recursive:
+                yield from iter_ork_files(entry.path, recursive)
+        elif entry.name.lower().endswith(ORK_SUFFIXES):
+            yield entry.path
+
+
+def iter_ork_specs(paths, scale: float = 1.0, strict: bool = False, recursive: bool = True,
+                   on_error: Optional[Callable] = None) -> Iterator[dict]:
+    """
+    Lazily reads OpenRocket designs as specs, one file at a time, ready for batch.build_batch.
+
+    Arguments:
+        paths(:str | Iterable[str]:): .ork files and/or directories of them.
+        scale(:float:): factor applied to every length (see read_ork).
+        strict(:bool:): reject designs with parts that cannot be represented (see read_ork).
+        recursive(:bool:): look into subdirectories.
+        on_error(:Callable:): called with (path, exception) for a design that cannot be read, which is
+                              then skipped. Without it the error is raised.
+
+    Returns:
+        An iterator of specs.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+
+    for path in paths:
+        for file in iter_ork_files(os.fspath(path), recursive):
+            try:
+                spec = read_ork(file, scale, strict)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(file, e)
+                continue
+            yield spec
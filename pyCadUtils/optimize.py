@@ -0,0 +1,401 @@
+"""
+Design optimization around ProjectManager: searches parameter bounds for the design minimizing an
+objective, for example the lightest rocket with a static margin of at least 1.5 calibers:
+
+    optimizer = Optimizer(manager, {"fin_set1.span": (0.05, 0.2), "fin_set1.root_chord": (0.1, 0.4),
+                                    "nose_cone1.length": (0.2, 0.6)}, objective="mass", min_margin=1.5)
+    result = optimizer.run(generations=10, population=200)
+    best = result.build()[0]          # a ProjectManager with OCC geometry
+    best.exportProject("out", "step")
+
+Parameters are named "<component name>.<parameter>", components being named as ProjectManager names
+them (body_tube1, fin_set2, ...). Every candidate goes through the cheapest check that can reject it:
+
+    analytic   a whole generation at once as a NumPy batch (see stability.evaluate_stability): mass, CG, CP
+               and static margin, plus the structural checks (positive sizes, walls thinner than the part,
+               fins on their tube) and the constraints. Designs failing them are never built.
+    geometry   survivors that could still be among the best designs are built in "mesh" build mode across
+               a process pool (see batch.py): no OCC. Their part meshes must enclose the volume the
+               analytics give them, and geometry_check must accept them.
+    CAD        only OptimizationResult.build builds OCC solids, for the best designs.
+
+Evaluations are memoized by a hash of the design (parameters quantized to their resolution), across the
+generations and the runs of an Optimizer. The search is a cross-entropy method: each generation is drawn
+around the best designs of the previous ones, in a distribution narrowing as they agree.
+"""
+from __future__ import annotations
+import copy
+import hashlib
+import json
+import time
+import traceback
+from typing import Callable, Iterable, NamedTuple, Optional, Union
+import numpy as np
+from . import __version__
+from .batch import build_project, run_pool
+from .lod import level_deflections
+from .mesh import component_meshes, signed_volume
+from .spec import COMPONENT_PARAMETERS, validate_spec
+from .stability import evaluate_stability
+
+DEFAULT_RESOLUTION = 1e-3   # quantum of a parameter, as a fraction of its range
+ELITE_FRACTION = 0.1        # share of a generation the next one is drawn around
+SMOOTHING = 0.7             # weight of the elites against the previous distribution
+GEOMETRY_LEVEL = 2          # level of detail of the geometry check meshes (see lod.LOD_LEVELS)
+VOLUME_TOLERANCE = 0.01     # relative difference allowed between a part mesh and its analytic volume
+
+# Parameters that must be whole numbers
+INTEGER_PARAMETERS = ("count",)
+
+METRICS = ("mass", "margin", "cp", "cg", "length", "reference_diameter", "normal_force_slope")
+
+
+class Parameter(NamedTuple):
+    name: str          # "<component name>.<parameter>"
+    component: int     # index in the spec components
+    key: str           # parameter of the component
+    low: float
+    high: float
+    resolution: float
+    integer: bool
+
+
+class Evaluation(NamedTuple):
+    digest: str
+    params: dict               # parameter name -> value
+    spec: dict                 # plain spec of the design
+    metrics: dict              # analytic results (see METRICS), and the parameters
+    objective: float
+    violation: float           # 0 when the analytic checks pass, how far off otherwise (inf for structural problems)
+    feasible: Optional[bool]   # True once the geometry passed, False if any check failed, None if not built yet
+    error: Optional[str]       # why the design was rejected
+
+    @property
+    def stage(self) -> str:
+        """Last stage the design reached: "analytic" or "geometry"."""
+        return "geometry" if self.feasible or (self.feasible is False and self.violation == 0) else "analytic"
+
+
+class GenerationStats(NamedTuple):
+    generation: int
+    candidates: int
+    cached: int               # evaluations found in the memo
+    analytic_rejected: int
+    geometry_built: int
+    geometry_rejected: int
+    best_objective: float
+    elapsed: float
+
+
+class OptimizationResult(NamedTuple):
+    best: list                # feasible Evaluations, best first
+    history: list             # GenerationStats
+    evaluations: int          # distinct designs evaluated, memo included
+
+    def build(self, count: int = 1, build_mode: str = "revolve") -> list:
+        """
+        Builds the count best designs with OCC geometry. Returns their ProjectManagers.
+        """
+        return [build_project(evaluation.spec, build_mode) for evaluation in self.best[:count]]
+
+
+def component_names(spec: dict) -> list:
+    """
+    Names of the components of a spec in a ProjectManager: their own, or the one it gives them.
+    """
+    counts = {}
+    names = []
+    for component in spec["components"]:
+        counts[component["type"]] = counts.get(component["type"], 0) + 1
+        names.append(component.get("name") or f"{component['type']}{counts[component['type']]}")
+    return names
+
+
+def structural_problem(spec: dict) -> Optional[str]:
+    """
+    Why the parts of a plain spec cannot be built, or None: sizes must be positive, walls thinner than
+    the radius of their part and fins within the length of their body tube.
+    """
+    tube_length = None
+    for i, component in enumerate(spec["components"]):
+        kind = component["type"]
+        for key in COMPONENT_PARAMETERS[kind][0]:
+            if key not in ("sweep", "position", "tip_chord") and not component[key] > 0:
+                return f"component {i} ({kind}): {key} must be positive"
+
+        thickness = component["thickness"]
+        if kind in ("body_tube", "nose_cone") and thickness >= component["diameter"] / 2:
+            return f"component {i} ({kind}): wall thicker than the radius"
+        if kind == "transition" and thickness >= min(component["bottom_diameter"], component["top_diameter"]) / 2:
+            return f"component {i} ({kind}): wall thicker than the smallest radius"
+        if kind == "body_tube":
+            tube_length = component["length"]
+        elif kind == "fin_set":
+            if component["tip_chord"] < 0:
+                return f"component {i} ({kind}): tip_chord must not be negative"
+            if tube_length is not None and (component["position"] < 0 or component["position"] + component["root_chord"] > tube_length * (1 + 1e-9)):
+                return f"component {i} ({kind}): fins beyond their body tube"
+    return None
+
+
+def geometry_problem(manager) -> Optional[str]:
+    """
+    Why the parts of a project are not sound, or None: every part mesh must enclose the analytic volume of
+    the part.
+    """
+    for component in manager.components:
+        meshes = component_meshes(component.key, *level_deflections(component.key, GEOMETRY_LEVEL))
+        volume = sum(signed_volume(m) for m in meshes)
+        expected = component.mass_properties.volume
+        if abs(volume - expected) > VOLUME_TOLERANCE * abs(expected):
+            return f"{component.name}: mesh volume {volume:.6g} instead of {expected:.6g}"
+    return None
+
+
+class _GeometryCheck(NamedTuple):
+    index: int
+    error: Optional[str]
+
+
+def _geometry_worker(index: int, spec: dict, geometry_check: Optional[Callable]) -> _GeometryCheck:
+    try:
+        manager = build_project(spec, "mesh")
+        error = geometry_problem(manager)
+        if error is None and geometry_check is not None:
+            verdict = geometry_check(manager)
+            if verdict is False:
+                error = "rejected by geometry_check"
+            elif isinstance(verdict, str):
+                error = verdict
+    except Exception:
+        error = traceback.format_exc().strip().splitlines()[-1]
+    return _GeometryCheck(index, error)
+
+
+def design_digest(spec: dict) -> str:
+    """
+    Hash of a design: the same hash means the same parts.
+    """
+    payload = json.dumps([spec["components"], __version__], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Optimizer:
+
+    """
+    Searches parameter bounds for the design minimizing an objective (see the module documentation).
+
+    Arguments:
+        design(:ProjectManager | dict:): the starting rocket, a ProjectManager or a spec. Components added
+                                         with a name keep it for the parameter names.
+        bounds(:dict:): parameter name -> (low, high) or (low, high, resolution). Counts are whole numbers.
+        objective(:str | Callable:): a metric to minimize (see METRICS), "-" in front to maximize it, or a
+                                     function of the metrics of a design (which include the parameters).
+        min_margin(:float:): smallest static margin, in calibers.
+        max_margin(:float:): largest static margin, if any.
+        density(:float | dict:): density of every part, or a mapping from component type to density.
+        constraints(:Iterable[Callable]:): functions of the metrics of a design, False to reject it.
+                                           Checked with the analytics, before any geometry.
+        geometry_check(:Callable:): function of the ProjectManager of a design built in "mesh" mode, False
+                                    or a reason (str) to reject it. Runs in the workers: must be picklable.
+        max_workers(:int:): worker processes of the geometry stage, defaults to the number of CPUs.
+        seed(:int:): of the random search.
+    """
+
+    def __init__(self, design, bounds: dict, objective: Union[str, Callable] = "mass", min_margin: float = 1.0,
+                 max_margin: Optional[float] = None, density=1.0, constraints: Iterable[Callable] = (),
+                 geometry_check: Optional[Callable] = None, max_workers: Optional[int] = None, seed: int = 0) -> None:
+
+        if isinstance(design, dict):
+            validate_spec(design)
+            self.spec = copy.deepcopy(design)
+            names = component_names(design)
+        else:
+            self.spec = design.toSpec()
+            names = [c.name for c in design.components]
+
+        if not bounds:
+            raise ValueError("Nothing to optimize: no parameter bounds")
+
+        self.parameters = []
+        for name, bound in bounds.items():
+            component, _, key = name.rpartition(".")
+            if component not in names:
+                raise ValueError(f"Unknown component in parameter {name!r}, components are {names}")
+            index = names.index(component)
+            kind = self.spec["components"][index]["type"]
+            if key not in sum(COMPONENT_PARAMETERS[kind], ()) or key == "shape":
+                raise ValueError(f"{name!r}: {kind} has no numeric parameter {key!r}")
+
+            low, high, *resolution = bound
+            if not high >= low:
+                raise ValueError(f"{name!r}: empty bounds ({low}, {high})")
+            integer = key in INTEGER_PARAMETERS
+            resolution = resolution[0] if resolution else (1 if integer else (high - low) * DEFAULT_RESOLUTION)
+            self.parameters.append(Parameter(name, index, key, float(low), float(high), float(resolution) or 1.0, integer))
+
+        self.objective = objective
+        self.min_margin = min_margin
+        self.max_margin = max_margin
+        self.density = density
+        self.constraints = list(constraints)
+        self.geometry_check = geometry_check
+        self.max_workers = max_workers
+        self._rng = np.random.default_rng(seed)
+        self._memo = {}  # digest -> Evaluation
+
+    # --- parameters
+
+    def _quantize(self, unit: np.ndarray) -> np.ndarray:
+        # points of the unit hypercube -> parameter values on their resolution grid, within bounds
+        values = np.empty_like(unit)
+        for j, p in enumerate(self.parameters):
+            value = p.low + np.clip(unit[:, j], 0.0, 1.0) * (p.high - p.low)
+            value = p.low + np.round((value - p.low) / p.resolution) * p.resolution
+            values[:, j] = np.clip(value, p.low, p.high)
+        return values
+
+    def _unit(self, values: np.ndarray) -> np.ndarray:
+        spans = np.array([max(p.high - p.low, 1e-300) for p in self.parameters])
+        return (values - [p.low for p in self.parameters]) / spans
+
+    def design(self, values) -> dict:
+        """
+        The plain spec of a design, from its parameter values in the order of the bounds.
+        """
+        spec = copy.deepcopy(self.spec)
+        for p, value in zip(self.parameters, values):
+            spec["components"][p.component][p.key] = int(round(value)) if p.integer else float(value)
+        return spec
+
+    def _objective(self, metrics: dict) -> float:
+        if callable(self.objective):
+            return float(self.objective(metrics))
+        sign, name = (-1.0, self.objective[1:]) if self.objective.startswith("-") else (1.0, self.objective)
+        return sign * float(metrics[name])
+
+    # --- stages
+
+    def _analytic(self, values: np.ndarray) -> list:
+        # evaluates designs as one NumPy batch
+        batch = copy.deepcopy(self.spec)
+        for j, p in enumerate(self.parameters):
+            batch["components"][p.component][p.key] = values[:, j]
+        result = evaluate_stability(batch, self.density, self.min_margin, self.max_margin)
+
+        evaluations = []
+        for i, row in enumerate(values):
+            spec = self.design(row)
+            params = dict(zip((p.name for p in self.parameters), (spec["components"][p.component][p.key] for p in self.parameters)))
+            metrics = {name: float(getattr(result, name)[i]) for name in METRICS}
+            metrics.update(params)
+            digest = design_digest(spec)
+            if self.spec.get("name"):
+                spec["name"] = f"{self.spec['name']}-{digest[:8]}"
+
+            error = structural_problem(spec)
+            if error is not None:
+                violation = float("inf")
+            else:
+                margin = metrics["margin"]
+                violation = max(0.0, self.min_margin - margin)
+                if self.max_margin is not None:
+                    violation += max(0.0, margin - self.max_margin)
+                if violation > 0:
+                    error = f"static margin {margin:.3g} out of bounds"
+                elif not all(constraint(metrics) for constraint in self.constraints):
+                    error, violation = "rejected by a constraint", float("inf")
+
+            objective = self._objective(metrics) if np.isfinite(violation) else float("inf")
+            evaluations.append(Evaluation(digest, params, spec, metrics, objective, violation,
+                                          None if error is None else False, error))
+        return evaluations
+
+    def _geometry(self, evaluations: list) -> list:
+        # builds designs in "mesh" mode across the pool; returns the evaluations with their verdict
+        evaluations = list(evaluations)
+        if not evaluations:
+            return []
+        checked = list(evaluations)
+        specs = (e.spec for e in evaluations)
+        for check in run_pool(_geometry_worker, specs, (self.geometry_check,), self.max_workers, None, load_cq=False):
+            checked[check.index] = evaluations[check.index]._replace(feasible=check.error is None, error=check.error)
+        return checked
+
+    def evaluate(self, values) -> list:
+        """
+        Evaluates designs given as rows of parameter values (in the order of the bounds), through the
+        analytic and geometry stages, using and filling the memo.
+        """
+        return self._evaluate(self._quantize(self._unit(np.atleast_2d(np.asarray(values, dtype=float)))), None)[0]
+
+    def _evaluate(self, values: np.ndarray, threshold: Optional[float]) -> tuple:
+        # Returns the evaluations of the rows of values and the counts of the generation. Only designs
+        # whose objective beats threshold are built.
+        evaluations = self._analytic(values)
+        new = [e for e in evaluations if e.digest not in self._memo]
+        cached = len(evaluations) - len(new)
+        for e in new:
+            self._memo[e.digest] = e
+        evaluations = [self._memo[e.digest] for e in evaluations]
+
+        pending = {e.digest: e for e in evaluations
+                   if e.feasible is None and (threshold is None or e.objective < threshold)}
+        checked = self._geometry(pending.values())
+        for e in checked:
+            self._memo[e.digest] = e
+
+        counts = (cached, sum(e.feasible is False for e in new), len(checked), sum(not e.feasible for e in checked))
+        return [self._memo[e.digest] for e in evaluations], counts
+
+    # --- search
+
+    def best(self, count: int = 1) -> list:
+        """The count best feasible designs evaluated so far."""
+        return sorted((e for e in self._memo.values() if e.feasible), key=lambda e: e.objective)[:count]
+
+    def run(self, generations: int = 10, population: int = 100, keep: int = 5) -> OptimizationResult:
+        """
+        Runs the search.
+
+        Arguments:
+            generations(:int:): largest number of generations, fewer if the search converges.
+            population(:int:): designs drawn per generation.
+            keep(:int:): number of best designs in the result.
+
+        Returns:
+            An OptimizationResult.
+        """
+        dimensions = len(self.parameters)
+        elites = max(2, int(round(ELITE_FRACTION * population)))
+        floor = np.array([p.resolution / max(p.high - p.low, 1e-300) for p in self.parameters])
+        mean, std = np.full(dimensions, 0.5), np.full(dimensions, 0.5)
+        history = []
+
+        for generation in range(generations):
+            start = time.perf_counter()
+            if generation == 0:
+                unit = self._rng.random((population, dimensions))
+            else:
+                unit = mean + std * self._rng.standard_normal((population, dimensions))
+            values = self._quantize(unit)
+
+            # only designs that could be among the best are built
+            ranked = self.best(elites)
+            threshold = ranked[-1].objective if len(ranked) == elites else None
+            evaluations, (cached, analytic_rejected, built, geometry_rejected) = self._evaluate(values, threshold)
+
+            # next distribution: around the best designs, feasible first, then the least infeasible
+            pool = {e.digest: e for e in evaluations + self.best(elites)}
+            chosen = sorted(pool.values(), key=lambda e: (not e.feasible, e.violation, e.objective))[:elites]
+            unit = self._unit(np.array([[e.params[p.name] for p in self.parameters] for e in chosen]))
+            mean = SMOOTHING * unit.mean(axis=0) + (1 - SMOOTHING) * mean
+            std = np.maximum(SMOOTHING * unit.std(axis=0) + (1 - SMOOTHING) * std, floor / 2)
+
+            best = self.best(1)
+            history.append(GenerationStats(generation, len(evaluations), cached, analytic_rejected, built, geometry_rejected,
+                                           best[0].objective if best else float("inf"), time.perf_counter() - start))
+            if np.all(std <= floor):
+                break
+
+        return OptimizationResult(self.best(keep), history, len(self._memo))
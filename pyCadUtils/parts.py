@@ -1,8 +1,14 @@
-import cadquery as cq
+from __future__ import annotations
+from ._lazy import cq
 from abc import ABC, abstractmethod
 from .primitives import create_cylinder, create_cone, create_transition, create_trapezoidal_fin
+from . import trace
 
 class Part3DBuilder(ABC):
+
+    # Build mode of the hollow axisymmetric primitives, see primitives.BUILD_MODES
+    build_mode = "revolve"
+
     @classmethod
     @abstractmethod
     def addPart(self, *args, **kwargs) -> cq.Workplane:
@@ -24,6 +30,14 @@ class Part3DBuilder(ABC):
         else:
             return project.faces("<Z").workplane()
 
+    @staticmethod
+    def workplaneAt(z_position: float) -> cq.Workplane:
+        """
+        XY workplane centred on the rocket axis at the given height. Used to place parts from a
+        known stack position without querying the faces of the project.
+        """
+        return cq.Workplane("XY", origin=(0, 0, z_position))
+
 
 class BodyTube3DBuilder(Part3DBuilder):
 
@@ -31,18 +45,19 @@ class BodyTube3DBuilder(Part3DBuilder):
 
     def create_BodyTube(self, wp: cq.Workplane, height: float, radius: float, thickness: float) -> cq.Workplane:
         """
-        Create cylinder geometry (outer minus inner) on the given workplane.
+        Create cylinder geometry on the given workplane, built according to build_mode.
         Returns a Workplane object with the BodyTube solid positioned at the given workplane.
         """        
         # delegate to primitives
-        return create_cylinder(wp, height, radius, thickness)
+        return create_cylinder(wp, height, radius, thickness, mode=self.build_mode)
 
-    def addPart(self, project: cq.Workplane, length: float, diameter: float, thickness: float) -> cq.Workplane:
+    def addPart(self, project: cq.Workplane, length: float, diameter: float, thickness: float, z_position: float = None) -> cq.Workplane:
         """
-        Adds the cylinder to the topmost face of the provided project.
+        Adds the cylinder to the topmost face of the provided project, or at z_position if it is given.
         Uses create_BodyTube to build the geometry and then adds it to the project.
         """
-        wp = self.selectUpMostFace(project)
+        with trace.span("workplane.select", method="faces" if z_position is None else "cursor"):
+            wp = self.selectUpMostFace(project) if z_position is None else self.workplaneAt(z_position)
         radius = diameter / 2.0
 
         cyl = self.create_BodyTube(wp, length, radius, thickness)
@@ -57,12 +72,12 @@ class Transition3DBuilder(Part3DBuilder):
 
     def create_Transition(self, wp: cq.Workplane, height: float, radius1: float, radius2: float, thickness: float) -> cq.Workplane:
         """
-        Create transition geometry (outer minus inner) on the given workplane.
+        Create transition geometry on the given workplane, built according to build_mode.
         Returns a Workplane object with the transition solid positioned at the given workplane.
         """
-        return create_transition(wp, height, radius1, radius2, thickness)
+        return create_transition(wp, height, radius1, radius2, thickness, mode=self.build_mode)
 
-    def addPart(self, project: cq.Workplane, length: float, bottom_diameter: float, top_diameter: float, thickness: float) -> cq.Workplane:
+    def addPart(self, project: cq.Workplane, length: float, bottom_diameter: float, top_diameter: float, thickness: float, z_position: float = None) -> cq.Workplane:
         """
         Arguments:
             project(:cq.Workplane:): current project.
@@ -70,11 +85,13 @@ class Transition3DBuilder(Part3DBuilder):
             radius1(:float:): radius of the upper part of the transition.
             radius2(:float:): radius of the lower part of the transition.
             thickness(:float:): thickness of the transition.
+            z_position(:float:): height of the base of the transition. If None, the up most face of the project is used.
 
         Returns:
             project(:cq.Workplane:): the project with an added transition on the up most plane coaxial with the z-axis.
         """
-        wp = self.selectUpMostFace(project)
+        with trace.span("workplane.select", method="faces" if z_position is None else "cursor"):
+            wp = self.selectUpMostFace(project) if z_position is None else self.workplaneAt(z_position)
         bottom_radius = bottom_diameter / 2.0
         top_radius = top_diameter / 2.0
 
@@ -88,28 +105,35 @@ class NoseCone3DBuilder(Part3DBuilder):
 
     "A class to build (hollow) NoseCones"
 
-    def create_NoseCone(self, wp: cq.Workplane, height: float, radius: float, thickness: float) -> cq.Workplane:
+    def create_NoseCone(self, wp: cq.Workplane, height: float, radius: float, thickness: float,
+                        shape: str = "conical", shape_parameter: float = None) -> cq.Workplane:
         """
         Create nose cone geometry on the given workplane.
         Returns a Workplane object with the NoseCone solid positioned with base at the given workplane.
+        shape is the name of a shape registered in noseshapes.
         """
-        return create_cone(wp, height, radius, thickness)
+        return create_cone(wp, height, radius, thickness, shape, shape_parameter, mode=self.build_mode)
 
-    def addPart(self, project: cq.Workplane, length: float, diameter: float, thickness: float) -> cq.Workplane:
+    def addPart(self, project: cq.Workplane, length: float, diameter: float, thickness: float, z_position: float = None,
+                shape: str = "conical", shape_parameter: float = None) -> cq.Workplane:
         """
         Arguments:
             project(:cq.Workplane:): current project.
             height(:float:): height of the cone.
             radius(:float:): base radius of the cone.
             thickness(:float:): thickness of the cone.
+            z_position(:float:): height of the base of the cone. If None, the up most face of the project is used.
+            shape(:str:): nose cone shape, see noseshapes.NOSE_CONE_SHAPES.
+            shape_parameter(:float:): parameter of the shapes that take one (POWER_LAW, PARABOLIC, HAACK).
 
         Returns:
             project(:cq.Workplane:): the project with an added cone on the up most plane coaxial with the z-axis.
         """
-        wp = self.selectUpMostFace(project)
+        with trace.span("workplane.select", method="faces" if z_position is None else "cursor"):
+            wp = self.selectUpMostFace(project) if z_position is None else self.workplaneAt(z_position)
         radius = diameter / 2.0
 
-        cone = self.create_NoseCone(wp, length, radius, thickness)
+        cone = self.create_NoseCone(wp, length, radius, thickness, shape, shape_parameter)
 
         project = project.add(cone)
 
@@ -118,43 +142,80 @@ class NoseCone3DBuilder(Part3DBuilder):
 class Fins3DBuilder(Part3DBuilder):
     "A class to build fin sets"
 
-    def create_FinSet(self, wp: cq.Workplane, count: int, root_chord: float, tip_chord: float, span: float, sweep: float, position: float, thickness: float, body_diameter: float, z_BodyTube: float) -> cq.Workplane:
+    # How the fins of a set are combined:
+    #   "compound": one fin solid placed count times in a compound, no booleans (fins never touch each other).
+    #   "fuse":     the placed fins fused by a single multi-argument boolean.
+    #   "union":    the fins unioned one by one (count - 1 booleans).
+    FIN_SET_MODES = ("compound", "fuse", "union")
+
+    def create_FinLocations(self, count: int, position: float, body_diameter: float, z_BodyTube: float) -> list:
+        """
+        Returns the location of every fin of a set: the root on the body tube wall at the given height,
+        rotated by i * 360 / count degrees around the z-axis.
+        """
+        root = cq.Location(cq.Vector(body_diameter / 2.0, 0, position + z_BodyTube))
+
+        return [
+            cq.Location(cq.Vector(0, 0, 0), cq.Vector(0, 0, 1), i * 360.0 / count) * root
+            for i in range(count)
+        ]
+
+    def create_FinSet(self, wp: cq.Workplane, count: int, root_chord: float, tip_chord: float, span: float, sweep: float, position: float, thickness: float, body_diameter: float, z_BodyTube: float, mode: str = "compound") -> cq.Workplane:
         """
         Create Fin Set geometry on the given workplane.
         Returns a Workplane object with the FinSet solid positioned with base at the given workplane.
+        The fins are combined according to mode (see FIN_SET_MODES).
         """
-        body_radius = body_diameter / 2.0
-    
-        local_wp = cq.Workplane("XY")
-        fin = create_trapezoidal_fin(local_wp, root_chord, tip_chord, span, sweep, thickness)
-        fin = fin.translate((body_radius, 0, position + z_BodyTube))
+        if mode not in self.FIN_SET_MODES:
+            raise ValueError(f"Unknown fin set mode: {mode}")
 
-        finset = None
-        for i in range(count):
-            angle_deg = i * 360.0 / count
-            f = fin.rotate((0, 0, 0), (0, 0, 1), angle_deg)
+        if count <= 0:
+            return cq.Workplane("XY")
 
-            if finset is None:
-                finset = f
+        local_wp = cq.Workplane("XY")
+        fin = create_trapezoidal_fin(local_wp, root_chord, tip_chord, span, sweep, thickness).val()
+        fins = [fin.moved(loc) for loc in self.create_FinLocations(count, position, body_diameter, z_BodyTube)]
+
+        with trace.span("finset.combine", mode=mode, count=count) as sp:
+            if mode == "compound":
+                finset = cq.Compound.makeCompound(fins)
+            elif mode == "fuse" and count > 1:
+                finset = fins[0].fuse(*fins[1:])
             else:
-                finset = finset.union(f)
+                finset = fins[0]
+                for f in fins[1:]:
+                    finset = finset.fuse(f)
+            sp.shape(finset)
 
-        if finset is None:
-            return cq.Workplane("XY")
+        return cq.Workplane("XY").add(finset)
+
+    def create_FinAssembly(self, count: int, root_chord: float, tip_chord: float, span: float, sweep: float, position: float, thickness: float, body_diameter: float, z_BodyTube: float, name: str = "fin") -> cq.Assembly:
+        """
+        Create the Fin Set as an assembly where every fin references the same solid with its own location.
+        """
+        fin = create_trapezoidal_fin(cq.Workplane("XY"), root_chord, tip_chord, span, sweep, thickness).val()
+
+        assembly = cq.Assembly(name=name + "_set")
+        for i, loc in enumerate(self.create_FinLocations(count, position, body_diameter, z_BodyTube)):
+            assembly.add(fin, loc=loc, name=f"{name}{i}")
 
-        return finset
+        return assembly
     
+    @trace.traced("Fins3DBuilder.addPart")
     def addPart(self, project: cq.Workplane, count: int, root_chord: float, tip_chord:float,
-                span: float, sweep: float, position: float, thickness: float, body_diameter: float, z_position: float = 0) -> cq.Workplane:
+                span: float, sweep: float, position: float, thickness: float, body_diameter: float, z_position: float = 0,
+                mode: str = "compound") -> cq.Workplane:
         """
         Arguments:
             project(:cq.Workplane:): current project.
+            z_position(:float:): height of the base of the body tube the fins are attached to.
+            mode(:str:): how the fins are combined, see FIN_SET_MODES.
 
         Returns:
             project(:cq.Workplane:): the project with added fins on the ¿¿WHERE??.
         """
         # Create finset at origin
-        finset = self.create_FinSet(None, count, root_chord, tip_chord, span, sweep, position, thickness, body_diameter, z_position)
+        finset = self.create_FinSet(None, count, root_chord, tip_chord, span, sweep, position, thickness, body_diameter, z_position, mode)
         
         project = project.add(finset)
 
@@ -1,5 +1,10 @@
-import cadquery as cq
+from __future__ import annotations
+from ._lazy import cq
 from math import pi
+from .cache import cached_primitive
+from .export import exact_bounds
+from .trace import span
+from .profiles import nose_inner_profile, nose_profile, transition_profile, tube_profile
 
 EPS = 1e-9
 
@@ -10,7 +15,36 @@ def _normalize_base_to_z0(result: cq.Workplane) -> cq.Workplane:
     except Exception:
         return result
 
-def create_cylinder(wp: cq.Workplane, height: float, radius: float, thickness: float) -> cq.Workplane:
+# How hollow axisymmetric parts are built:
+#   "revolve": the wall cross-section is drawn and revolved once.
+#   "boolean": an inner solid is cut from the outer solid.
+BUILD_MODES = ("revolve", "boolean")
+
+def _check_mode(mode: str) -> None:
+    if mode not in BUILD_MODES:
+        raise ValueError(f"Unknown build mode: {mode}")
+
+def _revolve_profile(wp: cq.Workplane, profile: list) -> cq.Workplane:
+    # Profile (see profiles.py) drawn on a rotated workplane so revolve gives a solid with its base
+    # on the workplane and its axis along the workplane normal.
+    profile_wp = wp.workplane(offset=0).transformed(rotate=(90, 0, 0)).moveTo(*profile[0][1][0])
+
+    for kind, points in profile:
+        if kind == "spline":
+            profile_wp = profile_wp.spline(points[1:], includeCurrent=True)
+        else:
+            for point in points[1:]:
+                profile_wp = profile_wp.lineTo(*point)
+
+    with span("occ.revolve", pieces=len(profile)):
+        return profile_wp.close().revolve(360)
+
+@cached_primitive("cylinder")
+def create_cylinder(wp: cq.Workplane, height: float, radius: float, thickness: float, mode: str = "revolve") -> cq.Workplane:
+    _check_mode(mode)
+    if mode == "revolve":
+        return _revolve_profile(wp, tube_profile(height, radius, thickness))
+
     outer = wp.circle(radius).extrude(height)
 
     if thickness is None or thickness <= 0:
@@ -21,53 +55,40 @@ def create_cylinder(wp: cq.Workplane, height: float, radius: float, thickness: f
             result = outer
         else:
             inner = wp.circle(inner_r).extrude(height)
-            result = outer.cut(inner)
+            with span("occ.cut"):
+                result = outer.cut(inner)
 
     # return _normalize_base_to_z0(result)
     return result
 
-def create_cone(wp: cq.Workplane, height: float, radius: float, thickness: float) -> cq.Workplane:
-    # Outer cone (profile drawn on a rotated workplane so revolve gives cone with base on upmost face)
-    outer = (
-        wp.workplane(offset=0)
-        .transformed(rotate=(90, 0, 0))
-        .polyline([(0, 0), (radius, 0), (0, height)])
-        .close()
-        .revolve(360)
-    )
+@cached_primitive("cone")
+def create_cone(wp: cq.Workplane, height: float, radius: float, thickness: float,
+                shape: str = "conical", shape_parameter: float = None, tolerance: float = None, mode: str = "revolve") -> cq.Workplane:
+    # The inner surface is the outer one offset by a constant normal thickness (see profiles.offset_inward),
+    # shape taken from the noseshapes registry
+    _check_mode(mode)
+    if mode == "revolve":
+        return _revolve_profile(wp, nose_profile(height, radius, thickness, shape, shape_parameter, tolerance))
 
-    if thickness is None or thickness <= 0:
+    outer = _revolve_profile(wp, nose_profile(height, radius, 0, shape, shape_parameter, tolerance))
+    cavity = nose_inner_profile(height, radius, thickness, shape, shape_parameter, tolerance)
+
+    if not cavity:
         result = outer
     else:
-        # inner base radius = radius - thickness
-        # inner apex is shifted axially by a proportional amount: height_difference = thickness * (height / radius)
-        if radius <= EPS or height <= EPS:
-            inner_r = max(radius - thickness, 0.0)
-            inner = (
-                wp.workplane(offset=0)
-                .transformed(rotate=(90, 0, 0))
-                .polyline([(0, 0), (inner_r, 0), (0, height)])
-                .close()
-                .revolve(360)
-            )
-        else:
-            inner_r = max(radius - thickness, 0.0)
-            height_difference = thickness * (height / radius)
-            inner_apex_z = max(height - height_difference, EPS)
-            inner = (
-                wp.workplane(offset=0)
-                .transformed(rotate=(90, 0, 0))
-                .polyline([(0, 0), (inner_r, 0), (0, inner_apex_z)])
-                .close()
-                .revolve(360)
-            )
-
-        result = outer.cut(inner)
+        inner = _revolve_profile(wp, cavity)
+        with span("occ.cut"):
+            result = outer.cut(inner)
 
     # return _normalize_base_to_z0(result)
     return result
 
-def create_transition(wp: cq.Workplane, height: float, radius1: float, radius2: float, thickness: float) -> cq.Workplane:
+@cached_primitive("transition")
+def create_transition(wp: cq.Workplane, height: float, radius1: float, radius2: float, thickness: float, mode: str = "revolve") -> cq.Workplane:
+    _check_mode(mode)
+    if mode == "revolve":
+        return _revolve_profile(wp, transition_profile(height, radius1, radius2, thickness))
+
     # Outer frustum (base at z=0 radius2, top at z=height radius1)
     outer = wp.circle(radius2).workplane(offset=height).circle(radius1).loft(combine=True)
 
@@ -78,11 +99,28 @@ def create_transition(wp: cq.Workplane, height: float, radius1: float, radius2:
         inner_base_r = max(radius2 - thickness, 0.0)
         inner_top_r = max(radius1 - thickness, 0.0)
         inner = wp.circle(inner_base_r).workplane(offset=height).circle(inner_top_r).loft(combine=True)
-        result = outer.cut(inner)
+        with span("occ.cut"):
+            result = outer.cut(inner)
 
     # return _normalize_base_to_z0(result)
     return result
 
+def compare_build_modes(primitive, *args, **kwargs) -> tuple:
+    """
+    Builds a primitive in both build modes and returns (boolean volume, revolve volume, relative difference,
+    largest difference between the bounds of their bounding boxes).
+    """
+    volumes, bounds = [], []
+    for mode in ("boolean", "revolve"):
+        shapes = [s for s in primitive(cq.Workplane("XY"), *args, mode=mode, **kwargs).vals() if isinstance(s, cq.Shape)]
+        volumes.append(sum(s.Volume() for s in shapes))
+        bounds.append(exact_bounds(shapes))
+
+    boolean_volume, revolve_volume = volumes
+    bounds_difference = max(abs(a - b) for a, b in zip(*bounds))
+    return boolean_volume, revolve_volume, abs(revolve_volume - boolean_volume) / max(abs(boolean_volume), EPS), bounds_difference
+
+@cached_primitive("trapezoidal_fin")
 def create_trapezoidal_fin(wp: cq.Workplane, root_chord: float, tip_chord: float, span: float, sweep: float, thickness: float) -> cq.Workplane:
     # wp = cq.Workplane("XZ")
     # Define the 2D profile of the fin
@@ -102,4 +140,11 @@ def create_trapezoidal_fin(wp: cq.Workplane, root_chord: float, tip_chord: float
 
     fin = fin.rotate((0,0,0), (1,0,0), 90)
 
-    return fin
\ No newline at end of file
+    return fin
+
+@cached_primitive("fin_root_tab")
+def create_fin_root_tab(wp: cq.Workplane, root_chord: float, thickness: float, depth: float) -> cq.Workplane:
+    # Block under the root of create_trapezoidal_fin, in the frame the fin is built in: x from -depth to 0,
+    # y from -thickness to 0, z along the root. The flat root only touches a round body tube along a line;
+    # set into the tube wall, the tab joins them when fusing (see ProjectManager.fuseProject).
+    return wp.box(depth, thickness, root_chord, centered=False).translate((-depth, -thickness, 0))
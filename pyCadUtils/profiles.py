@@ -0,0 +1,146 @@
+"""
+Half cross-sections of the axisymmetric parts, in (r, z) coordinates with the base of the part at z = 0.
+
+A profile is a closed loop given as a list of pieces ("line" | "spline", points). Consecutive pieces
+share their end points and the loop is closed by a straight line from the last point back to the
+first one. Revolving the loop around the z-axis gives the solid: for hollow parts the loop is the
+wall section itself.
+"""
+import numpy as np
+from .noseshapes import CONICAL, get_shape, sample_profile
+
+EPS = 1e-9
+
+
+def _solid_or_wall(outer: list, inner: list) -> list:
+    # outer and inner go from the base (z=0) to the top; inner is dropped when it collapses onto the axis
+    if not inner or all(r <= EPS for r, _ in inner):
+        inner = [(0.0, outer[-1][1]), (0.0, outer[0][1])]
+    else:
+        inner = inner[::-1]
+
+    points = []
+    for p in outer + inner:
+        if not points or abs(p[0] - points[-1][0]) > EPS or abs(p[1] - points[-1][1]) > EPS:
+            points.append(p)
+    return [("line", points)]
+
+
+def tube_profile(height: float, radius: float, thickness: float) -> list:
+    """
+    Wall of a (hollow) cylinder.
+    """
+    outer = [(radius, 0.0), (radius, height)]
+    inner = []
+    if thickness is not None and thickness > 0 and radius - thickness > EPS:
+        inner_r = radius - thickness
+        inner = [(inner_r, 0.0), (inner_r, height)]
+    return _solid_or_wall(outer, inner)
+
+
+def transition_profile(height: float, radius1: float, radius2: float, thickness: float) -> list:
+    """
+    Wall of a (hollow) frustum with radius2 at the base and radius1 at the top. As with the lofted
+    transition, the inner surface is the outer one shrunk radially by the thickness.
+    """
+    outer = [(radius2, 0.0), (radius1, height)]
+    inner = []
+    if thickness is not None and thickness > 0:
+        inner = [(max(radius2 - thickness, 0.0), 0.0), (max(radius1 - thickness, 0.0), height)]
+    return _solid_or_wall(outer, inner)
+
+
+def nose_outer_points(height: float, radius: float, shape: str = "conical", shape_parameter: float = None, tolerance: float = None) -> np.ndarray:
+    """
+    Outer surface of a nose cone as an (n, 2) array of (r, z) points, from the base (radius, 0) to the tip (0, height).
+    """
+    if get_shape(shape) is CONICAL:
+        return np.array([[radius, 0.0], [0.0, height]])
+
+    x, r = sample_profile(shape, height, radius, shape_parameter, tolerance)
+    return np.column_stack([r[::-1], height - x[::-1]])
+
+
+def offset_inward(points: np.ndarray, thickness: float) -> np.ndarray:
+    """
+    Offsets an outer surface polyline (base to tip) by a constant distance along its inward normal.
+
+    The result is clipped to the base plane (z >= 0) and the axis (r >= 0), ending exactly on both.
+    Where the outer curvature radius is smaller than the thickness the raw offset folds back on
+    itself; those points are dropped by keeping z increasing and r decreasing from base to tip.
+    Returns an empty array when the offset leaves no material inside.
+    """
+    d = np.diff(points, axis=0)
+    d /= np.linalg.norm(d, axis=1)[:, None]
+    # inward normal of a segment going towards the tip: towards the axis and the base
+    segment_normals = np.column_stack([-d[:, 1], d[:, 0]])
+
+    normals = np.empty_like(points)
+    normals[0] = segment_normals[0]
+    normals[-1] = segment_normals[-1]
+    normals[1:-1] = segment_normals[:-1] + segment_normals[1:]
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+
+    inner = points + thickness * normals
+
+    # walk from base to tip, entering the valid region (z >= 0, r >= 0) through the base plane
+    # and leaving it through the axis
+    result = []
+    for i, (r, z) in enumerate(inner):
+        if z < 0:
+            if i + 1 < len(inner) and inner[i + 1][1] >= 0:
+                r1, z1 = inner[i + 1]
+                result.append((r + (r1 - r) * (0 - z) / (z1 - z), 0.0))
+        elif r < 0:
+            r0, z0 = inner[i - 1]
+            if result and r0 >= 0:
+                result.append((0.0, z0 + (z - z0) * r0 / (r0 - r)))
+            break
+        elif not result:
+            result.append((r, 0.0) if z <= EPS else (r, z))
+        elif z > result[-1][1] and r < result[-1][0]:
+            result.append((r, z))
+
+    if len(result) < 2 or result[0][1] > EPS or result[0][0] <= EPS:
+        return np.empty((0, 2))
+
+    if result[-1][0] > EPS:
+        # offset never reached the axis (very thin shapes): close it straight onto the axis
+        result.append((0.0, result[-1][1]))
+
+    return np.array(result)
+
+
+def nose_profile(height: float, radius: float, thickness: float, shape: str = "conical", shape_parameter: float = None, tolerance: float = None) -> list:
+    """
+    Wall of a (hollow) nose cone whose inner surface is the outer one offset by a constant normal thickness.
+    """
+    kind = "line" if get_shape(shape) is CONICAL else "spline"
+    outer = nose_outer_points(height, radius, shape, shape_parameter, tolerance)
+
+    inner = np.empty((0, 2))
+    if thickness is not None and thickness > 0:
+        inner = offset_inward(outer, thickness)
+
+    outer = [tuple(map(float, p)) for p in outer]
+    if len(inner) == 0:
+        return [(kind, outer), ("line", [outer[-1], (0.0, 0.0), outer[0]])]
+
+    inner = [tuple(map(float, p)) for p in inner[::-1]]
+    return [(kind, outer), ("line", [outer[-1], inner[0]]), (kind, inner), ("line", [inner[-1], outer[0]])]
+
+
+def nose_inner_profile(height: float, radius: float, thickness: float, shape: str = "conical", shape_parameter: float = None, tolerance: float = None) -> list:
+    """
+    Cavity of a hollow nose cone as a solid profile, or an empty list if there is none. Subtracting it
+    from the solid outer nose cone gives the same part as revolving nose_profile.
+    """
+    kind = "line" if get_shape(shape) is CONICAL else "spline"
+    outer = nose_outer_points(height, radius, shape, shape_parameter, tolerance)
+    inner = offset_inward(outer, thickness) if thickness is not None and thickness > 0 else []
+
+    if len(inner) == 0:
+        return []
+
+    inner = [tuple(map(float, p)) for p in inner]
+    return [("line", [(0.0, 0.0), inner[0]]), (kind, inner), ("line", [inner[-1], (0.0, 0.0)])]
@@ -1,30 +1,133 @@
-import cadquery as cq
+from __future__ import annotations
+import os
+from typing import NamedTuple, Optional
+import numpy as np
+from ._lazy import cq
 from .parts import (
     BodyTube3DBuilder,
     Transition3DBuilder,
     NoseCone3DBuilder,
     Fins3DBuilder,
 )
+from .export import (
+    DEFAULT_ANGULAR_DEFLECTION,
+    DEFAULT_UNIT,
+    UNITS,
+    WRITERS,
+    Instance,
+    default_linear_deflection,
+    exact_bounds,
+    export_shapes,
+    instanced,
+    iter_meshes,
+    location_matrix,
+    mesh_cache,
+    split_solids,
+    write_meshes,
+)
+from .fusion import DEFAULT_FUZZY_VALUE, FusionResult, fuse_shapes
+from .incremental import ExportReport, export_components
+from .lod import DEFAULT_PIXEL_ERROR, mesh_actor, preview_meshes
+from .massprops import (
+    MassProperties,
+    combine,
+    cone_properties,
+    cylinder_properties,
+    fin_root_gap_volume,
+    fin_set_properties,
+    placed,
+    transition_properties,
+)
+from .mesh import component_meshes, fin_placements, placed_meshes, trapezoidal_fin_mesh
+from .primitives import BUILD_MODES as PRIMITIVE_BUILD_MODES, create_fin_root_tab, create_trapezoidal_fin
+from .sharedmesh import SharedMeshes, share_meshes
+from .spec import COMPONENT_METHODS
+from .trace import span, traced
+
+# Build modes of a project: those of the hollow primitives, or "mesh" to record the parts without OCC
+BUILD_MODES = PRIMITIVE_BUILD_MODES + ("mesh",)
+
+
+class Component(NamedTuple):
+
+    "A part of a project: its own shape and where it is placed."
+
+    name: str
+    kind: str                         # spec component type, see spec.COMPONENT_METHODS
+    params: dict                      # arguments the part was added with
+    key: tuple                        # (kind, inputs) identifying its geometry, as in spec.layout
+    z_position: float                 # base of the part (of its body tube for fin sets)
+    shape: Optional[cq.Shape]         # at the origin, shared by components with the same geometry; None in mesh build mode
+    locations: tuple                  # placements of the shape: one, or one per fin for instanced fin sets
+    mass_properties: MassProperties   # placed on the stack
+
+    def placed(self) -> cq.Shape:
+        """
+        The shape at its placements, a compound if it is placed several times.
+        """
+        if len(self.locations) == 1:
+            return self.shape.moved(self.locations[0])
+        return cq.Compound.makeCompound([self.shape.moved(loc) for loc in self.locations])
+
 
 class ProjectManager:
 
     numProjects = 0
 
-    def __init__(self, name = None, project = None) -> None:
+    def __init__(self, name = None, project = None, build_mode = "revolve", density = 1.0, unit = DEFAULT_UNIT) -> None:
+
+        # How hollow parts are built, see primitives.BUILD_MODES. In "mesh" mode no OCC geometry is
+        # built: the parts are only recorded and meshed directly with NumPy when needed (see mesh.py).
+        if build_mode not in BUILD_MODES:
+            raise ValueError(f"Unknown build mode: {build_mode}, expected one of {BUILD_MODES}")
+        self.build_mode = build_mode
 
         self.name = name
         self.project = project
 
+        # Density of the parts added, used by massProperties
+        self.density = density
+
+        # Length unit of the model (see export.UNITS), recorded in the exported files that have one
+        self.unit = unit
+
         self._btbuilder = BodyTube3DBuilder()
         self._tbuilder = Transition3DBuilder()
         self._conebuilder = NoseCone3DBuilder()
         self._fbuilder = Fins3DBuilder()
 
+        if build_mode != "mesh":
+            for builder in (self._btbuilder, self._tbuilder, self._conebuilder):
+                builder.build_mode = build_mode
+
+        # Ordered component table. The project Workplane is assembled from it when asked for.
+        self._components = []
+        self._shapes = {}  # geometry key -> shape at the origin, shared by identical components
+
+        # Height of the top of the stack, advanced by the known length of every part added.
+        # Parts are placed from it directly instead of querying the geometry of the project.
+        self._baseHeight = self._measureStackHeight()
+        self._resetStack()
+
+    def _resetStack(self) -> None:
+
+        self._cursor_z = self._baseHeight
+
         # Track the position and diameter of the last body tube added
         self._last_body_diameter = None
         self._last_body_z_position = 0  # Z position where the last body tube sits
         self._last_body_height = 0      # Height of the last body tube
 
+    @property
+    def unit(self) -> str:
+        return self._unit
+
+    @unit.setter
+    def unit(self, unit: str) -> None:
+        if unit not in UNITS:
+            raise ValueError(f"Unknown unit: {unit}, expected one of {sorted(UNITS)}")
+        self._unit = unit
+
     @property
     def name(self):
         return self._name
@@ -44,58 +147,480 @@ class ProjectManager:
 
     @property
     def project(self): 
+
+        # Assembled from the base project and the component table on first access after a change,
+        # so that mesh build mode never loads OCC
+        if self._project is None:
+            project = self._baseProject if self._baseProject is not None else self.newProject()
+            for component in self._components:
+                if component.shape is not None:
+                    project = project.add(component.placed())
+            self._project = project
+
         return self._project
     
     @project.setter 
     def project(self, cqProject): 
 
-        if cqProject is None:
-            self._project = self.newProject()
-
-        else:
-            self._project = cqProject   
+        # Geometry the components are added on top of. Mesh build mode only measures the component meshes,
+        # so the base would be ignored there.
+        if cqProject is not None and self.build_mode == "mesh":
+            raise ValueError("A base project is OCC geometry, not available in mesh build mode")
+        self._baseProject = cqProject
+        self._project = None
 
     @staticmethod
     def newProject():
         return cq.Workplane("XY")
+
+    @property
+    def components(self) -> tuple:
+        """The components added so far, bottom to top."""
+        return tuple(self._components)
+
+    def getComponent(self, name: str) -> Component:
+
+        for component in self._components:
+            if component.name == name:
+                return component
+
+        raise KeyError(f"No component named {name!r}")
+
+    def removeComponent(self, name: str) -> None:
+
+        """Removes a component. The parts above it move down to close the gap."""
+
+        self.getComponent(name)
+        self.setComponents([dict(c.params, type=c.kind, name=c.name) for c in self._components if c.name != name])
+
+    def replaceComponent(self, name: str, **params) -> None:
+
+        """
+        Changes parameters of a component. Only components whose geometry changes are rebuilt; the parts
+        above it are moved if its length changed.
+        """
+
+        old = self.getComponent(name)
+        self.setComponents([dict(c.params, **(params if c is old else {}), type=c.kind, name=c.name) for c in self._components])
+
+    def toSpec(self) -> dict:
+
+        """
+        The spec of the components (see spec.validate_spec), names and fin set modes included, which
+        apply_spec turns back into this rocket. A base project set through the project property is not part of it.
+        """
+
+        components = [dict(type=c.kind, name=c.name, **{k: v for k, v in c.params.items() if v is not None})
+                      for c in self._components]
+        return {"name": self.name, "unit": self.unit, "components": components}
+
+    def setComponents(self, components: list) -> list:
+
+        """
+        Replaces the components, bottom to top. Each one is a dict of its spec "type" and the arguments of
+        its add method (see spec.COMPONENT_METHODS), optionally with a "name". The shapes of components
+        whose geometry did not change are reused and only placed again. If a component cannot be added
+        the previous components are kept and the error is raised.
+
+        Returns:
+            The indices of the components whose shape had to be built.
+        """
+
+        previous = (self._components, self._project, self._cursor_z,
+                    self._last_body_diameter, self._last_body_z_position, self._last_body_height)
+        self._components = []
+        self._project = None
+        self._resetStack()
+
+        built = []
+        try:
+            for i, component in enumerate(components):
+                params = dict(component)
+                kind = params.pop("type")
+                shapes = len(self._shapes)
+                getattr(self, COMPONENT_METHODS[kind])(**params)
+                if len(self._shapes) > shapes:
+                    built.append(i)
+        except BaseException:
+            (self._components, self._project, self._cursor_z,
+             self._last_body_diameter, self._last_body_z_position, self._last_body_height) = previous
+            raise
+
+        used = {c.key for c in self._components}
+        self._shapes = {k: v for k, v in self._shapes.items() if k[1] in used}
+        return built
+
+    def _addComponent(self, kind: str, name: Optional[str], params: dict, key: tuple, z_position: float,
+                      build, locations: list, props: MassProperties) -> None:
+
+        if name is None:
+            name = f"{kind}{sum(c.kind == kind for c in self._components) + 1}"
+        if any(c.name == name for c in self._components):
+            raise ValueError(f"A component named {name!r} already exists")
+
+        shape = None
+        if self.build_mode != "mesh":
+            geometry = (params.get("mode"), key)
+            shape = self._shapes.get(geometry)
+            if shape is None:
+                shape = build()
+                self._shapes[geometry] = shape
+
+        self._components.append(Component(name, kind, params, key, z_position, shape, tuple(locations),
+                                          placed(props, (0.0, 0.0, z_position))))
+        self._project = None
+
+    @staticmethod
+    def _zLocation(z_position: float) -> cq.Location:
+        return cq.Location(cq.Vector(0, 0, z_position))
+
+    @staticmethod
+    def _single(result: cq.Workplane) -> cq.Shape:
+        shapes = [s for s in result.vals() if isinstance(s, cq.Shape)]
+        return shapes[0] if len(shapes) == 1 else cq.Compound.makeCompound(shapes)
+
+    def toAssembly(self) -> cq.Assembly:
+
+        """
+        The project as an assembly with one child per component. Components with the same geometry
+        (identical tubes, the fins of a set) share one shape, stored once and placed many times.
+        """
+
+        if self.build_mode == "mesh":
+            raise ValueError("No OCC geometry in mesh build mode")
+
+        assembly = cq.Assembly(name=self.name)
+        if self._baseProject is not None and self._baseProject.vals():
+            assembly.add(self._baseProject, name="base")
+
+        for component in self._components:
+            if len(component.locations) == 1:
+                assembly.add(component.shape, name=component.name, loc=component.locations[0])
+            else:
+                group = cq.Assembly(name=component.name)
+                for i, loc in enumerate(component.locations):
+                    group.add(component.shape, name=f"{component.name}_{i}", loc=loc)
+                assembly.add(group)
+
+        return assembly
+
+    def fuseProject(self, fuzzy_value: float = DEFAULT_FUZZY_VALUE, parallel: bool = True, glue: bool = False,
+                    timeout: float = None) -> FusionResult:
+
+        """
+        Fuses the whole project into a single solid with one multi-argument boolean, and checks the result
+        (see fusion.fuse_shapes). Every fin root gets a tab set into the wall of its body tube, so that
+        the fins fuse with the tube they only touch along a line. The tabs overlap the tube, so glue is
+        only used without fins.
+        """
+
+        tabs, tab_volume = self._finRootTabs()
+        return fuse_shapes(self.project.vals(), fuzzy_value, parallel, glue and not tabs, timeout, tabs, tab_volume)
+
+    def _finRootTabs(self) -> tuple:
+        # primitives.create_fin_root_tab under every fin, half the wall deep so that it stays clear of the
+        # inner surface, and the volume they fill between the flat roots and the round tubes
+        tabs, volume = [], 0.0
+        tube = None
+        for component in self._components:
+            if component.kind == "body_tube":
+                tube = component
+            if component.kind != "fin_set" or component.shape is None or tube is None:
+                continue
+
+            count, root_chord, _, _, _, position, thickness, bd = component.key[1]
+            wall = tube.params["thickness"] or tube.params["diameter"] / 2.0
+            tab = create_fin_root_tab(cq.Workplane("XY"), root_chord, thickness, wall / 2.0).val()
+            tabs += [tab.moved(loc) for loc in self._fbuilder.create_FinLocations(count, position, bd, component.z_position)]
+            volume += count * fin_root_gap_volume(root_chord, thickness, bd / 2.0)
+
+        return tabs, volume
+
+    def fusedProject(self, fuzzy_value: float = DEFAULT_FUZZY_VALUE, timeout: float = None) -> cq.Workplane:
+
+        """The whole project fused into a single solid, built on request."""
+
+        if not any(isinstance(s, cq.Shape) for s in self.project.vals()):
+            return self.newProject()
+
+        return self.newProject().add(self.fuseProject(fuzzy_value, timeout=timeout).shape)
+
+    @property
+    def stackHeight(self) -> float:
+        """Height of the top of the stack, as tracked from the lengths of the parts added."""
+        return self._cursor_z
+
+    def _measureStackHeight(self) -> float:
+        if self.build_mode == "mesh":
+            vertices = [m.vertices[:, 2].max() for m in self.meshes() if len(m.vertices)]
+            return float(max(vertices, default=0.0))
+
+        # not Shape.BoundingBox, which grows with the triangulation an export leaves on the shapes
+        shapes = [s for s in self.project.vals() if isinstance(s, cq.Shape)]
+        if not shapes:
+            return 0.0
+        return exact_bounds(shapes)[5]
+
+    def meshes(self, linear_deflection: float = None, angular_deflection: float = None) -> list:
+
+        """
+        Meshes of the components, generated directly from their parameters with NumPy (see mesh.py)
+        whatever the build mode. The deflections default to those of the unit of the project (see _deflections).
+        """
+
+        linear_deflection, angular_deflection = self._deflections(linear_deflection, angular_deflection)
+        return [m for c in self._components for m in placed_meshes(c.key, c.z_position, linear_deflection, angular_deflection)]
+
+    def _deflections(self, linear_deflection: Optional[float], angular_deflection: Optional[float]) -> tuple:
+        # 1 mm whatever the unit of the model (see export.default_linear_deflection)
+        return (default_linear_deflection(self.unit) if linear_deflection is None else linear_deflection,
+                DEFAULT_ANGULAR_DEFLECTION if angular_deflection is None else angular_deflection)
+
+    def tessellate(self, linear_deflection: float = None, angular_deflection: float = None):
+
+        """
+        Meshes of the project as exported to mesh formats: tessellated by OCC, or generated directly in "mesh" build mode.
+        """
+
+        linear_deflection, angular_deflection = self._deflections(linear_deflection, angular_deflection)
+        if self.build_mode == "mesh":
+            return iter(self.meshes(linear_deflection, angular_deflection))
+        return iter_meshes(self.project.vals(), linear_deflection, angular_deflection)
+
+    def sharedMeshes(self, linear_deflection: float = None, angular_deflection: float = None) -> SharedMeshes:
+
+        """
+        Tessellates the project into a shared memory block (see sharedmesh), to hand the meshes to another
+        process without pickling them. The receiver must release the block.
+        """
+
+        return share_meshes(self.tessellate(linear_deflection, angular_deflection))
+
+    def instances(self, linear_deflection: float = None, angular_deflection: float = None) -> list:
+
+        """
+        The project tessellated once per distinct geometry: a list of export.Instance, the meshes of a geometry
+        at the origin with the placement of every component (and every fin) using it.
+        """
+
+        linear_deflection, angular_deflection = self._deflections(linear_deflection, angular_deflection)
+        groups = {}  # geometry -> Instance
+
+        def add(geometry, meshes, matrices):
+            if geometry not in groups:
+                groups[geometry] = Instance(tuple(meshes()), [])
+            groups[geometry].matrices.extend(matrices)
+
+        if self.build_mode == "mesh":
+            for c in self._components:
+                if c.kind == "fin_set":
+                    count, root_chord, tip_chord, span, sweep, position, thickness, body_diameter = c.key[1]
+                    fin = (root_chord, tip_chord, span, sweep, thickness)
+                    add(("fin", fin), lambda: [trapezoidal_fin_mesh(*fin)], fin_placements(count, position, body_diameter, c.z_position))
+                else:
+                    matrix = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, c.z_position]])
+                    add(c.key, lambda: component_meshes(c.key, linear_deflection, angular_deflection), [matrix])
+            return list(groups.values())
+
+        base = [s for s in self._baseProject.vals() if isinstance(s, cq.Shape)] if self._baseProject is not None else []
+        shapes = {c.shape for c in self._components}
+        # tessellate every distinct solid in one parallel OCC pass
+        mesh_cache.premesh(split_solids(list(shapes) + base), linear_deflection, angular_deflection)
+
+        if base:
+            add("base", lambda: iter_meshes(base, linear_deflection, angular_deflection), [np.eye(4)[:3]])
+        for c in self._components:
+            add(c.shape, lambda: (mesh_cache.mesh(s, linear_deflection, angular_deflection) for s in split_solids([c.shape])),
+                [location_matrix(loc) for loc in c.locations])
+
+        return list(groups.values())
+
+    @traced("ProjectManager.exportFormats")
+    def exportFormats(self, exportFolderPath: str, formats, linear_deflection: float = None, angular_deflection: float = None) -> dict:
+
+        """
+        Exports the project to <exportFolderPath>/<name>.<format> for every mesh format (see export.WRITERS) from
+        a single tessellation, in which every distinct part is tessellated once. GLB references the meshes of
+        repeated parts (fins, identical tubes) from one node per copy instead of storing them again.
+
+        Returns:
+            A dict of format -> path.
+        """
+
+        formats = [format.lower() for format in formats]
+        unknown = [format for format in formats if format not in WRITERS]
+        if unknown:
+            raise ValueError(f"Unsupported mesh formats: {unknown}")
+
+        with span("export.tessellate_once", formats=",".join(formats)):
+            scene = self.instances(linear_deflection, angular_deflection)
+
+        paths = {}
+        for format in formats:
+            path = os.path.join(exportFolderPath, self.name + "." + format)
+            with span("export.write", format=format, path=path), open(path, "wb") as f:
+                write_meshes(format, scene if format == "glb" else instanced(scene), f, self.unit)
+            paths[format] = path
+
+        return paths
+
+    def previewMeshes(self, screen_size: float = None, triangle_budget: int = None, pixel_error: float = DEFAULT_PIXEL_ERROR) -> list:
+
+        """
+        Meshes of the components at a level of detail picked from the on-screen height of the rocket in pixels
+        and/or a triangle budget (see lod.select_levels). The levels are cached per component.
+        """
+
+        return preview_meshes(self._components, screen_size, triangle_budget, pixel_error)
+
+    def preview(self, screen_size: float = 1000, triangle_budget: int = 500000, color: tuple = None, alpha: float = 1.0,
+                edges: bool = False, specular: bool = True, **kwargs) -> None:
+
+        """
+        Opens the VTK viewer on the level of detail meshes of the components, and on the base project if
+        there is one. color, alpha, edges and specular style the meshes (see lod.mesh_actor) and the base
+        project; the other kwargs (camera, window, screenshot) go to cadquery.vis.show.
+        """
+
+        # the viewer pulls in VTK, so it is only imported when asked for
+        from cadquery.vis import show
+
+        actor = mesh_actor(self.previewMeshes(screen_size, triangle_budget), color, alpha, edges, specular)
+        base = [self._baseProject] if self._baseProject is not None and self._baseProject.vals() else []
+        show(*base, actor, alpha=alpha, edges=edges, specular=specular, **kwargs)
+
+    def massProperties(self) -> MassProperties:
+
+        """
+        Mass properties of the components, computed analytically from their parameters (see massprops).
+        Geometry passed in with the project argument is not included.
+        """
+
+        return combine([c.mass_properties for c in self._components])
+
+    def verifyStack(self, tolerance: float = 1e-6) -> bool:
+
+        """Checks the tracked stack height against the bounding box of the OCC geometry."""
+
+        with span("occ.bounding_box"):
+            return abs(self._measureStackHeight() - self._cursor_z) <= tolerance
     
-    def addBodyTube(self, length: float, diameter: float, thickness: float) -> None:
+    @traced("ProjectManager.addBodyTube")
+    def addBodyTube(self, length: float, diameter: float, thickness: float, name: str = None) -> None:
 
         """Adds a (hollow) cylinder to the current project."""
 
-        self.project = self._btbuilder.addPart(project=self.project, length=length, diameter=diameter, thickness=thickness)
+        self._addComponent(
+            "body_tube", name, dict(length=length, diameter=diameter, thickness=thickness),
+            ("body_tube", (length, diameter, thickness)), self._cursor_z,
+            lambda: self._single(self._btbuilder.create_BodyTube(cq.Workplane("XY"), length, diameter / 2.0, thickness)),
+            [self._zLocation(self._cursor_z)] if self.build_mode != "mesh" else [],
+            cylinder_properties(length, diameter / 2.0, thickness, self.density),
+        )
+        self._cursor_z += float(length)
 
         self._last_body_diameter = float(diameter)
         self._last_body_height = float(length)
         # Update Z position: top of the body tube
-        self._last_body_z_position = max(s.BoundingBox().zmax for s in self.project.vals())
+        self._last_body_z_position = self._cursor_z
 
-    def addTransition(self, length: float, bottom_diameter: float, top_diameter: float, thickness: float) -> None: 
+    @traced("ProjectManager.addTransition")
+    def addTransition(self, length: float, bottom_diameter: float, top_diameter: float, thickness: float, name: str = None) -> None: 
         
         """Adds a (hollow) transition to the current project."""
 
-        self.project = self._tbuilder.addPart(project= self.project, length= length, bottom_diameter= bottom_diameter, top_diameter= top_diameter, thickness= thickness)
+        # Transition3DBuilder puts bottom_diameter at the top of the primitive
+        self._addComponent(
+            "transition", name, dict(length=length, bottom_diameter=bottom_diameter, top_diameter=top_diameter, thickness=thickness),
+            ("transition", (length, bottom_diameter, top_diameter, thickness)), self._cursor_z,
+            lambda: self._single(self._tbuilder.create_Transition(cq.Workplane("XY"), length, bottom_diameter / 2.0, top_diameter / 2.0, thickness)),
+            [self._zLocation(self._cursor_z)] if self.build_mode != "mesh" else [],
+            transition_properties(length, bottom_diameter / 2.0, top_diameter / 2.0, thickness, self.density),
+        )
+        self._cursor_z += float(length)
 
-    def addNoseCone(self, length: float, diameter: float, thickness: float) -> None:
+    @traced("ProjectManager.addNoseCone")
+    def addNoseCone(self, length: float, diameter: float, thickness: float, shape: str = "conical", shape_parameter: float = None, name: str = None) -> None:
 
-        """Adds a (hollow) NoseCone to the current project."""
+        """Adds a (hollow) NoseCone of the given shape (see noseshapes) to the current project."""
 
-        self.project = self._conebuilder.addPart(project= self.project, length= length, diameter= diameter, thickness= thickness)
+        self._addComponent(
+            "nose_cone", name, dict(length=length, diameter=diameter, thickness=thickness, shape=shape, shape_parameter=shape_parameter),
+            ("nose_cone", (length, diameter, thickness, shape, shape_parameter)), self._cursor_z,
+            lambda: self._single(self._conebuilder.create_NoseCone(cq.Workplane("XY"), length, diameter / 2.0, thickness, shape, shape_parameter)),
+            [self._zLocation(self._cursor_z)] if self.build_mode != "mesh" else [],
+            cone_properties(length, diameter / 2.0, thickness, self.density, shape, shape_parameter),
+        )
+        self._cursor_z += float(length)
 
-    def addFinSet(self, count, root_chord, tip_chord, span, sweep, position, thickness, body_diameter=None):
+    @traced("ProjectManager.addFinSet")
+    def addFinSet(self, count, root_chord, tip_chord, span, sweep, position, thickness, body_diameter=None, mode="compound", name=None):
         bd = body_diameter if body_diameter is not None else self._last_body_diameter
         if bd is None:
             raise ValueError("body_diameter not provided and no BodyTube has been added yet")
         
         # Pass the Z position of the base of the last body tube (where fins should attach)
         z_position = self._last_body_z_position - self._last_body_height
-        print(z_position)
-        print(self._last_body_z_position)
-        print(self._last_body_height)
-        self.project = self._fbuilder.addPart(self.project, count, root_chord, tip_chord,
-                                              span, sweep, position, thickness, body_diameter=bd, z_position=z_position)
+
+        if self.build_mode == "mesh":
+            build, locations = None, []
+        elif mode == "compound":
+            # one fin solid, placed once per fin (see Fins3DBuilder.create_FinLocations)
+            def build():
+                return create_trapezoidal_fin(cq.Workplane("XY"), root_chord, tip_chord, span, sweep, thickness).val()
+            locations = self._fbuilder.create_FinLocations(count, position, bd, z_position)
+        else:
+            def build():
+                return self._single(self._fbuilder.create_FinSet(None, count, root_chord, tip_chord, span, sweep, position, thickness, bd, 0, mode))
+            locations = [self._zLocation(z_position)]
+
+        self._addComponent(
+            "fin_set", name,
+            dict(count=count, root_chord=root_chord, tip_chord=tip_chord, span=span, sweep=sweep, position=position,
+                 thickness=thickness, body_diameter=body_diameter, mode=mode),
+            ("fin_set", (count, root_chord, tip_chord, span, sweep, position, thickness, bd)), z_position,
+            build, locations,
+            fin_set_properties(count, root_chord, tip_chord, span, sweep, position, thickness, bd, 0.0, self.density),
+        )
     
-    def exportProject(self, exportFolderPath: str, format: str): #? Make a new class for exporting projects
-        
-        path = exportFolderPath + "\\" + self.name + "." + format.lower()
-        cq.exporters.export(self.project, path)
\ No newline at end of file
+    @traced("ProjectManager.exportProject")
+    def exportProject(self, exportFolderPath: str, format: str, linear_deflection: float = None, angular_deflection: float = None,
+                      assembly: bool = False) -> str: #? Make a new class for exporting projects
+
+        """
+        Exports the project to <exportFolderPath>/<name>.<format> and returns the path.
+        Mesh formats (STL, 3MF, OBJ, PLY, GLB) are tessellated part by part and streamed to the file (see
+        export.export_shapes); other formats go through cq.exporters. In "mesh" build mode only mesh formats
+        are available. To write several formats from a single tessellation, see exportFormats.
+        With assembly, the component assembly is saved instead (STEP, XML, GLTF, ...), so identical
+        components are written once and referenced.
+        """
+
+        path = os.path.join(exportFolderPath, self.name + "." + format.lower())
+
+        if self.build_mode == "mesh":
+            if format.lower() not in WRITERS:
+                raise ValueError(f"Format {format} needs OCC geometry, not available in mesh build mode")
+            meshes = self.meshes(linear_deflection, angular_deflection)
+            with span("export.write", format=format, path=path), open(path, "wb") as f:
+                write_meshes(format.lower(), meshes, f, self.unit)
+        elif assembly:
+            self.toAssembly().export(path)
+        elif format.lower() in WRITERS:
+            export_shapes(self.project.vals(), path, format, linear_deflection, angular_deflection, unit=self.unit)
+        else:
+            cq.exporters.export(self.project, path)
+
+        return path
+
+    @traced("ProjectManager.exportComponents")
+    def exportComponents(self, exportFolderPath: str, format: str, linear_deflection: float = None,
+                         angular_deflection: float = None) -> ExportReport:
+
+        """
+        Exports every component to its own file under <exportFolderPath>/<name>/, with a manifest of their
+        placements (see incremental.export_components). Exporting again only rewrites the components that changed.
+        """
+
+        return export_components(self._components, os.path.join(exportFolderPath, self.name), format, self.name,
+                                 self.build_mode, linear_deflection, angular_deflection, self.unit)
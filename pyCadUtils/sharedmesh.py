@@ -0,0 +1,134 @@
+"""
+Meshes passed between processes through shared memory instead of pickling.
+
+A worker packs the meshes of a rocket into one multiprocessing.shared_memory block (all the vertices
+as float64, then all the triangles as int64) and returns a SharedMeshes descriptor: the block name and
+the size of every mesh, a few bytes to pickle whatever the size of the meshes. The parent maps the
+block and gets Mesh views of it without copying, writes them, and releases the block:
+
+    block = share_meshes(manager.tessellate())   # in the worker
+    block.write("rocket.stl")                    # in the parent, also frees the block
+
+A block lives until it is released. Blocks never released are removed by the multiprocessing resource
+tracker when the parent exits.
+"""
+from __future__ import annotations
+import os
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator, NamedTuple, Optional
+import numpy as np
+from .export import DEFAULT_UNIT, WRITERS, Mesh, write_meshes
+from .trace import span
+
+_VERTEX = np.dtype("<f8")
+_INDEX = np.dtype("<i8")
+
+
+class SharedMeshes(NamedTuple):
+    name: str       # shared memory block
+    counts: tuple   # (vertices, triangles) of every mesh, in order
+
+    @property
+    def vertex_count(self) -> int:
+        return sum(v for v, _ in self.counts)
+
+    @property
+    def triangle_count(self) -> int:
+        return sum(t for _, t in self.counts)
+
+    @property
+    def nbytes(self) -> int:
+        return 3 * (self.vertex_count * _VERTEX.itemsize + self.triangle_count * _INDEX.itemsize)
+
+    @contextmanager
+    def open(self) -> Iterator[list]:
+        """
+        Maps the block and yields the meshes as views of it. The views are only valid inside the with
+        block: the list is emptied on exit, do not keep references to its meshes.
+        """
+        block = shared_memory.SharedMemory(name=self.name)
+        meshes = []
+        try:
+            vertices = np.ndarray((self.vertex_count, 3), _VERTEX, buffer=block.buf)
+            triangles = np.ndarray((self.triangle_count, 3), _INDEX, buffer=block.buf, offset=vertices.nbytes)
+
+            v = t = 0
+            for vertex_count, triangle_count in self.counts:
+                meshes.append(Mesh(vertices[v:v + vertex_count], triangles[t:t + triangle_count]))
+                v += vertex_count
+                t += triangle_count
+            del vertices, triangles
+
+            yield meshes
+        finally:
+            meshes.clear()
+            block.close()
+
+    def release(self) -> None:
+        """
+        Frees the block. The descriptor is unusable afterwards.
+        """
+        try:
+            block = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        block.close()
+        block.unlink()
+
+    def write(self, path: str, format: Optional[str] = None, release: bool = True, unit: str = DEFAULT_UNIT) -> int:
+        """
+        Writes the meshes to a mesh file (see export.WRITERS) straight from the block, then releases it.
+        unit is the length unit of the model (see export.UNITS). Returns the number of triangles written.
+        """
+        format = (format or os.path.splitext(path)[1].lstrip(".")).lower()
+        if format not in WRITERS:
+            raise ValueError(f"Unsupported mesh format: {format}")
+
+        try:
+            with self.open() as meshes, span("export.write", format=format, path=path, shared=True) as sp, open(path, "wb") as f:
+                triangles = write_meshes(format, meshes, f, unit)
+                sp.set(triangles=triangles)
+        finally:
+            if release:
+                self.release()
+
+        return triangles
+
+
+def share_meshes(meshes: Iterable[Mesh]) -> SharedMeshes:
+    """
+    Copies meshes into a new shared memory block and returns its descriptor. The block outlives the
+    calling process until SharedMeshes.release is called.
+    """
+    meshes = list(meshes)
+    counts = tuple((len(m.vertices), len(m.triangles)) for m in meshes)
+    vertex_count = sum(v for v, _ in counts)
+    triangle_count = sum(t for _, t in counts)
+
+    # a block cannot be empty
+    size = max(3 * (vertex_count * _VERTEX.itemsize + triangle_count * _INDEX.itemsize), 1)
+
+    with span("sharedmesh.share", bytes=size):
+        block = shared_memory.SharedMemory(create=True, size=size)
+        vertices = triangles = None
+        try:
+            vertices = np.ndarray((vertex_count, 3), _VERTEX, buffer=block.buf)
+            triangles = np.ndarray((triangle_count, 3), _INDEX, buffer=block.buf, offset=vertices.nbytes)
+
+            v = t = 0
+            for mesh in meshes:
+                vertices[v:v + len(mesh.vertices)] = mesh.vertices
+                triangles[t:t + len(mesh.triangles)] = mesh.triangles
+                v += len(mesh.vertices)
+                t += len(mesh.triangles)
+            del vertices, triangles
+        except BaseException:
+            vertices = triangles = None  # views must be gone before closing
+            block.close()
+            block.unlink()
+            raise
+
+    name = block.name
+    block.close()
+    return SharedMeshes(name, counts)
@@ -0,0 +1,292 @@
+from __future__ import annotations
+import copy
+import json
+import tomllib
+from typing import NamedTuple, Optional
+from ._lazy import cq
+from .export import UNITS
+
+# Maps the "type" of a spec component to the ProjectManager method that adds it
+COMPONENT_METHODS = {
+    "body_tube": "addBodyTube",
+    "transition": "addTransition",
+    "fin_set": "addFinSet",
+    "nose_cone": "addNoseCone",
+}
+
+# (required, optional) parameters of each component type, named as in ProjectManager
+COMPONENT_PARAMETERS = {
+    "body_tube": (("length", "diameter", "thickness"), ()),
+    "transition": (("length", "bottom_diameter", "top_diameter", "thickness"), ()),
+    "fin_set": (("count", "root_chord", "tip_chord", "span", "sweep", "position", "thickness"), ("body_diameter",)),
+    "nose_cone": (("length", "diameter", "thickness"), ("shape", "shape_parameter")),
+}
+
+# Further optional parameters, which do not change the solid of a component (layout ignores them): the
+# name of the component and how the fins of a set are combined (see Fins3DBuilder.FIN_SET_MODES)
+COMPONENT_OPTIONS = {
+    "body_tube": ("name",),
+    "transition": ("name",),
+    "fin_set": ("name", "mode"),
+    "nose_cone": ("name",),
+}
+
+
+def validate_spec(spec: dict) -> None:
+    """
+    Checks that a rocket spec is well formed. Raises ValueError describing the first problem found.
+
+    A spec looks like:
+
+        {"name": "test8", "unit": "meter", "components": [{"type": "body_tube", "length": 1, "diameter": 0.36, "thickness": 0.02}, ...]}
+
+    Components are listed bottom to top, in the order they would be added to a ProjectManager, and may
+    be named. The optional unit is the length unit of the model (see export.UNITS).
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("A rocket spec must be a mapping")
+
+    if "unit" in spec and spec["unit"] not in UNITS:
+        raise ValueError(f"Unknown unit {spec['unit']!r}, expected one of {sorted(UNITS)}")
+
+    components = spec.get("components")
+    if not isinstance(components, list):
+        raise ValueError("A rocket spec needs a 'components' list")
+
+    has_body_tube = False
+    names = set()
+    for i, component in enumerate(components):
+        kind = component.get("type")
+        if kind not in COMPONENT_PARAMETERS:
+            raise ValueError(f"Component {i}: unknown component type {kind!r}")
+
+        required, optional = COMPONENT_PARAMETERS[kind]
+        params = set(component) - {"type"}
+
+        missing = [p for p in required if p not in params]
+        if missing:
+            raise ValueError(f"Component {i} ({kind}): missing parameters {missing}")
+
+        unknown = sorted(params - set(required) - set(optional) - set(COMPONENT_OPTIONS[kind]))
+        if unknown:
+            raise ValueError(f"Component {i} ({kind}): unknown parameters {unknown}")
+
+        name = component.get("name")
+        if name is not None:
+            if not isinstance(name, str):
+                raise ValueError(f"Component {i} ({kind}): name must be a string")
+            if name in names:
+                raise ValueError(f"Component {i} ({kind}): duplicate name {name!r}")
+            names.add(name)
+
+        if kind == "body_tube":
+            has_body_tube = True
+        elif kind == "fin_set" and not has_body_tube and component.get("body_diameter") is None:
+            raise ValueError(f"Component {i} (fin_set): body_diameter not provided and no body_tube precedes it")
+
+
+def load_spec(path: str) -> dict:
+    """
+    Reads and validates a rocket spec from a .json or .toml file.
+    """
+    if path.lower().endswith(".toml"):
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+    else:
+        with open(path, "r") as f:
+            spec = json.load(f)
+
+    validate_spec(spec)
+    return spec
+
+
+def _toml_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return json.dumps(value)
+    return repr(value)
+
+
+def dump_spec(spec: dict, path: str) -> None:
+    """
+    Writes a rocket spec to a .json or .toml file.
+    """
+    validate_spec(spec)
+
+    if path.lower().endswith(".toml"):
+        lines = [f"{key} = {_toml_value(value)}" for key, value in spec.items() if key != "components"]
+        for component in spec["components"]:
+            lines += ["", "[[components]]"]
+            lines += [f"{key} = {_toml_value(value)}" for key, value in component.items() if value is not None]
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        with open(path, "w") as f:
+            json.dump(spec, f, indent=2)
+
+
+def apply_spec(manager, spec: dict):
+    """
+    Adds the components of a spec, in order, to a ProjectManager and returns it.
+    """
+    validate_spec(spec)
+
+    if "unit" in spec:
+        manager.unit = spec["unit"]
+
+    for component in spec["components"]:
+        params = dict(component)
+        kind = params.pop("type")
+        getattr(manager, COMPONENT_METHODS[kind])(**params)
+
+    return manager
+
+
+class Placement(NamedTuple):
+    key: tuple         # (type, inputs): everything the solid of the component depends on
+    z_position: float  # base of the part (of its body tube for fin sets)
+
+
+def layout(components: list) -> list:
+    """
+    Resolves every component to the inputs its solid depends on and its axial offset, walking the
+    stack bottom to top the same way ProjectManager does. The keys are those of ProjectManager
+    components, accepted by massprops.component_properties and mesh.component_meshes.
+
+    Arguments:
+        components(:list:): the "components" of a validated spec, bottom to top.
+
+    Returns:
+        A list of Placement, one per component.
+    """
+    placements = []
+    cursor = 0.0
+    last_body_diameter = None
+    last_body_base = 0.0
+
+    for component in components:
+        kind = component["type"]
+
+        if kind == "fin_set":
+            body_diameter = component.get("body_diameter")
+            if body_diameter is None:
+                body_diameter = last_body_diameter
+            inputs = tuple(float(component[p]) for p in COMPONENT_PARAMETERS[kind][0])
+            placements.append(Placement((kind, inputs + (float(body_diameter),)), last_body_base))
+            continue
+
+        required, optional = COMPONENT_PARAMETERS[kind]
+        inputs = tuple(component[p] for p in required) + tuple(component.get(p) for p in optional)
+        placements.append(Placement((kind, inputs), cursor))
+
+        if kind == "body_tube":
+            last_body_diameter = float(component["diameter"])
+            last_body_base = cursor
+
+        cursor += float(component["length"])
+
+    return placements
+
+
+class RocketModel:
+
+    """
+    A rocket described by a spec, rebuilt lazily and incrementally.
+
+    The components live in a ProjectManager (see ProjectManager.setComponents), which keeps the solid of
+    every component, built with its base at the origin, and its axial offset. After an edit, only
+    components whose own inputs changed are rebuilt; components that merely moved because something
+    below them changed length are relocated, which does not touch OCC booleans.
+    """
+
+    def __init__(self, spec: dict) -> None:
+
+        validate_spec(spec)
+        self._spec = copy.deepcopy(spec)
+
+        self._manager = None
+        self._dirty = True
+
+        self.builds = 0         # number of component solids built so far
+        self.last_rebuilt = []  # indices of the components rebuilt by the last rebuild
+
+    @classmethod
+    def from_file(cls, path: str) -> "RocketModel":
+        return cls(load_spec(path))
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._spec.get("name")
+
+    @property
+    def spec(self) -> dict:
+        return copy.deepcopy(self._spec)
+
+    @spec.setter
+    def spec(self, spec: dict) -> None:
+        validate_spec(spec)
+        self._spec = copy.deepcopy(spec)
+        self._dirty = True
+
+    def update_component(self, index: int, **params) -> None:
+        """
+        Changes parameters of one component. The model is rebuilt on the next geometry access.
+        """
+        component = dict(self._spec["components"][index], **params)
+        components = list(self._spec["components"])
+        components[index] = component
+        self.spec = dict(self._spec, components=components)
+
+    def insert_component(self, index: int, component: dict) -> None:
+        components = list(self._spec["components"])
+        components.insert(index, dict(component))
+        self.spec = dict(self._spec, components=components)
+
+    def remove_component(self, index: int) -> None:
+        components = list(self._spec["components"])
+        del components[index]
+        self.spec = dict(self._spec, components=components)
+
+    def save(self, path: str) -> None:
+        dump_spec(self._spec, path)
+
+    def rebuild(self) -> list:
+        """
+        Brings the solids up to date with the spec. Returns the indices of the components that were rebuilt.
+        """
+        if not self._dirty:
+            return []
+
+        if self._manager is None:
+            from .projectManager import ProjectManager  # projectManager imports this module
+            self._manager = ProjectManager(self.name)
+        self._manager.unit = self._spec.get("unit", self._manager.unit)
+
+        rebuilt = self._manager.setComponents(self._spec["components"])
+
+        self.builds += len(rebuilt)
+        self._dirty = False
+        self.last_rebuilt = rebuilt
+        return rebuilt
+
+    def offsets(self) -> list:
+        """
+        Axial position of the base of each component.
+        """
+        return [p.z_position for p in layout(self._spec["components"])]
+
+    def solids(self) -> list:
+        """
+        Solids of every component, in spec order, positioned on the stack.
+        """
+        self.rebuild()
+        return [[component.placed()] for component in self._manager.components]
+
+    @property
+    def project(self) -> cq.Workplane:
+        """
+        The whole rocket as a Workplane, equivalent to building the spec with a ProjectManager.
+        """
+        self.rebuild()
+        return self._manager.project
@@ -0,0 +1,279 @@
+"""
+Barrowman static stability of whole batches of designs, evaluated with NumPy before any geometry is built.
+
+A batch is a rocket spec (see spec.validate_spec) whose parameters may be NumPy arrays instead of
+numbers: every design of the batch has the same components, and the parameter arrays broadcast
+against each other to the shape of the batch. A grid over fin span and nose length looks like:
+
+    span, nose = np.meshgrid(np.linspace(0.05, 0.2, 50), np.linspace(0.2, 0.6, 40))
+    batch = {"components": [..., {"type": "fin_set", "span": span, ...}, {"type": "nose_cone", "length": nose, ...}]}
+    result = evaluate_stability(batch, min_margin=1.0, max_margin=2.5)
+    specs = list(passing_specs(batch, result))   # plain specs, ready for batch.build_batch
+
+Positions are distances from the nose tip, the usual Barrowman convention, with the flow coming from the
+nose: the top of the stack as ProjectManager builds it.
+"""
+from functools import lru_cache
+from math import pi
+from typing import Iterator, NamedTuple
+
+import numpy as np
+
+from .massprops import cone_properties, conical_scale
+from .noseshapes import CONICAL, get_shape, resolve_parameter
+from .spec import COMPONENT_PARAMETERS, validate_spec
+
+# Surface tolerance of the curved nose cone polylines used for their mass, as a fraction of the base radius.
+# Coarser than massprops.DEFAULT_RELATIVE_TOLERANCE: plenty for screening and much cheaper per distinct nose.
+SCREENING_RELATIVE_TOLERANCE = 1e-4
+
+# Normal force of N fins relative to N/2 pairs of fins, from fin interference (OpenRocket's FinSetCalc).
+# Sets of more than 8 fins use the last value.
+FIN_COUNT_EFFICIENCY = (1.0, 1.0, 1.0, 1.0, 1.0, 0.948, 0.913, 0.854, 0.810, 0.750)
+
+
+class StabilityResult(NamedTuple):
+    length: np.ndarray              # total length
+    reference_diameter: np.ndarray  # diameter the normal force coefficients are referred to
+    normal_force_slope: np.ndarray  # total CN alpha, per radian
+    cp: np.ndarray                  # center of pressure, from the nose tip
+    cg: np.ndarray                  # center of gravity, from the nose tip
+    mass: np.ndarray
+    margin: np.ndarray              # static margin in calibers: (cp - cg) / reference_diameter
+    passed: np.ndarray              # margin within the requested bounds
+
+
+@lru_cache(maxsize=4096)
+def volume_coefficient(shape: str, shape_parameter: float = None, fineness: float = 1.0) -> float:
+    """
+    Volume of a solid nose cone of the given shape and fineness (length / base radius) divided by
+    pi R^2 L. It places the Barrowman center of pressure of the nose at (1 - coefficient) L from the tip.
+    Only ogives depend on the fineness.
+    """
+    nose = get_shape(shape)
+    if nose is CONICAL:
+        return 1.0 / 3.0
+
+    x = np.linspace(0.0, fineness, 8193)
+    r = nose.radius_function(x, 1.0, fineness, resolve_parameter(nose, shape_parameter))
+    return float(np.trapezoid(r * r, x) / fineness)
+
+
+def _batch_shape(spec: dict) -> tuple:
+    arrays = [np.asarray(v) for c in spec["components"] for k, v in c.items() if k != "type" and v is not None]
+    return np.broadcast_shapes(*(a.shape for a in arrays))
+
+
+def _density(density, kind: str) -> float:
+    return density.get(kind, 1.0) if isinstance(density, dict) else density
+
+
+def _frustum(radius_base, radius_top, height) -> tuple:
+    # volume and integral of z dV of a solid frustum with its base at z = 0
+    a, b = radius_base, radius_top
+    return pi * height * (a * a + a * b + b * b) / 3, pi * height * height * (a * a + 2 * a * b + 3 * b * b) / 12
+
+
+def _wall(radius_base, radius_top, height, thickness) -> tuple:
+    # volume and center height of a hollow frustum whose inner surface is the outer one shrunk radially
+    volume, moment = _frustum(radius_base, radius_top, height)
+    hollow = thickness > 0
+    inner_volume, inner_moment = _frustum(np.where(hollow, np.maximum(radius_base - thickness, 0.0), 0.0),
+                                          np.where(hollow, np.maximum(radius_top - thickness, 0.0), 0.0), height)
+    volume = volume - inner_volume
+    return volume, np.divide(moment - inner_moment, volume, out=np.zeros(volume.shape), where=volume > 0)
+
+
+def _unique_rows(*columns) -> tuple:
+    """
+    Indices of the first occurrence of every distinct row of the given equally long columns, and the
+    index of the distinct row of every row. Much faster than np.unique(axis=0) on long columns.
+    """
+    codes = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        values, inverse = np.unique(column, return_inverse=True)
+        codes = np.unique(codes * len(values) + inverse.ravel(), return_inverse=True)[1].ravel()
+    _, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+
+def _nose_terms(length, radius, thickness, names, shapes, shape_parameters, density) -> tuple:
+    """
+    Mass, center of gravity (from the base) and volume coefficient of every nose cone of the batch.
+    Conical noses are computed in closed form; curved ones once per distinct set of parameters.
+    """
+    mass = np.zeros(length.shape)
+    z = np.zeros(length.shape)
+    coefficient = np.full(length.shape, 1.0 / 3.0)
+
+    for name in names:
+        mask = shapes == name
+
+        if get_shape(name) is CONICAL:
+            # full cone minus the cavity, the full cone scaled by k (see massprops.cone_properties)
+            k = conical_scale(length[mask], radius[mask], thickness[mask])
+            volume, moment = _frustum(radius[mask], 0.0, length[mask])
+            mass[mask] = density * volume * (1 - k ** 3)
+            z[mask] = moment * (1 - k ** 4) / (volume * (1 - k ** 3))
+            continue
+
+        # shape parameters are never negative: -1 stands for the default one, as NaN rows would not compare equal
+        parameters = np.where(np.isnan(shape_parameters[mask]), -1.0, shape_parameters[mask])
+        columns = (length[mask], radius[mask], thickness[mask], parameters)
+        first, inverse = _unique_rows(*columns)
+        terms = np.empty((len(first), 3))
+        for i, (l, r, t, p) in enumerate(zip(*(c[first] for c in columns))):
+            p = None if p < 0 else float(p)
+            props = cone_properties(l, r, t, density, name, p, SCREENING_RELATIVE_TOLERANCE * r)
+            terms[i] = props.mass, props.center[2], volume_coefficient(str(name), p, float(l / r))
+        mass[mask], z[mask], coefficient[mask] = terms[inverse].T
+
+    return mass, z, coefficient
+
+
+def evaluate_stability(spec: dict, density=1.0, min_margin: float = 1.0, max_margin: float = None) -> StabilityResult:
+    """
+    Center of pressure (Barrowman), center of gravity and static margin of every design of a batch.
+
+    Nose cones use CN alpha = 2 and the center of pressure of their shape (see volume_coefficient),
+    transitions the conical frustum terms and fin sets the trapezoidal fin terms with body interference.
+    Body tubes add no normal force. The center of gravity comes from the analytic mass properties of
+    the parts (see massprops).
+
+    Arguments:
+        spec(:dict:): rocket spec whose parameters may be arrays (the nose cone shape can be an array of names).
+        density(:float | dict:): density of every part, or a mapping from component type to density.
+        min_margin(:float:): smallest static margin, in calibers, for a design to pass.
+        max_margin(:float:): largest static margin for a design to pass, if any.
+
+    Returns:
+        result(:StabilityResult:): arrays of the shape of the batch.
+    """
+    validate_spec(spec)
+    shape = _batch_shape(spec)
+
+    def param(component, name, default=None):
+        value = component.get(name, default)
+        return np.broadcast_to(np.asarray(value, dtype=float), shape)
+
+    cursor = np.zeros(shape)
+    last_body_diameter = None
+    last_body_base = np.zeros(shape)
+    reference_diameter = None
+    max_diameter = np.zeros(shape)
+
+    cn = []      # (CN alpha referred to the square of the diameter, center of pressure height) per component
+    masses = []  # (mass, center of gravity height) per component
+
+    for component in spec["components"]:
+        kind = component["type"]
+        rho = _density(density, kind)
+
+        if kind == "body_tube":
+            length, diameter, thickness = (param(component, p) for p in COMPONENT_PARAMETERS[kind][0])
+            volume, z = _wall(diameter / 2, diameter / 2, length, thickness)
+            masses.append((rho * volume, cursor + z))
+
+            last_body_diameter = diameter
+            last_body_base = cursor
+            max_diameter = np.maximum(max_diameter, diameter)
+
+        elif kind == "transition":
+            # Transition3DBuilder puts bottom_diameter at the top of the part: the fore end in flight
+            length, fore, aft, thickness = (param(component, p) for p in COMPONENT_PARAMETERS[kind][0])
+            volume, z = _wall(aft / 2, fore / 2, length, thickness)
+            masses.append((rho * volume, cursor + z))
+
+            ratio = np.divide(fore, aft, out=np.ones(shape), where=aft > 0)
+            same = np.isclose(ratio, 1.0)
+            x = length / 3 * (1 + np.divide(1 - ratio, 1 - ratio ** 2, out=np.full(shape, 0.5), where=~same))
+            cn.append((2 * (aft ** 2 - fore ** 2), cursor + length - x))
+            max_diameter = np.maximum(max_diameter, np.maximum(fore, aft))
+
+        elif kind == "nose_cone":
+            length, diameter, thickness = (param(component, p) for p in COMPONENT_PARAMETERS[kind][0])
+            names = np.asarray("conical" if component.get("shape") is None else component["shape"])
+            shapes = np.broadcast_to(names, shape)
+            shape_parameters = param(component, "shape_parameter", np.nan) if component.get("shape_parameter") is not None else np.full(shape, np.nan)
+
+            mass, z, coefficient = _nose_terms(length, diameter / 2, thickness, np.unique(names), shapes, shape_parameters, rho)
+            masses.append((mass, cursor + z))
+            cn.append((2 * diameter ** 2, cursor + coefficient * length))
+            reference_diameter = diameter
+            max_diameter = np.maximum(max_diameter, diameter)
+
+        else:
+            count, root, tip, span, sweep, position, thickness = (param(component, p) for p in COMPONENT_PARAMETERS[kind][0])
+            body_diameter = param(component, "body_diameter") if component.get("body_diameter") is not None else last_body_diameter
+            root_top = last_body_base + position + root
+
+            # the chord and its mid point vary linearly along the span (see massprops.trapezoidal_fin_outline)
+            area = span * (root + tip) / 2
+            middle_root, middle_tip = root / 2, root - sweep - tip / 2
+            moment = span * (root * middle_root + (root * (middle_tip - middle_root) + middle_root * (tip - root)) / 2
+                             + (tip - root) * (middle_tip - middle_root) / 3)
+            masses.append((rho * count * area * thickness, last_body_base + position + np.divide(moment, area, out=np.zeros(shape), where=area > 0)))
+
+            # Barrowman fin terms; the tip leading edge sits sweep aft of the root leading edge
+            body_radius = body_diameter / 2
+            mid_chord = np.hypot(span, sweep + (tip - root) / 2)
+            efficiency = np.take(FIN_COUNT_EFFICIENCY, np.clip(count.astype(int), 0, len(FIN_COUNT_EFFICIENCY) - 1))
+            slope = (1 + body_radius / (span + body_radius)) * 4 * count * span ** 2 * efficiency / (1 + np.sqrt(1 + (2 * mid_chord / (root + tip)) ** 2))
+            x = sweep * (root + 2 * tip) / (3 * (root + tip)) + ((root + tip) - root * tip / (root + tip)) / 6
+            cn.append((slope, root_top - x))
+            continue
+
+        cursor = cursor + length
+
+    if reference_diameter is None:
+        reference_diameter = max_diameter
+
+    total_length = cursor
+    slopes = np.array([s for s, _ in cn]) if cn else np.zeros((1,) + shape)
+    heights = np.array([z for _, z in cn]) if cn else np.zeros((1,) + shape)
+    normal_force = slopes.sum(axis=0)
+    cp_height = np.divide((slopes * heights).sum(axis=0), normal_force, out=np.zeros(shape), where=normal_force != 0)
+
+    mass = np.sum([m for m, _ in masses], axis=0)
+    cg_height = np.divide(np.sum([m * z for m, z in masses], axis=0), mass, out=np.zeros(shape), where=mass > 0)
+
+    cp = total_length - cp_height
+    cg = total_length - cg_height
+    margin = np.divide(cp - cg, reference_diameter, out=np.zeros(shape), where=reference_diameter > 0)
+
+    passed = margin >= min_margin
+    if max_margin is not None:
+        passed &= margin <= max_margin
+
+    return StabilityResult(total_length, reference_diameter, normal_force / np.square(reference_diameter),
+                           cp, cg, mass, margin, passed)
+
+
+def design_spec(spec: dict, index) -> dict:
+    """
+    The plain spec of one design of a batch, index being a position in the batch shape.
+    """
+    shape = _batch_shape(spec)
+    components = []
+    for component in spec["components"]:
+        design = {}
+        for key, value in component.items():
+            if key != "type" and value is not None:
+                value = np.broadcast_to(np.asarray(value), shape)[index].item()
+                if key == "count":
+                    value = int(value)
+            design[key] = value
+        components.append(design)
+
+    design = dict(spec, components=components)
+    if "name" in spec and index != ():
+        design["name"] = "_".join([str(spec["name"])] + [str(i) for i in np.atleast_1d(index)])
+    return design
+
+
+def passing_specs(spec: dict, result: StabilityResult) -> Iterator[dict]:
+    """
+    Yields the plain spec of every design that passed, in batch order.
+    """
+    for index in zip(*np.nonzero(result.passed)):
+        yield design_spec(spec, tuple(int(i) for i in index))
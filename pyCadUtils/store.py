@@ -0,0 +1,261 @@
+"""
+Persistent on-disk store of primitive solids, shared by processes and runs.
+
+The store is a directory holding an SQLite index and one BREP file per entry:
+
+    <path>/index.sqlite
+    <path>/blobs/<2 hex chars>/<sha256>.brep
+
+Entries are keyed by a hash of the shape cache key (primitive name, tolerance, quantized parameters),
+of the pyCadUtils and CadQuery versions and of the source of the modules that build the solids (see
+GEOMETRY_MODULES), so neither an upgrade nor an edit of a builder reads stale geometry. Files are
+written to a temporary name and renamed into place before they are indexed, so readers only ever see
+complete files, which OCC reads as a stream over a memory map; the index runs in WAL mode so many
+workers can read while one writes. When the files exceed max_bytes, the least recently used entries
+are removed.
+
+The shape cache consults the store on a miss, before building with OCC (see cache.cached_primitive):
+
+    from pyCadUtils.cache import shape_cache
+    from pyCadUtils.store import ShapeStore
+    shape_cache.store = ShapeStore("~/.cache/pyCadUtils")
+
+or set the PYCADUTILS_SHAPE_STORE environment variable to a directory.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import tempfile
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from . import __version__
+from ._lazy import cq
+from .brep import shape_from_brep, shape_to_brep
+from .trace import span
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB of BREP files
+STORE_ENV = "PYCADUTILS_SHAPE_STORE"
+
+# Seconds a writer waits for another process holding the index lock
+BUSY_TIMEOUT = 30.0
+
+# Modules of this package whose code decides the solids in the store
+GEOMETRY_MODULES = ("primitives", "profiles", "noseshapes")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    digest TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+class StoreStats(NamedTuple):
+    hits: int
+    misses: int
+    writes: int
+    evictions: int
+
+
+def _jsonable(value):
+    if isinstance(value, (tuple, list)):
+        return [_jsonable(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+@lru_cache(maxsize=None)
+def source_version(modules: tuple) -> str:
+    """
+    Hash of the source files of modules of this package, which changes with any edit of their code.
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module + ".py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ShapeStore:
+
+    "Shapes persisted as BREP files under a directory, indexed with SQLite."
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_bytes = max_bytes
+
+        os.makedirs(os.path.join(self.path, "blobs"), exist_ok=True)
+
+        self._connection = None
+        self._pid = None
+        self._version = None
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per process: SQLite connections must not be shared across a fork
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=BUSY_TIMEOUT, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._connection
+
+    def digest(self, key) -> str:
+        """
+        Hash of a shape cache key together with the library versions and the builder sources the shapes
+        were built with.
+        """
+        if self._version is None:
+            self._version = [__version__, cq.__version__, source_version(GEOMETRY_MODULES)]
+        payload = json.dumps([_jsonable(key), self._version], separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.path, "blobs", digest[:2], digest + ".brep")
+
+    def get(self, key) -> Optional[list]:
+        """
+        Returns the shapes stored for a shape cache key, or None.
+        """
+        digest = self.digest(key)
+        connection = self._connect()
+        row = connection.execute("SELECT count FROM entries WHERE digest = ?", (digest,)).fetchone()
+
+        data = None
+        if row is not None:
+            try:
+                with open(self._blob_path(digest), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with span("store.read", bytes=len(mapped)):
+                        data = shape_from_brep(mapped)
+            except (FileNotFoundError, ValueError):
+                data = None  # evicted by another process in the meantime, or unreadable and rewritten on put
+
+        if data is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        try:
+            connection.execute("UPDATE entries SET last_used = ? WHERE digest = ?", (time.time(), digest))
+        except sqlite3.OperationalError:
+            pass  # recency is best effort, never worth failing a read for
+
+        return [data] if row[0] == 1 else list(data)
+
+    def put(self, key, shapes: list) -> None:
+        """
+        Stores shapes under a shape cache key, then evicts old entries if the store is over its size.
+        """
+        digest = self.digest(key)
+        target = self._blob_path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        data = shape_to_brep(shapes[0] if len(shapes) == 1 else cq.Compound.makeCompound(shapes))
+
+        with span("store.write", bytes=len(data)):
+            fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temporary, target)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (digest, name, count, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, str(key[0]), len(shapes), len(data), now, now),
+            )
+        except sqlite3.Error:
+            # a file left unindexed would never be counted against max_bytes nor evicted
+            os.unlink(target)
+            raise
+        self._writes += 1
+        self._evict()
+
+    def _evict(self) -> None:
+        connection = self._connect()
+        (total,) = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+
+        # the rows are removed in one write transaction, so concurrent evictors never remove the same files twice
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            (total,) = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            removed = []
+            for digest, size in connection.execute("SELECT digest, size FROM entries ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                removed.append(digest)
+                total -= size
+            connection.executemany("DELETE FROM entries WHERE digest = ?", [(d,) for d in removed])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        for digest in removed:
+            try:
+                os.unlink(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+        self._evictions += len(removed)
+
+    def size(self) -> int:
+        """Total size of the stored BREP files, in bytes."""
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Removes every entry of the store.
+        """
+        connection = self._connect()
+        digests = [d for (d,) in connection.execute("SELECT digest FROM entries")]
+        connection.execute("DELETE FROM entries")
+        for digest in digests:
+            try:
+                os.unlink(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    @property
+    def stats(self) -> StoreStats:
+        """Hits, misses, writes and evictions of this process."""
+        return StoreStats(self._hits, self._misses, self._writes, self._evictions)
+
+
+def store_from_environment() -> Optional[ShapeStore]:
+    """
+    The store in the directory named by PYCADUTILS_SHAPE_STORE, or None if it is not set.
+    """
+    path = os.environ.get(STORE_ENV)
+    return ShapeStore(path) if path else None
@@ -0,0 +1,183 @@
+"""
+Timed spans over the builder, primitive and export steps.
+
+Collection is off by default: span() then returns a shared no-op object and traced() functions call
+straight through, so instrumented code costs one global lookup per step. Inside collect() every span
+is recorded with its parameters and, where given, the face/edge counts of the shape it produced:
+
+    with collect("rocket.trace.json") as trace:
+        manager.addBodyTube(length=1, diameter=0.36, thickness=0.02)
+    print(trace.summary())
+
+The dump is Chrome trace JSON, readable with chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+_collector = None  # active TraceCollector, None when collection is off
+
+
+class _NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+    def shape(self, obj) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def shape_complexity(obj) -> dict:
+    """
+    Face and edge counts of a shape, or of all the shapes on a Workplane.
+    """
+    shapes = obj.vals() if hasattr(obj, "vals") else [obj]
+    faces = edges = 0
+    for s in shapes:
+        if hasattr(s, "Faces"):
+            faces += len(s.Faces())
+            edges += len(s.Edges())
+    return {"faces": faces, "edges": edges}
+
+
+class Span:
+
+    __slots__ = ("collector", "name", "args", "start")
+
+    def __init__(self, collector, name: str, args: dict) -> None:
+        self.collector = collector
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.collector.record(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args) -> None:
+        """Adds arguments to the span."""
+        self.args.update(args)
+
+    def shape(self, obj) -> None:
+        """Records the complexity of the shape (or Workplane) produced by the span."""
+        self.args.update(shape_complexity(obj))
+
+
+class TraceCollector:
+
+    "Accumulates spans as Chrome trace 'complete' events."
+
+    def __init__(self) -> None:
+        self.events = []
+        self._origin = time.perf_counter_ns()
+
+    def record(self, name: str, start_ns: int, end_ns: int, args: dict) -> None:
+        self.events.append({
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X",
+            "ts": (start_ns - self._origin) / 1e3,
+            "dur": (end_ns - start_ns) / 1e3,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {k: _jsonable(v) for k, v in args.items()},
+        })
+
+    def summary(self) -> dict:
+        """
+        Span name -> {"count", "total_s"}, sorted by total time.
+        """
+        totals = {}
+        for event in self.events:
+            entry = totals.setdefault(event["name"], {"count": 0, "total_s": 0.0})
+            entry["count"] += 1
+            entry["total_s"] += event["dur"] / 1e6
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["total_s"]))
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+def enabled() -> bool:
+    return _collector is not None
+
+
+def span(name: str, **args):
+    """
+    Context manager timing a step. A no-op unless collection is on.
+    """
+    if _collector is None:
+        return _NULL_SPAN
+    return Span(_collector, name, args)
+
+
+def traced(name: str = None):
+    """
+    Decorator wrapping every call of a function in a span named name (defaults to its qualified name),
+    with the call arguments recorded as span arguments.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _collector is None:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            params = {k: v for k, v in bound.arguments.items() if k not in ("self", "wp", "project")}
+            with Span(_collector, span_name, params):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def collect(path: str = None):
+    """
+    Turns span collection on for the duration of the block and yields the TraceCollector.
+    If path is given the trace is written there when the block exits.
+    """
+    global _collector
+
+    previous = _collector
+    collector = TraceCollector()
+    _collector = collector
+
+    try:
+        yield collector
+    finally:
+        _collector = previous
+        if path is not None:
+            collector.dump(path)
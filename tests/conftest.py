@@ -0,0 +1,20 @@
+import pytest
+
+from pyCadUtils.projectManager import ProjectManager
+
+
+def build_stock_project(build_mode: str = "revolve") -> ProjectManager:
+    """The rocket built by main.py."""
+    project = ProjectManager(name="test8", build_mode=build_mode, unit="meter")
+    project.addBodyTube(length=1, diameter=0.36, thickness=0.02)
+    project.addFinSet(count=4, root_chord=0.3, tip_chord=0.2, span=0.10, sweep=0.1, position=0.1, thickness=0.02)
+    project.addTransition(length=0.1, bottom_diameter=0.30, top_diameter=0.36, thickness=0.02)
+    project.addBodyTube(length=0.5, diameter=0.30, thickness=0.02)
+    project.addFinSet(count=3, root_chord=0.3, tip_chord=0.2, span=0.10, sweep=0.1, position=0.05, thickness=0.02)
+    project.addNoseCone(length=0.4, diameter=0.30, thickness=0.02)
+    return project
+
+
+@pytest.fixture
+def stock_project() -> ProjectManager:
+    return build_stock_project()
@@ -0,0 +1,121 @@
+import io
+import json
+import struct
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+from pyCadUtils.export import STL_TRIANGLE, UNITS, Instance, Mesh, write_3mf, write_glb, write_obj, write_ply, write_stl
+from pyCadUtils.projectManager import ProjectManager
+
+# A tetrahedron, counter-clockwise seen from outside
+TETRAHEDRON = Mesh(np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]),
+                   np.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]]))
+MESHES = [TETRAHEDRON, TETRAHEDRON.transformed(np.hstack([np.eye(3), [[2.0], [0.0], [0.0]]]))]
+CORE = "{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}"
+
+
+def test_stl_round_trip():
+    f = io.BytesIO()
+    assert write_stl(MESHES, f) == 8
+
+    data = f.getvalue()
+    (count,) = struct.unpack_from("<I", data, 80)
+    records = np.frombuffer(data, dtype=STL_TRIANGLE, offset=84)
+    assert count == len(records) == 8
+    np.testing.assert_allclose(records["vertices"].reshape(-1, 3), np.concatenate([m.vertices[m.triangles] for m in MESHES]).reshape(-1, 3))
+    # the normals point away from the centroid of the tetrahedron
+    centers = records["vertices"][:4].mean(axis=1) - TETRAHEDRON.vertices.mean(axis=0)
+    assert (np.einsum("ij,ij->i", records["normal"][:4], centers) > 0).all()
+
+
+def test_stl_to_unseekable_stream():
+    class Unseekable(io.BytesIO):
+        def seekable(self):
+            return False
+
+    f = Unseekable()
+    write_stl(iter(MESHES), f)
+    assert struct.unpack_from("<I", f.getvalue(), 80) == (8,)
+
+
+@pytest.mark.parametrize("unit", ["millimeter", "meter", "inch"])
+def test_3mf_records_the_unit(unit):
+    f = io.BytesIO()
+    write_3mf(MESHES, f, unit)
+
+    with zipfile.ZipFile(f) as archive:
+        assert "[Content_Types].xml" in archive.namelist()
+        model = ET.fromstring(archive.read("3D/3dmodel.model"))
+
+    assert model.get("unit") == unit
+    objects = model.findall(f"{CORE}resources/{CORE}object")
+    assert len(objects) == 2
+    vertices = objects[1].findall(f"{CORE}mesh/{CORE}vertices/{CORE}vertex")
+    np.testing.assert_allclose([[float(v.get(a)) for a in "xyz"] for v in vertices], MESHES[1].vertices)
+    assert len(model.findall(f"{CORE}build/{CORE}item")) == 2
+
+
+def test_3mf_rejects_an_unknown_unit():
+    with pytest.raises(ValueError):
+        write_3mf(MESHES, io.BytesIO(), "furlong")
+
+
+def test_obj_round_trip():
+    f = io.BytesIO()
+    assert write_obj(MESHES, f) == 8
+
+    lines = f.getvalue().decode().splitlines()
+    vertices = np.array([[float(v) for v in line.split()[1:]] for line in lines if line.startswith("v ")])
+    faces = np.array([[int(i) for i in line.split()[1:]] for line in lines if line.startswith("f ")]) - 1
+    np.testing.assert_allclose(vertices[faces], np.concatenate([m.vertices[m.triangles] for m in MESHES]))
+
+
+def test_ply_round_trip():
+    f = io.BytesIO()
+    assert write_ply(MESHES, f) == 8
+
+    data = f.getvalue()
+    header, body = data.split(b"end_header\n", 1)
+    assert b"element vertex 8" in header and b"element face 8" in header
+    vertices = np.frombuffer(body, dtype="<f4", count=8 * 3).reshape(-1, 3)
+    faces = np.frombuffer(body, dtype=[("count", "u1"), ("vertices", "<i4", (3,))], offset=vertices.nbytes)
+    assert (faces["count"] == 3).all()
+    np.testing.assert_allclose(vertices[faces["vertices"]], np.concatenate([m.vertices[m.triangles] for m in MESHES]))
+
+
+@pytest.mark.parametrize("unit", ["millimeter", "meter"])
+def test_glb_layout(unit):
+    f = io.BytesIO()
+    # one geometry placed twice, and a plain mesh
+    assert write_glb([Instance((TETRAHEDRON,), [np.eye(4)[:3], np.eye(4)[:3]]), MESHES[1]], f, unit) == 12
+
+    data = f.getvalue()
+    magic, version, length = struct.unpack_from("<III", data)
+    assert (magic, version, length) == (0x46546C67, 2, len(data))
+
+    json_length, json_type = struct.unpack_from("<II", data, 12)
+    assert json_type == 0x4E4F534A and json_length % 4 == 0
+    gltf = json.loads(data[20:20 + json_length])
+    bin_length, bin_type = struct.unpack_from("<II", data, 20 + json_length)
+    assert bin_type == 0x004E4942
+    assert bin_length == gltf["buffers"][0]["byteLength"] == len(data) - 28 - json_length
+
+    # the tetrahedron is stored once for its two placements
+    assert len(gltf["meshes"]) == 2
+    assert len(gltf["nodes"]) == 4
+    assert gltf["nodes"][0]["matrix"][0] == pytest.approx(UNITS[unit])
+
+
+def test_default_deflection_follows_the_unit():
+    # the same rocket in meters and in millimeters is meshed alike: 1 mm of chord error in both
+    counts = []
+    for unit, scale in (("meter", 1.0), ("millimeter", 1000.0)):
+        project = ProjectManager(build_mode="mesh", unit=unit)
+        project.addBodyTube(1.0 * scale, 0.3 * scale, 0.02 * scale)
+        project.addNoseCone(0.4 * scale, 0.3 * scale, 0.02 * scale, shape="ogive")
+        counts.append(sum(len(m.triangles) for m in project.tessellate()))
+
+    assert counts[0] == counts[1]
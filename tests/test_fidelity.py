@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from pyCadUtils.export import Mesh
+from pyCadUtils.fidelity import compare_build_paths, compare_meshes
+
+# A subset of DEFAULT_GRID, one case of each builder, to run with the tests
+COMPONENTS = [
+    {"type": "body_tube", "length": 100.0, "diameter": 40.0, "thickness": 2.0},
+    {"type": "transition", "length": 30.0, "thickness": 1.5, "bottom_diameter": 40.0, "top_diameter": 20.0},
+    {"type": "nose_cone", "length": 60.0, "diameter": 30.0, "thickness": 1.5, "shape": "conical"},
+    {"type": "nose_cone", "length": 60.0, "diameter": 30.0, "thickness": 1.5, "shape": "ogive"},
+    {"type": "fin_set", "count": 4, "root_chord": 40.0, "tip_chord": 20.0, "span": 30.0, "sweep": 15.0,
+     "position": 5.0, "thickness": 2.0, "body_diameter": 40.0},
+]
+
+
+@pytest.mark.parametrize("component", COMPONENTS, ids=lambda c: c.get("shape", c["type"]))
+def test_mesh_path_matches_boolean(component):
+    (result,) = compare_build_paths([component])
+    assert result.ok, result.error or result.report
+
+
+def test_offset_surface_distance():
+    # a unit square and the same square 0.1 above it
+    vertices = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0]])
+    triangles = np.array([[0, 1, 2], [0, 2, 3]])
+    report = compare_meshes(Mesh(vertices, triangles), Mesh(vertices + [0.0, 0.0, 0.1], triangles), samples=500)
+
+    assert report.hausdorff == pytest.approx(0.1)
+    assert report.mean_distance == pytest.approx(0.1)
+    assert report.area_delta == pytest.approx(0.0)
@@ -0,0 +1,33 @@
+import pytest
+
+from pyCadUtils.massprops import fin_root_gap_volume
+from pyCadUtils.projectManager import ProjectManager
+
+
+def test_stock_project_fuses_to_one_solid(stock_project):
+    report = stock_project.fuseProject().report
+
+    assert report.fused and report.valid and report.watertight
+    assert report.solids == 1
+    assert report.ok
+
+
+def test_stock_project_fuses_to_one_solid_with_timeout(stock_project):
+    assert stock_project.fuseProject(timeout=60).report.ok
+
+
+@pytest.mark.parametrize("mode", ["compound", "fuse", "union"])
+def test_fins_fuse_with_their_tube(mode):
+    project = ProjectManager(build_mode="boolean")
+    project.addBodyTube(100, 40, 2)
+    project.addFinSet(4, 40, 20, 30, 10, 5, 2, mode=mode)
+
+    report = project.fuseProject().report
+    assert report.solids == 1
+    assert report.ok
+
+
+def test_fin_root_gap_volume():
+    # a fin as thick as the tube radius leaves a square corner minus a quarter disc
+    assert fin_root_gap_volume(2.0, 1.0, 1.0) == pytest.approx(2.0 * (1 - 3.141592653589793 / 4))
+    assert fin_root_gap_volume(2.0, 0.0, 1.0) == 0.0
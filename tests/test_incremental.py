@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import pyCadUtils.incremental
+from pyCadUtils.incremental import file_sha256, read_manifest
+from pyCadUtils.projectManager import ProjectManager
+
+
+@pytest.fixture(params=["mesh", "revolve"])
+def project(request) -> ProjectManager:
+    project = ProjectManager(name="rocket", build_mode=request.param)
+    project.addBodyTube(100, 40, 2)
+    project.addFinSet(count=3, root_chord=30, tip_chord=20, span=10, sweep=10, position=5, thickness=2)
+    project.addBodyTube(100, 40, 2)  # the same geometry as the first tube: one shared file
+    project.addNoseCone(60, 40, 2)
+    return project
+
+
+def files(folder) -> set:
+    return {name for name in os.listdir(folder) if name != "manifest.json"}
+
+
+def test_manifest_records_the_file_content(project, tmp_path):
+    report = project.exportComponents(str(tmp_path), "stl")
+    folder = os.path.dirname(report.manifest)
+
+    manifest = read_manifest(folder)
+    assert len(manifest["components"]) == 4
+    assert files(folder) == {e["file"] for e in manifest["components"]}
+    for entry in manifest["components"]:
+        assert file_sha256(os.path.join(folder, entry["file"])) == entry["sha256"]
+    assert manifest["components"][2]["translation"] == [0.0, 0.0, 100.0]
+
+
+def test_unchanged_components_are_skipped(project, tmp_path):
+    project.exportComponents(str(tmp_path), "stl")
+    report = project.exportComponents(str(tmp_path), "stl")
+
+    assert report.written == [] and report.removed == []
+    assert report.reused == [c.name for c in project.components]
+
+
+def test_changed_component_is_rewritten(project, tmp_path):
+    first = read_manifest(os.path.dirname(project.exportComponents(str(tmp_path), "stl").manifest))
+
+    project.replaceComponent("body_tube1", length=120)
+    report = project.exportComponents(str(tmp_path), "stl")
+
+    # the fins moved with their tube but kept their geometry
+    assert report.written == ["body_tube1"]
+    assert report.reused == ["fin_set1", "body_tube2", "nose_cone1"]
+    assert report.removed == []  # body_tube2 still uses the old tube file
+    assert read_manifest(os.path.dirname(report.manifest))["components"][3]["translation"] == [0.0, 0.0, 220.0]
+
+    project.removeComponent("body_tube2")
+    report = project.exportComponents(str(tmp_path), "stl")
+    assert report.written == [] and report.removed == [first["components"][0]["file"]]
+    assert files(os.path.dirname(report.manifest)) == {e["file"] for e in read_manifest(os.path.dirname(report.manifest))["components"]}
+
+
+def test_modified_file_is_rewritten(project, tmp_path):
+    report = project.exportComponents(str(tmp_path), "stl")
+    entry = read_manifest(os.path.dirname(report.manifest))["components"][-1]
+    path = os.path.join(os.path.dirname(report.manifest), entry["file"])
+    with open(path, "r+b") as f:
+        f.write(b"edited")
+
+    report = project.exportComponents(str(tmp_path), "stl")
+
+    assert report.written == ["nose_cone1"]
+    assert file_sha256(path) == entry["sha256"]
+
+
+def test_code_change_rewrites_every_file(project, tmp_path, monkeypatch):
+    first = project.exportComponents(str(tmp_path), "stl")
+
+    # as if the mesher had been fixed since the first export
+    monkeypatch.setattr(pyCadUtils.incremental, "source_version", lambda modules: "edited")
+    report = project.exportComponents(str(tmp_path), "stl")
+
+    assert report.written == ["body_tube1", "fin_set1", "nose_cone1"]
+    assert len(report.removed) == 3
+    folder = os.path.dirname(first.manifest)
+    assert files(folder) == {e["file"] for e in read_manifest(folder)["components"]}
@@ -0,0 +1,63 @@
+import pytest
+
+from pyCadUtils._lazy import cq
+from pyCadUtils.massprops import (
+    compare_with_occ,
+    cone_properties,
+    cylinder_properties,
+    fin_set_properties,
+    rocket_properties,
+    transition_properties,
+    trapezoidal_fin_properties,
+)
+from pyCadUtils.noseshapes import NOSE_CONE_SHAPES
+from pyCadUtils.parts import Fins3DBuilder
+from pyCadUtils.primitives import create_cone, create_cylinder, create_transition, create_trapezoidal_fin
+
+EXACT = 1e-9
+# Curved nose cones are integrated over a polyline of their profile, OCC over the spline through it
+CURVED = 1e-3
+
+
+def check(props, shapes, tolerance, length):
+    volume, volume_difference, distance, inertia_difference = compare_with_occ(props, shapes)
+    assert volume > 0
+    assert volume_difference <= tolerance
+    assert distance <= tolerance * length
+    assert inertia_difference <= tolerance
+
+
+@pytest.mark.parametrize("thickness", [2.0, 0.0])
+def test_cylinder(thickness):
+    check(cylinder_properties(100, 20, thickness), create_cylinder(cq.Workplane("XY"), 100, 20, thickness).vals(), EXACT, 100)
+
+
+@pytest.mark.parametrize("radius1, radius2", [(15, 20), (20, 15)])
+def test_transition(radius1, radius2):
+    check(transition_properties(30, radius1, radius2, 1.5),
+          create_transition(cq.Workplane("XY"), 30, radius1, radius2, 1.5).vals(), EXACT, 30)
+
+
+@pytest.mark.parametrize("shape", sorted(NOSE_CONE_SHAPES))
+def test_nose_cone(shape):
+    tolerance = EXACT if shape == "CONICAL" else CURVED
+    check(cone_properties(60, 15, 1.5, 1.0, shape), create_cone(cq.Workplane("XY"), 60, 15, 1.5, shape).vals(), tolerance, 60)
+
+
+def test_trapezoidal_fin():
+    check(trapezoidal_fin_properties(40, 20, 30, 10, 2),
+          create_trapezoidal_fin(cq.Workplane("XY"), 40, 20, 30, 10, 2).vals(), EXACT, 40)
+
+
+def test_fin_set():
+    fins = Fins3DBuilder().create_FinSet(None, 4, 40, 20, 30, 10, 5, 2, 40, 0)
+    check(fin_set_properties(4, 40, 20, 30, 10, 5, 2, 40), fins.vals(), EXACT, 40)
+
+
+def test_stock_stack(stock_project):
+    props = stock_project.massProperties()
+    check(props, stock_project.project.vals(), EXACT, stock_project.stackHeight)
+
+    spec_props = rocket_properties(stock_project.toSpec())
+    assert spec_props.volume == pytest.approx(props.volume)
+    assert spec_props.center == pytest.approx(props.center)
@@ -0,0 +1,98 @@
+import gzip
+import os
+import shutil
+import zipfile
+
+import pytest
+
+from pyCadUtils.openrocket import iter_ork_specs, read_ork
+from pyCadUtils.projectManager import ProjectManager
+from pyCadUtils.spec import apply_spec
+
+SYNTHETIC = os.path.join(os.path.dirname(__file__), "data", "synthetic.ork.xml")
+
+# The synthetic design, bottom to top, in meters
+EXPECTED = [
+    {"type": "body_tube", "length": 0.4, "diameter": 0.08, "thickness": 0.002},
+    # position: height of the root trailing edge above the base of the tube
+    {"type": "fin_set", "count": 4, "root_chord": 0.1, "tip_chord": 0.05, "span": 0.05, "sweep": 0.05, "position": 0.0, "thickness": 0.003},
+    {"type": "fin_set", "count": 2, "root_chord": 0.1, "tip_chord": 0.1, "span": 0.02, "sweep": 0.0, "position": 0.15, "thickness": 0.002},
+    {"type": "fin_set", "count": 3, "root_chord": 0.1, "tip_chord": 0.04, "span": 0.04, "sweep": 0.02, "position": 0.1, "thickness": 0.002},
+    # automatic fore radius from the tube above; bottom_diameter is the top of the part
+    {"type": "transition", "length": 0.1, "bottom_diameter": 0.1, "top_diameter": 0.08, "thickness": 0.002},
+    {"type": "body_tube", "length": 0.5, "diameter": 0.1, "thickness": 0.002},
+    {"type": "fin_set", "count": 3, "root_chord": 0.1, "tip_chord": 0.05, "span": 0.06, "sweep": 0.03, "position": 0.3, "thickness": 0.003},
+    # automatic aft radius from the tube below
+    {"type": "nose_cone", "length": 0.2, "diameter": 0.1, "thickness": 0.002, "shape": "ogive"},
+]
+
+
+def write_variant(tmp_path, variant: str) -> str:
+    path = str(tmp_path / "synthetic.ork")
+    if variant == "zip":
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.write(SYNTHETIC, "rocket.ork")
+    elif variant == "gzip":
+        with open(SYNTHETIC, "rb") as source, gzip.open(path, "wb") as target:
+            shutil.copyfileobj(source, target)
+    else:
+        shutil.copyfile(SYNTHETIC, path)
+    return path
+
+
+def check_components(components, expected, scale=1.0):
+    assert [c["type"] for c in components] == [e["type"] for e in expected]
+    for component, reference in zip(components, expected):
+        assert set(component) == set(reference)
+        for key, value in reference.items():
+            if isinstance(value, float):
+                assert component[key] == pytest.approx(value * scale, abs=1e-12), (reference["type"], key)
+            else:
+                assert component[key] == value
+
+
+@pytest.mark.parametrize("variant", ["zip", "gzip", "plain"])
+def test_read_variants(tmp_path, variant):
+    spec = read_ork(write_variant(tmp_path, variant))
+
+    assert spec["name"] == "synthetic"
+    assert spec["title"] == "Synthetic"
+    assert spec["unit"] == "meter"
+    check_components(spec["components"], EXPECTED)
+
+
+def test_scale_sets_the_unit(tmp_path):
+    spec = read_ork(write_variant(tmp_path, "zip"), scale=1000)
+
+    assert spec["unit"] == "millimeter"
+    check_components(spec["components"], EXPECTED, 1000)
+
+    # the fin sets follow the tube they are attached to
+    project = apply_spec(ProjectManager(build_mode="mesh"), spec)
+    assert project.stackHeight == pytest.approx(1200)
+    assert project.getComponent("fin_set4").z_position == pytest.approx(500)
+
+
+def test_strict_rejects_unsupported_parts(tmp_path):
+    with pytest.raises(ValueError, match="ellipticalfinset"):
+        read_ork(write_variant(tmp_path, "plain"), strict=True)
+
+
+def test_unresolvable_automatic_radius(tmp_path):
+    path = tmp_path / "nose.ork"
+    path.write_text("<openrocket><rocket><subcomponents><stage><subcomponents>"
+                    "<nosecone><length>0.2</length><aftradius>auto</aftradius></nosecone>"
+                    "</subcomponents></stage></subcomponents></rocket></openrocket>")
+    with pytest.raises(ValueError, match="automatic radius"):
+        read_ork(str(path))
+
+
+def test_iter_ork_specs_reports_errors(tmp_path):
+    write_variant(tmp_path, "zip")
+    (tmp_path / "empty.ork").write_text("<openrocket><rocket/></openrocket>")
+
+    errors = []
+    specs = list(iter_ork_specs(str(tmp_path), on_error=lambda path, error: errors.append(os.path.basename(path))))
+
+    assert [spec["name"] for spec in specs] == ["synthetic"]
+    assert errors == ["empty.ork"]
@@ -0,0 +1,30 @@
+import pytest
+
+from pyCadUtils.noseshapes import NOSE_CONE_SHAPES
+from pyCadUtils.primitives import compare_build_modes, create_cone, create_cylinder, create_transition
+
+VOLUME_TOLERANCE = 1e-9
+BOUNDS_TOLERANCE = 1e-6  # model units, OCC pads some boxes by its precision
+
+
+def check(primitive, *args, **kwargs):
+    boolean_volume, revolve_volume, difference, bounds_difference = compare_build_modes(primitive, *args, **kwargs)
+    assert boolean_volume > 0 and revolve_volume > 0
+    assert difference <= VOLUME_TOLERANCE
+    assert bounds_difference <= BOUNDS_TOLERANCE
+
+
+@pytest.mark.parametrize("thickness", [0.5, 2.0, 0.0])
+def test_cylinder(thickness):
+    check(create_cylinder, 100, 20, thickness)
+
+
+@pytest.mark.parametrize("radius1, radius2", [(15, 20), (20, 15), (20, 20)])
+def test_transition(radius1, radius2):
+    check(create_transition, 30, radius1, radius2, 1.5)
+
+
+@pytest.mark.parametrize("shape", sorted(NOSE_CONE_SHAPES))
+@pytest.mark.parametrize("thickness", [1.5, 0.0])
+def test_nose_cone(shape, thickness):
+    check(create_cone, 60, 15, thickness, shape)
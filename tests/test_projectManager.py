@@ -0,0 +1,88 @@
+import pytest
+
+from pyCadUtils.projectManager import ProjectManager
+from pyCadUtils.spec import RocketModel, apply_spec, dump_spec, load_spec, validate_spec
+
+
+def test_replace_component_rolls_back_on_error(stock_project):
+    components = stock_project.components
+    height = stock_project.stackHeight
+
+    # the nose cone is re-added last, after every other component
+    with pytest.raises(ValueError):
+        stock_project.replaceComponent("nose_cone1", shape="no such shape")
+
+    assert stock_project.components == components
+    assert stock_project.stackHeight == height
+    assert stock_project.verifyStack()
+
+
+def test_replace_component_rebuilds_only_what_changed():
+    project = ProjectManager()
+    project.addBodyTube(100, 40, 2)
+    project.addBodyTube(50, 40, 2, name="upper")
+    project.addNoseCone(60, 40, 2)
+    nose = project.getComponent("nose_cone1").shape
+
+    project.replaceComponent("body_tube1", length=120)
+
+    assert project.getComponent("nose_cone1").shape is nose
+    assert project.getComponent("upper").z_position == 120
+    assert project.stackHeight == 230
+    assert project.verifyStack()
+
+
+def test_rocket_model_matches_project_manager(stock_project):
+    model = RocketModel(stock_project.toSpec())
+    assert len(model.rebuild()) == len(stock_project.components)
+
+    model.update_component(0, length=1.2)
+    assert model.rebuild() == [0]
+    assert model.offsets()[2] == pytest.approx(1.2)
+    assert len(model.solids()) == len(stock_project.components)
+
+
+def test_verify_stack_after_export(tmp_path):
+    project = ProjectManager(unit="meter")
+    project.addBodyTube(1, 0.3, 0.02)
+    project.addNoseCone(0.4, 0.3, 0.02, shape="ogive")
+    assert project.verifyStack()
+
+    # the export leaves its triangulation on the shapes, shared through the shape cache
+    project.exportProject(str(tmp_path), "stl")
+
+    assert project.verifyStack()
+    assert ProjectManager(project=project.project).stackHeight == pytest.approx(1.4)
+
+
+def test_mesh_build_mode_rejects_a_base_project():
+    base = ProjectManager()
+    base.addBodyTube(100, 40, 2)
+
+    with pytest.raises(ValueError):
+        ProjectManager(project=base.project, build_mode="mesh")
+
+
+@pytest.mark.parametrize("suffix", [".json", ".toml"])
+def test_spec_round_trip(stock_project, tmp_path, suffix):
+    stock_project.replaceComponent("fin_set2", mode="fuse")
+    stock_project.replaceComponent("nose_cone1", shape="ogive")
+    stock_project.setComponents([dict(c.params, type=c.kind, name="booster" if c.name == "body_tube1" else c.name)
+                                 for c in stock_project.components])
+
+    path = str(tmp_path / ("rocket" + suffix))
+    dump_spec(stock_project.toSpec(), path)
+    rebuilt = apply_spec(ProjectManager(), load_spec(path))
+
+    assert rebuilt.unit == "meter"
+    assert [(c.name, c.kind, c.params, c.z_position) for c in rebuilt.components] == \
+           [(c.name, c.kind, c.params, c.z_position) for c in stock_project.components]
+    assert rebuilt.getComponent("fin_set2").params["mode"] == "fuse"
+    assert rebuilt.massProperties().volume == pytest.approx(stock_project.massProperties().volume)
+
+
+def test_spec_rejects_duplicate_names():
+    spec = {"components": [{"type": "body_tube", "length": 1, "diameter": 1, "thickness": 0.1, "name": "tube"},
+                           {"type": "body_tube", "length": 1, "diameter": 1, "thickness": 0.1, "name": "tube"}]}
+    with pytest.raises(ValueError):
+        validate_spec(spec)
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import sqlite3
+
+import pytest
+
+import pyCadUtils.store
+from pyCadUtils._lazy import cq
+from pyCadUtils.cache import shape_cache
+from pyCadUtils.primitives import create_cylinder
+from pyCadUtils.store import ShapeStore
+
+WRITERS = 3
+PUTS = 8
+
+
+def box(*size) -> cq.Shape:
+    return cq.Workplane("XY").box(*size).val()
+
+
+def blob_files(store: ShapeStore) -> set:
+    return {name[:-len(".brep")] for _, _, names in os.walk(os.path.join(store.path, "blobs"))
+            for name in names if name.endswith(".brep")}
+
+
+def test_round_trip(tmp_path):
+    store = ShapeStore(str(tmp_path))
+    store.put(("box", 1), [box(1, 2, 3)])
+    store.put(("pair", 1), [box(1, 1, 1), box(2, 2, 2)])
+
+    assert store.get(("box", 1))[0].Volume() == pytest.approx(6.0)
+    assert [s.Volume() for s in store.get(("pair", 1))] == pytest.approx([1.0, 8.0])
+    assert store.get(("box", 2)) is None
+    assert store.stats == (2, 1, 2, 0)
+
+
+def test_builder_change_misses(tmp_path, monkeypatch):
+    ShapeStore(str(tmp_path)).put(("box", 1), [box(1, 2, 3)])
+    assert ShapeStore(str(tmp_path)).get(("box", 1)) is not None
+
+    # as if primitives.py had been edited since the entry was written
+    monkeypatch.setattr(pyCadUtils.store, "source_version", lambda modules: "edited")
+    assert ShapeStore(str(tmp_path)).get(("box", 1)) is None
+
+
+def test_eviction_keeps_the_recent_entries(tmp_path):
+    size = len(pyCadUtils.store.shape_to_brep(box(1, 1, 1)))
+    store = ShapeStore(str(tmp_path), max_bytes=4 * size)
+
+    for i in range(10):
+        store.put(("box", i), [box(1, 1, 1 + i)])
+        store.get(("box", 0))  # keeps the first entry recently used
+
+    assert store.size() <= store.max_bytes
+    assert store.stats.evictions > 0
+    assert store.get(("box", 0)) is not None and store.get(("box", 9)) is not None
+    assert store.get(("box", 1)) is None
+    assert blob_files(store) == {store.digest(("box", i)) for i in range(10) if store.get(("box", i)) is not None}
+
+
+def _writer(path: str, max_bytes: int, writer: int) -> int:
+    store = ShapeStore(path, max_bytes)
+    for i in range(PUTS):
+        store.put(("box", writer, i), [box(1 + writer, 1, 1 + i)])
+        store.get(("box", writer, max(i - 1, 0)))
+    return store.stats.evictions
+
+
+def test_concurrent_writers(tmp_path):
+    size = len(pyCadUtils.store.shape_to_brep(box(1, 1, 1)))
+    max_bytes = 5 * size
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(WRITERS) as pool:
+        evictions = pool.starmap(_writer, [(str(tmp_path), max_bytes, w) for w in range(WRITERS)])
+
+    store = ShapeStore(str(tmp_path), max_bytes)
+    assert sum(evictions) > 0
+    assert store.size() <= max_bytes
+    # the index and the files agree, and every indexed entry reads back
+    digests = {d for (d,) in store._connect().execute("SELECT digest FROM entries")}
+    assert digests == blob_files(store)
+    found = [store.get(("box", w, i)) for w in range(WRITERS) for i in range(PUTS)]
+    assert sum(f is not None for f in found) == len(store) == len(digests)
+
+
+def test_locked_store_falls_back_to_building(tmp_path, monkeypatch):
+    monkeypatch.setattr(pyCadUtils.store, "BUSY_TIMEOUT", 0.1)
+    store = ShapeStore(str(tmp_path))
+    monkeypatch.setattr(shape_cache, "store", store)
+
+    # another process holds the write lock of the index
+    writer = sqlite3.connect(os.path.join(store.path, "index.sqlite"), isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        shape_cache.clear()
+        solid = create_cylinder(cq.Workplane("XY"), 31, 7, 1).val()
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+    assert solid.isValid()
+    assert len(store) == 0 and not blob_files(store)
+
+
+def test_corrupt_blob_is_rebuilt(tmp_path, monkeypatch):
+    store = ShapeStore(str(tmp_path))
+    monkeypatch.setattr(shape_cache, "store", store)
+    shape_cache.clear()
+    create_cylinder(cq.Workplane("XY"), 37, 7, 1)
+
+    (digest,) = blob_files(store)
+    with open(store._blob_path(digest), "wb") as f:
+        f.write(b"not a BREP file")
+
+    shape_cache.clear()
+    solid = create_cylinder(cq.Workplane("XY"), 37, 7, 1).val()
+
+    assert solid.isValid()
+    assert store.stats.writes == 2
+    assert store.get(shape_cache.make_key("cylinder", (37, 7, 1, "revolve"))) is not None